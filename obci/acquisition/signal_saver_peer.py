@@ -12,6 +12,7 @@ from obci.control.peer.configured_multiplexer_server import ConfiguredMultiplexe
 
 from obci.configs import settings, variables_pb2
 from obci.analysis.obci_signal_processing.signal import data_write_proxy
+from obci.analysis.obci_signal_processing.signal import data_chunked_file
 from obci.analysis.obci_signal_processing.signal import signal_exceptions as data_storage_exceptions
 from obci.utils.openbci_logging import log_crash
 
@@ -103,6 +104,9 @@ class SignalSaver(ConfiguredMultiplexerServer):
             self._number_of_samples += self._samples_per_packet
             self._data_received(mxmsg.message)
 
+            if self._writer_stats_interval > 0:
+                self._log_writer_stats()
+
             if self.debug_on:
                 # Log module real sampling rate
                 self.debug.next_sample()
@@ -128,6 +132,9 @@ class SignalSaver(ConfiguredMultiplexerServer):
         append_ts = int(self.config.get_param("append_timestamps"))
         use_tmp_file = int(self.config.get_param("use_tmp_file"))
         use_own_buffer = int(self.config.get_param("use_own_buffer"))
+        use_async_writer = int(self.config.get_param("use_async_writer"))
+        use_chunked_format = int(self.config.get_param("use_chunked_format"))
+        compression = self.config.get_param("chunk_compression") or None
         signal_type = self.config.get_param("signal_type")
         self._samples_per_packet = int(self.config.get_param("samples_per_packet"))
 
@@ -137,14 +144,33 @@ class SignalSaver(ConfiguredMultiplexerServer):
         l_f_dir = os.path.expanduser(os.path.normpath(l_f_dir))
         if not os.access(l_f_dir, os.F_OK):
             os.mkdir(l_f_dir)
+        if use_chunked_format:
+            l_f_ext = data_chunked_file.CHUNKED_FILE_EXTENSION
+        else:
+            l_f_ext = DATA_FILE_EXTENSION
         self._file_path = os.path.normpath(os.path.join(
-            l_f_dir, l_f_name + DATA_FILE_EXTENSION))
+            l_f_dir, l_f_name + l_f_ext))
 
         self._data_proxy = data_write_proxy.get_proxy(
-            self._file_path, append_ts, use_tmp_file, use_own_buffer, signal_type)
+            self._file_path, append_ts, use_tmp_file, use_own_buffer, signal_type, use_async_writer,
+            use_chunked_format=use_chunked_format, compression=compression,
+            sampling_frequency=float(self.config.get_param('sampling_rate')))
 
         self._mx_signal_type = types.__dict__[self.config.get_param("mx_signal_type")]
 
+        # statistics of async writer (queue depth, write latency) are logged every interval seconds
+        self._writer_stats_interval = float(self.config.get_param("writer_stats_interval"))
+        self._next_writer_stats_time = time.monotonic() + self._writer_stats_interval
+
+    def _log_writer_stats(self):
+        l_now = time.monotonic()
+        if l_now < self._next_writer_stats_time:
+            return
+        self._next_writer_stats_time = l_now + self._writer_stats_interval
+        l_get_stats = getattr(self._data_proxy, 'get_stats', None)
+        if l_get_stats is not None:
+            self.logger.info("Writer stats: " + str(l_get_stats()))
+
     def _finish_saving_session(self):
         """Send signal_saver_control_message to MX with
         number of samples and first sample timestamp (for tag_saver and info_saver).
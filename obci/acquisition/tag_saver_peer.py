@@ -31,7 +31,8 @@ class TagSaver(ConfiguredMultiplexerServer):
         self._file_path = os.path.expanduser(os.path.normpath(os.path.join(
             l_f_dir, l_f_name + TAG_FILE_EXTENSION)))
 
-        self._tags_proxy = tags_writer.TagsFileWriter(self._file_path)
+        self._tags_proxy = tags_writer.TagsFileWriter(
+            self._file_path, p_journal=int(self.config.get_param("use_journal")))
         self.ready()
         self._session_is_active = True
 
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Run an analysis function over many recordings in a pool of processes.
+
+A recording is a triple of .obci.xml (info), data (.obci.raw, .obci.chk or
+.obci.dat) and optional .obci.tag files sharing one base path. For every
+recording a worker process opens a ReadManager and calls the analysis function
+with it; the function must be picklable (defined at module level) and should
+return a picklable result (for example averaged epochs or features).
+
+Memory used by workers is bounded by memory mapping data files (default),
+by restarting workers after p_max_tasks_per_child recordings and optionally
+by a data segment limit of every worker (p_max_memory, Unix only). The limit
+(RLIMIT_DATA) doesn`t include memory mapped data files. A worker killed
+while processing a recording (for example by the OOM killer) doesn`t stop
+the batch, the recording is retried once and then reported as an error
+(Python 3.11 or newer).
+
+Usage: python3 -m obci.analysis.obci_signal_processing.batch_runner [options]
+module:function recording [recording ...] (see --help)
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import glob
+import importlib
+import multiprocessing
+import os
+import pickle
+import sys
+import traceback
+
+from . import read_manager
+from . import obci_signal_processing_logging as logger
+LOGGER = logger.get_logger("batch_runner", "info")
+
+INFO_EXTENSION = '.obci.xml'
+TAGS_EXTENSION = '.obci.tag'
+DATA_EXTENSIONS = ['.obci.raw', '.obci.chk', '.obci.dat']
+
+
+def find_recordings(p_paths):
+    """Return a list of (info, data, tags) file paths triples of recordings
+    given in p_paths - a path or a list of paths or glob patterns of any file of
+    a recording (or of recording`s base path). Tags file path is None if there
+    is no tags file. Recordings without info or data file are ignored."""
+    try:
+        '' + p_paths
+        p_paths = [p_paths]
+    except TypeError:
+        pass
+
+    bases = []
+    for i_path in p_paths:
+        for i_file in sorted(glob.glob(i_path)) or [i_path]:
+            base = i_file
+            for i_ext in [INFO_EXTENSION, TAGS_EXTENSION] + DATA_EXTENSIONS:
+                if base.endswith(i_ext):
+                    base = base[:-len(i_ext)]
+                    break
+            if base not in bases:
+                bases.append(base)
+
+    ret = []
+    for i_base in bases:
+        data = [i_base + i_ext for i_ext in DATA_EXTENSIONS if os.path.isfile(i_base + i_ext)]
+        if not os.path.isfile(i_base + INFO_EXTENSION) or not data:
+            LOGGER.warning("No info or data file for recording " + i_base + ". Ignored.")
+            continue
+        tags = i_base + TAGS_EXTENSION
+        ret.append((i_base + INFO_EXTENSION, data[0], tags if os.path.isfile(tags) else None))
+    return ret
+
+
+def _init_worker(p_max_memory):
+    if p_max_memory:
+        try:
+            import resource
+        except ImportError:
+            LOGGER.warning("Memory limit of workers is not supported on this platform.")
+            return
+        # RLIMIT_AS would count memory mapped data files too
+        resource.setrlimit(resource.RLIMIT_DATA, (p_max_memory, p_max_memory))
+
+
+def _process_recording(p_args):
+    """Open recording and return (index, result of the function, error)."""
+    l_index, l_func, l_recording, l_memmap = p_args
+    try:
+        with read_manager.ReadManager(l_recording[0], l_recording[1], l_recording[2], l_memmap) as mgr:
+            return l_index, l_func(mgr), None
+    except Exception:
+        return l_index, None, traceback.format_exc()
+
+
+def _create_executor(p_processes, p_max_memory, p_max_tasks_per_child):
+    # workers can`t be restarted in a forked pool
+    l_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return concurrent.futures.ProcessPoolExecutor(
+        p_processes, multiprocessing.get_context(l_method), _init_worker, (p_max_memory,),
+        max_tasks_per_child=p_max_tasks_per_child)
+
+
+def _run_legacy_pool(p_tasks, p_processes, p_max_memory, p_max_tasks_per_child, p_handle):
+    """Process p_tasks in multiprocessing.Pool of p_processes processes,
+    call p_handle(output) for every task. Used before Python 3.11, where
+    ProcessPoolExecutor can`t restart workers; a killed worker hangs the pool."""
+    pool = multiprocessing.Pool(p_processes, _init_worker, (p_max_memory,), p_max_tasks_per_child)
+    try:
+        for i_output in pool.imap_unordered(_process_recording, p_tasks):
+            p_handle(i_output)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _run_pool(p_tasks, p_processes, p_max_memory, p_max_tasks_per_child, p_handle):
+    """Process p_tasks in a pool of p_processes processes, call p_handle(output)
+    for every task. At most p_processes tasks are submitted at once, so when
+    a worker dies only these tasks are affected; they are retried once
+    in a new pool."""
+    l_pending = collections.deque(p_tasks)
+    l_retried = set()
+    while l_pending:
+        l_executor = _create_executor(p_processes, p_max_memory, p_max_tasks_per_child)
+        l_running = {}
+        l_broken = False
+        try:
+            while l_running or (l_pending and not l_broken):
+                while l_pending and not l_broken and len(l_running) < p_processes:
+                    l_task = l_pending.popleft()
+                    l_running[l_executor.submit(_process_recording, l_task)] = l_task
+                l_done, _ = concurrent.futures.wait(l_running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for i_future in l_done:
+                    l_task = l_running.pop(i_future)
+                    try:
+                        l_output = i_future.result()
+                    except concurrent.futures.process.BrokenProcessPool:
+                        l_broken = True
+                        if l_task[0] not in l_retried:
+                            l_retried.add(l_task[0])
+                            l_pending.appendleft(l_task)
+                            continue
+                        l_output = (l_task[0], None, "Worker process died while processing the recording "
+                                                     "(killed or out of memory?).")
+                    p_handle(l_output)
+        except BaseException:
+            l_executor.shutdown(False)
+            raise
+        l_executor.shutdown()
+
+
+def _log_progress(p_done, p_total, p_recording, p_error):
+    if p_error is None:
+        LOGGER.info("[" + str(p_done) + "/" + str(p_total) + "] " + p_recording[1])
+    else:
+        LOGGER.error("[" + str(p_done) + "/" + str(p_total) + "] " + p_recording[1] + " failed:\n" + p_error)
+
+
+def run_batch(p_func, p_recordings, p_processes=None, p_memmap=True, p_max_tasks_per_child=1,
+              p_max_memory=None, p_progress=_log_progress, p_reduce=None):
+    """Call p_func(read_manager) for every recording in p_recordings
+    (paths or glob patterns, see find_recordings) in a pool of p_processes
+    processes (number of cpus if None, no pool if 1 and p_max_memory is not given).
+    Parameters:
+    - p_memmap - if True raw data files are memory mapped (see ReadManager),
+    - p_max_tasks_per_child - number of recordings after which a worker is restarted,
+    - p_max_memory - data segment limit of a worker in bytes (Unix only),
+      memory mapped data files don`t count,
+    - p_progress - function called as p_progress(done, total, recording, error)
+      after every recording (error is None or traceback of the error),
+    - p_reduce - function called with the list of results of all successful recordings.
+    Return a tuple (results, errors) - dictionaries with (info, data, tags)
+    triples as keys and results or error tracebacks as values, both ordered as
+    recordings. If p_reduce is given, results is replaced by p_reduce`s result."""
+    l_recordings = find_recordings(p_recordings)
+    l_tasks = [(i, p_func, i_rec, p_memmap) for i, i_rec in enumerate(l_recordings)]
+    l_outputs = []
+
+    def handle(p_output):
+        l_outputs.append(p_output)
+        if p_progress is not None:
+            p_progress(len(l_outputs), len(l_tasks), l_recordings[p_output[0]], p_output[2])
+
+    if p_processes == 1 and not p_max_memory:
+        for i_task in l_tasks:
+            handle(_process_recording(i_task))
+    elif l_tasks:
+        # the memory limit can`t be set for this process, so it needs a worker
+        run_pool = _run_pool if sys.version_info >= (3, 11) else _run_legacy_pool
+        run_pool(l_tasks, p_processes or os.cpu_count() or 1, p_max_memory, p_max_tasks_per_child, handle)
+
+    l_outputs.sort(key=lambda output: output[0])
+    results = dict((l_recordings[i], res) for i, res, err in l_outputs if err is None)
+    errors = dict((l_recordings[i], err) for i, res, err in l_outputs if err is not None)
+    if p_reduce is not None:
+        results = p_reduce(list(results.values()))
+    return results, errors
+
+
+def _import_function(p_name):
+    """Return function given as 'module:function'."""
+    module, func = p_name.split(':')
+    return getattr(importlib.import_module(module), func)
+
+
+def main(p_args=None):
+    parser = argparse.ArgumentParser(description="Run function module:function(read_manager) for many recordings.")
+    parser.add_argument('function', help="analysis function as module:function")
+    parser.add_argument('recordings', nargs='+', help="recordings files or glob patterns")
+    parser.add_argument('-j', '--processes', type=int, default=None, help="number of processes (default: cpus)")
+    parser.add_argument('--reduce', default=None, help="function module:function reducing list of results")
+    parser.add_argument('--max-tasks-per-child', type=int, default=1,
+                        help="number of recordings after which a worker is restarted")
+    parser.add_argument('--max-memory', type=int, default=None, help="memory limit of a worker in MB")
+    parser.add_argument('--no-memmap', action='store_true', help="read data files instead of memory mapping")
+    parser.add_argument('-o', '--output', default=None, help="pickle file for (results, errors)")
+    args = parser.parse_args(p_args)
+
+    results, errors = run_batch(
+        _import_function(args.function), args.recordings, args.processes, not args.no_memmap,
+        args.max_tasks_per_child, args.max_memory and args.max_memory * 1024 * 1024,
+        p_reduce=args.reduce and _import_function(args.reduce))
+    if args.output:
+        with open(args.output, 'wb') as f:
+            pickle.dump((results, errors), f)
+    LOGGER.info("Finished. Failed recordings: " + str(len(errors)))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
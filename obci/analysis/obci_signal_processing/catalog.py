@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Catalog of recordings with metadata cached in a SQLite database.
+
+update() scans a directory tree once for recordings (see
+batch_runner.find_recordings) and stores for every recording: channels,
+sampling frequency, sample type, number of samples, duration, histogram of
+tags names, file sizes and modification time. Later updates parse only
+recordings with changed files and remove recordings which disappeared, so
+find() queries never touch recordings` files.
+
+Recordings returned by find() are dictionaries with 'info', 'data' and
+'tags' file paths, which can be opened with ReadManager.from_files().
+
+Usage: python3 -m obci.analysis.obci_signal_processing.catalog database_file directory [directory ...]
+(see --help)
+"""
+
+import argparse
+import collections
+import os
+import sqlite3
+import sys
+
+from .signal import data_chunked_file
+from .signal import read_info_source
+from .signal import signal_constants
+from .tags import read_tags_source
+from . import batch_runner
+from . import read_manager
+from . import obci_signal_processing_logging as logger
+LOGGER = logger.get_logger("catalog", "info")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    info TEXT UNIQUE NOT NULL,
+    data TEXT NOT NULL,
+    tags TEXT,
+    mtime REAL NOT NULL,
+    info_size INTEGER NOT NULL,
+    data_size INTEGER NOT NULL,
+    tags_size INTEGER NOT NULL,
+    sampling_frequency REAL,
+    number_of_channels INTEGER,
+    sample_type TEXT,
+    number_of_samples INTEGER,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    recording_id INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    recording_id INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_sampling_frequency ON recordings(sampling_frequency);
+CREATE INDEX IF NOT EXISTS channels_name ON channels(name, recording_id);
+CREATE INDEX IF NOT EXISTS channels_recording ON channels(recording_id);
+CREATE INDEX IF NOT EXISTS tags_name ON tags(name, recording_id);
+CREATE INDEX IF NOT EXISTS tags_recording ON tags(recording_id);
+"""
+
+_COLUMNS = ['id', 'info', 'data', 'tags', 'mtime', 'info_size', 'data_size', 'tags_size',
+            'sampling_frequency', 'number_of_channels', 'sample_type', 'number_of_samples', 'duration']
+
+
+def _files_stats(p_files):
+    """Return (mtime, sizes) of files p_files (None files have size 0)."""
+    mtime = 0.0
+    sizes = []
+    for i_file in p_files:
+        if i_file is None:
+            sizes.append(0)
+        else:
+            st = os.stat(i_file)
+            mtime = max(mtime, st.st_mtime)
+            sizes.append(st.st_size)
+    return mtime, sizes
+
+
+def _read_metadata(p_info, p_data, p_tags):
+    """Return (sampling frequency, channels names, number of channels, sample type,
+    number of samples, tags names histogram) of recording."""
+    params = read_info_source.FileInfoSource(p_info).get_params()
+    channels = list(params.get('channels_names', []))
+    sampling = float(params.get('sampling_frequency', 0.0))
+    if data_chunked_file.is_chunked_file(p_data):
+        reader = data_chunked_file.ChunkedFileReader(p_data)
+        num_of_channels, sample_type, samples = reader.num_of_channels, reader.sample_type, reader.number_of_samples
+        reader.close()
+    else:
+        num_of_channels = int(params['number_of_channels'])
+        sample_type = params.get('sample_type', 'FLOAT')
+        sample_size = signal_constants.SAMPLE_SIZES[sample_type]
+        samples = os.path.getsize(p_data) // (sample_size * num_of_channels) if num_of_channels else 0
+    histogram = collections.Counter()
+    if p_tags is not None:
+        histogram.update(tag['name'] for tag in read_tags_source.FileTagsSource(p_tags).get_tags())
+    return sampling, channels, num_of_channels, sample_type, samples, histogram
+
+
+class RecordingsCatalog(object):
+
+    """Catalog of recordings stored in SQLite database p_db_path.
+    Public interface:
+    - update(p_root) - add, refresh or remove recordings found in directory tree p_root,
+    - find(...) - recordings matching given criteria,
+    - get_channels(p_recording), get_tags_histogram(p_recording) - details of a recording,
+    - open(p_recording) - ReadManager of a recording.
+    """
+
+    def __init__(self, p_db_path):
+        self._db = sqlite3.connect(p_db_path)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def update(self, p_root):
+        """Scan directory tree p_root and update the catalog.
+        Only recordings with changed modification time or sizes of files are read.
+        Return a tuple - number of added or refreshed and number of removed recordings."""
+        p_root = os.path.abspath(p_root)
+        infos = []
+        for i_dir, i_dirs, i_files in os.walk(p_root):
+            infos.extend(os.path.join(i_dir, i_file) for i_file in sorted(i_files)
+                         if i_file.endswith(batch_runner.INFO_EXTENSION))
+        recordings = batch_runner.find_recordings(infos)
+
+        known = dict((info, (rec_id, data, tags, mtime, [info_size, data_size, tags_size]))
+                     for rec_id, info, data, tags, mtime, info_size, data_size, tags_size in self._db.execute(
+                         "SELECT id, info, data, tags, mtime, info_size, data_size, tags_size FROM recordings "
+                         "WHERE info LIKE ? ESCAPE '\\'", (self._like_prefix(p_root),)))
+        updated = 0
+        with self._db:
+            for info, data, tags in recordings:
+                mtime, sizes = _files_stats((info, data, tags))
+                old = known.pop(info, None)
+                if old is not None and old[1:] == (data, tags, mtime, sizes):
+                    continue
+                try:
+                    sampling, channels, num_of_channels, sample_type, samples, histogram = \
+                        _read_metadata(info, data, tags)
+                except Exception as e:
+                    LOGGER.warning("Could not read recording " + info + ": " + str(e) + ". Ignored.")
+                    continue
+                if old is not None:
+                    self._db.execute("DELETE FROM recordings WHERE id = ?", (old[0],))
+                rec_id = self._db.execute(
+                    "INSERT INTO recordings (info, data, tags, mtime, info_size, data_size, tags_size, "
+                    "sampling_frequency, number_of_channels, sample_type, number_of_samples, duration) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [info, data, tags, mtime] + sizes +
+                    [sampling, num_of_channels, sample_type, samples, samples / sampling if sampling else None]
+                ).lastrowid
+                self._db.executemany("INSERT INTO channels VALUES (?, ?, ?)",
+                                     [(rec_id, i, name) for i, name in enumerate(channels)])
+                self._db.executemany("INSERT INTO tags VALUES (?, ?, ?)",
+                                     [(rec_id, name, count) for name, count in histogram.items()])
+                updated += 1
+            self._db.executemany("DELETE FROM recordings WHERE id = ?", [(old[0],) for old in known.values()])
+        LOGGER.info("Catalog updated: " + str(updated) + " recordings read, " + str(len(known)) + " removed.")
+        return updated, len(known)
+
+    def find(self, p_sampling_frequency=None, p_channels=None, p_tags=None, p_min_duration=None, p_root=None):
+        """Return a list of recordings (dictionaries with all catalog columns,
+        'info', 'data' and 'tags' being file paths) with sampling frequency
+        p_sampling_frequency, having all channels p_channels and at least one
+        tag of every name in p_tags, not shorter than p_min_duration seconds
+        and stored under directory p_root."""
+        query = "SELECT " + ", ".join(_COLUMNS) + " FROM recordings WHERE 1"
+        args = []
+        if p_sampling_frequency is not None:
+            query += " AND sampling_frequency = ?"
+            args.append(float(p_sampling_frequency))
+        if p_min_duration is not None:
+            query += " AND duration >= ?"
+            args.append(p_min_duration)
+        if p_root is not None:
+            query += " AND info LIKE ? ESCAPE '\\'"
+            args.append(self._like_prefix(os.path.abspath(p_root)))
+        for i_table, i_names in [('channels', p_channels), ('tags', p_tags)]:
+            if i_names:
+                i_names = list(set(i_names))
+                query += (" AND id IN (SELECT recording_id FROM " + i_table + " WHERE name IN (" +
+                          ", ".join("?" * len(i_names)) + ") GROUP BY recording_id HAVING COUNT(DISTINCT name) = ?)")
+                args.extend(i_names + [len(i_names)])
+        query += " ORDER BY info"
+        return [dict(zip(_COLUMNS, row)) for row in self._db.execute(query, args)]
+
+    def get_channels(self, p_recording):
+        """Return list of channels names of recording p_recording (find() result)."""
+        return [name for name, in self._db.execute(
+            "SELECT name FROM channels WHERE recording_id = ? ORDER BY position", (p_recording['id'],))]
+
+    def get_tags_histogram(self, p_recording):
+        """Return dictionary tag name -> number of tags of recording p_recording (find() result)."""
+        return dict(self._db.execute(
+            "SELECT name, count FROM tags WHERE recording_id = ?", (p_recording['id'],)))
+
+    def open(self, p_recording, p_memmap=False):
+        """Return ReadManager of recording p_recording (find() result)."""
+        return read_manager.ReadManager.from_files(p_recording, p_memmap)
+
+    @staticmethod
+    def _like_prefix(p_dir):
+        prefix = os.path.join(p_dir, '')
+        return prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def main(p_args=None):
+    parser = argparse.ArgumentParser(description="Add, refresh or remove recordings in the catalog database.")
+    parser.add_argument('database', help="SQLite database file")
+    parser.add_argument('directories', nargs='+', help="directories scanned for recordings")
+    args = parser.parse_args(p_args)
+
+    catalog = RecordingsCatalog(args.database)
+    try:
+        for i_root in args.directories:
+            catalog.update(i_root)
+    finally:
+        catalog.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,15 +3,18 @@
 # Author:
 #     Mateusz Kruszyński <mateusz.kruszynski@gmail.com>
 #
-import numpy
 import copy
 import os.path
 
+import numpy
+
 from .signal import read_data_source
 from .signal import read_info_source
 from .tags import read_tags_source
 
 from .signal import data_raw_write_proxy
+from .signal import data_chunked_file
+from .signal import signal_pyramid
 from .signal import info_file_proxy
 from .tags import tags_file_writer
 
@@ -34,8 +37,11 @@ class ReadManager(object):
     3. Call get_param('new_param') every time you want to get the param.
     """
 
-    def __init__(self, p_info_source, p_data_source, p_tags_source):
-        """Just remember info file path and data file path."""
+    def __init__(self, p_info_source, p_data_source, p_tags_source, p_memmap=False):
+        """Just remember info file path and data file path.
+        If p_memmap is True and p_data_source is a file path, data file
+        is memory mapped instead of being read into memory.
+        Chunked data files (see data_chunked_file) are recognised automatically."""
         try:
             '' + p_info_source
             LOGGER.debug("Got info source file path.")
@@ -47,11 +53,19 @@ class ReadManager(object):
         try:
             '' + p_data_source
             LOGGER.debug("Got data source file path.")
-            self.data_source = read_data_source.FileDataSource(
-                p_data_source,
-                int(self.info_source.get_param('number_of_channels')),
-                self.info_source.get_param('sample_type')
-            )
+            if data_chunked_file.is_chunked_file(p_data_source):
+                # chunked files describe their number of channels and sample type
+                self.data_source = read_data_source.ChunkedFileDataSource(p_data_source)
+            else:
+                if p_memmap:
+                    data_source_class = read_data_source.MemmapDataSource
+                else:
+                    data_source_class = read_data_source.FileDataSource
+                self.data_source = data_source_class(
+                    p_data_source,
+                    int(self.info_source.get_param('number_of_channels')),
+                    self.info_source.get_param('sample_type')
+                )
         except TypeError:
             LOGGER.debug("Got data source object.")
             self.data_source = p_data_source
@@ -64,13 +78,37 @@ class ReadManager(object):
             LOGGER.debug("Got tags source object.")
             self.tags_source = p_tags_source
 
+        self.pyramid = None
+
+    @classmethod
+    def from_files(cls, p_files, p_memmap=False):
+        """Return ReadManager of recording p_files - a dictionary with 'info',
+        'data' and 'tags' files paths (for example catalog.RecordingsCatalog.find() result)."""
+        return cls(p_files['info'], p_files['data'], p_files['tags'], p_memmap)
+
+    def close(self):
+        """Close files opened by the data source."""
+        self.data_source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def __deepcopy__(self, memo):
         info_source = copy.deepcopy(self.info_source)
         tags_source = copy.deepcopy(self.tags_source)
         samples_source = copy.deepcopy(self.data_source)
-        return ReadManager(info_source, samples_source, tags_source)
-
-    def save_to_file(self, p_dir, p_name):
+        ret = ReadManager(info_source, samples_source, tags_source)
+        # pyramid is read only, so it can be shared
+        ret.pyramid = self.pyramid
+        return ret
+
+    def save_to_file(self, p_dir, p_name, p_chunked=False, p_compression=None):
+        """Save tags, info and data to p_dir directory as p_name.obci.* files.
+        If p_chunked is True, data is saved in chunked format to .obci.chk file,
+        p_compression can then be None, 'zlib' or 'lzma'."""
         tags = self.get_tags()
         params = self.get_params()
 
@@ -85,14 +123,29 @@ class ReadManager(object):
         info_writer.set_attributes(params)
 
         # store data
-        data_writer = data_raw_write_proxy.DataRawWriteProxy(path + '.obci.raw')
-        for sample in self.iter_samples():
-            for d in sample:
-                data_writer.data_received(d)
+        sample_type = params.get('sample_type', 'FLOAT')
+        if p_chunked:
+            samples = self.get_samples()
+            sampling = float(params.get('sampling_frequency', 0.0))
+            data_writer = data_chunked_file.ChunkedFileWriter(
+                path + data_chunked_file.CHUNKED_FILE_EXTENSION, len(samples),
+                sample_type, p_compression=p_compression, p_sampling_frequency=sampling)
+            timestamps = None
+            if sampling > 0:
+                # chunk index needs timestamps of samples
+                timestamps = float(params.get('first_sample_timestamp', 0.0)) + \
+                    numpy.arange(samples.shape[1]) / sampling
+            data_writer.write_samples(samples, timestamps)
+            data_writer.close()
+        else:
+            data_writer = data_raw_write_proxy.DataRawWriteProxy(path + '.obci.raw', p_sample_type=sample_type)
+            for sample in self.iter_samples():
+                for d in sample:
+                    data_writer.data_received(d)
+            data_writer.finish_saving()
 
         tags_writer.finish_saving(0)
         info_writer.finish_saving()
-        data_writer.finish_saving()
 
     def get_samples(self, p_from=None, p_len=None, p_unit='sample'):
         """Return a two dimensional array of signal values.
@@ -106,19 +159,89 @@ class ReadManager(object):
         else:
             raise Exception('Unrecognised unit type. Should be sample or second!. Abort!')
 
+    def get_samples_windows(self, p_froms, p_len, p_unit='sample'):
+        """Return a three dimensional array (windows x channels x samples)
+        of signal windows of length p_len starting at p_froms.
+        All windows are read in one call, so it is much faster than calling
+        get_samples() for every window.
+        p_unit can be 'sample' or 'second'."""
+        if p_unit == 'sample':
+            return self.data_source.get_samples_windows(p_froms, p_len)
+        elif p_unit == 'second':
+            sampling = int(float(self.get_param('sampling_frequency')))
+            return self.data_source.get_samples_windows(
+                [int(i_from * sampling) for i_from in p_froms], int(p_len * sampling))
+        else:
+            raise Exception('Unrecognised unit type. Should be sample or second!. Abort!')
+
+    def build_pyramid(self, p_file_path, p_levels=signal_pyramid.LEVELS):
+        """Build min/max/mean pyramid (see signal_pyramid) of the signal,
+        save it to p_file_path and use it in get_overview()."""
+        self.pyramid = signal_pyramid.build_pyramid(
+            self.data_source, int(self.get_param('number_of_samples')), p_file_path, p_levels)
+
+    def load_pyramid(self, p_file_path):
+        """Use pyramid saved in p_file_path in get_overview()."""
+        self.pyramid = signal_pyramid.SignalPyramid(p_file_path)
+
+    def get_overview(self, p_width, p_from=None, p_len=None, p_unit='sample'):
+        """Return (level, min, max, mean) for drawing signal from p_from to p_from + p_len
+        (whole signal if p_from is None) on p_width pixels.
+        min, max and mean are two dimensional arrays (channels x bins) of bins
+        of level samples taken from the coarsest pyramid level giving at least
+        p_width bins. If there is no such level (or no pyramid) level is 1
+        and min, max and mean are raw signal values.
+        p_unit can be 'sample' or 'second'."""
+        if p_from is not None and p_unit == 'second':
+            sampling = int(float(self.get_param('sampling_frequency')))
+            p_from, p_len = int(p_from * sampling), int(p_len * sampling)
+        elif p_unit not in ('sample', 'second'):
+            raise Exception('Unrecognised unit type. Should be sample or second!. Abort!')
+
+        level = None
+        if self.pyramid is not None:
+            span = self.pyramid.number_of_samples if p_from is None else p_len
+            level = self.pyramid.choose_level(span, p_width)
+        if level is None:
+            samples = self.data_source.get_samples(p_from, p_len)
+            return 1, samples, samples, samples
+        mins, maxs, means = self.pyramid.get_level(level, p_from, p_len)
+        return level, mins, maxs, means
+
     def get_channel_samples(self, p_ch_name, p_from=None, p_len=None, p_unit='sample'):
         """Return an array of values for channel p_ch_name, or
         raise ValueError exception if there is channel with that name.
         p_unit can be 'sample' or 'second' and makes sense only if p_from and p_len is not none."""
-        ch_ind = self.get_param('channels_names').index(p_ch_name)  # TODO error
-        return self.get_samples(p_from, p_len, p_unit)[ch_ind]
+        return self.get_channels_samples([p_ch_name], p_from, p_len, p_unit)[0]
 
     def get_channels_samples(self, p_ch_names, p_from=None, p_len=None, p_unit='sample'):
+        """Return a two dimensional array (channels x samples) of values for
+        channels p_ch_names (channels names or indices).
+        Only requested channels are read, so it is much cheaper than
+        get_samples() when few of many channels are needed.
+        Raise ValueError exception if there is no channel with given name.
+        p_unit can be 'sample' or 'second' and makes sense only if p_from and p_len is not none."""
         assert(len(p_ch_names) > 0)
-        s = self.get_channel_samples(p_ch_names[0], p_from, p_len, p_unit)
-        for ch in p_ch_names[1:]:
-            s = numpy.vstack((s, self.get_channel_samples(ch, p_from, p_len, p_unit)))
-        return s
+        names = None
+        ch_inds = []
+        for ch in p_ch_names:
+            if isinstance(ch, str):
+                if names is None:
+                    names = self.get_param('channels_names')
+                try:
+                    ch_inds.append(names.index(ch))
+                except ValueError:
+                    raise ValueError("No channel named " + repr(ch) + " in channels " + str(names))
+            else:
+                ch_inds.append(int(ch))
+
+        if p_from is None or p_unit == 'sample':
+            return self.data_source.get_channels_samples(ch_inds, p_from, p_len)
+        elif p_unit == 'second':
+            sampling = int(float(self.get_param('sampling_frequency')))
+            return self.data_source.get_channels_samples(ch_inds, int(p_from * sampling), int(p_len * sampling))
+        else:
+            raise Exception('Unrecognised unit type. Should be sample or second!. Abort!')
 
     def set_samples(self, p_samples, p_channel_names, p_copy=False):
         try:
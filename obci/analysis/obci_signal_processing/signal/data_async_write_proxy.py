@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import collections
+import os
+import queue
+import threading
+import time
+
+from .data_generic_write_proxy import DataGenericWriteProxy
+
+from . import signal_logging as logger
+LOGGER = logger.get_logger("data_async_write_proxy", 'info')
+
+BLOCK_SIZE = 1024 * 1024
+BLOCKS_COUNT = 2
+MAX_QUEUED_BLOCKS = 16
+PUT_TIMEOUT = 10.0
+
+
+class DataAsyncWriteProxy(DataGenericWriteProxy):
+
+    """
+    Write proxy writing data to a file in a background thread.
+    Incoming packets are encoded into preallocated in-memory blocks.
+    Full blocks are queued and written to the file by a writer thread,
+    so slow disk writes do not block data_received().
+    If p_max_queued_blocks blocks wait for writing, data_received() waits
+    for the writer thread; data is never dropped - if the writer does not
+    free the queue in p_put_timeout seconds or fails, IOError is raised
+    from data_received() and finish_saving().
+    """
+
+    def __init__(self, p_file_path, p_unpack_later=False, p_append_ts=False, p_sample_type='FLOAT',
+                 p_block_size=BLOCK_SIZE, p_blocks_count=BLOCKS_COUNT, p_max_queued_blocks=MAX_QUEUED_BLOCKS,
+                 p_fsync=False, p_put_timeout=PUT_TIMEOUT):
+        """Open p_file_path file and start the writer thread.
+        p_block_size - size in bytes of one in-memory block,
+        p_blocks_count - number of blocks preallocated at start (2 - double buffering),
+        p_max_queued_blocks - maximum number of full blocks waiting for writing,
+        p_fsync - if True, fsync the file after every written block,
+        p_put_timeout - time in seconds to wait for a place in the full queue."""
+        super(DataAsyncWriteProxy, self).__init__(p_file_path, p_unpack_later, p_append_ts, p_sample_type)
+        self._block_size = p_block_size
+        self._fsync = p_fsync
+        self._put_timeout = p_put_timeout
+        self._free_blocks = collections.deque(bytearray(p_block_size) for i in range(p_blocks_count))
+        self._queue = queue.Queue(maxsize=p_max_queued_blocks)
+        self._block = self._get_free_block()
+        self._block_len = 0
+        self._write_error = None
+
+        self._written_blocks = 0
+        self._full_queue_waits = 0
+        self._max_queue_depth = 0
+        self._write_time = 0.0
+        self._max_write_time = 0.0
+
+        self._writer = threading.Thread(target=self._write_blocks,
+                                        name='DataAsyncWriteProxy', daemon=True)
+        self._writer.start()
+
+    def data_received(self, p_data):
+        """p_data must be protobuf SampleVector message, serialized to string.
+        Data is encoded into current block, full block is queued for writing.
+        Raise IOError if writing to the file failed."""
+        self._check_write_error()
+        if self._unpack_later:
+            l_data = p_data
+        else:
+            l_data = self._vect_to_string(p_data)
+
+        l_len = len(l_data)
+        if self._block_len + l_len > self._block_size:
+            self._queue_block()
+        if l_len > self._block_size:
+            # packet bigger than a block is queued as it is
+            self._put_block(l_data, l_len, False)
+        else:
+            self._block[self._block_len:self._block_len + l_len] = l_data
+            self._block_len += l_len
+        # count the packet only when its data is accepted for writing
+        self._number_of_samples = self._number_of_samples + 1
+
+    def finish_saving(self):
+        """Write all remaining blocks, stop the writer thread,
+        close the file and return a tuple - file`s name and number of samples.
+        Raise IOError if writing to the file failed."""
+        try:
+            self._queue_block()
+        finally:
+            self._stop_writer()
+        LOGGER.info("Async writer stats: " + str(self.get_stats()))
+        if self._write_error is not None:
+            self._file.close()
+            self._check_write_error()
+        return super(DataAsyncWriteProxy, self).finish_saving()
+
+    def get_stats(self):
+        """Return dict with writer statistics:
+        queue_depth - number of blocks currently waiting for writing,
+        max_queue_depth - maximum observed number of waiting blocks,
+        written_blocks - number of blocks written so far,
+        full_queue_waits - number of times data_received() waited for the writer thread,
+        write_latency_mean, write_latency_max - time in seconds of writing one block."""
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self._max_queue_depth,
+            'written_blocks': self._written_blocks,
+            'full_queue_waits': self._full_queue_waits,
+            'write_latency_mean': self._write_time / self._written_blocks if self._written_blocks else 0.0,
+            'write_latency_max': self._max_write_time,
+        }
+
+    def _get_free_block(self):
+        try:
+            return self._free_blocks.popleft()
+        except IndexError:
+            return bytearray(self._block_size)
+
+    def _queue_block(self):
+        if self._block_len == 0:
+            return
+        self._put_block(self._block, self._block_len, True)
+        self._block = self._get_free_block()
+        self._block_len = 0
+
+    def _put_block(self, p_block, p_len, p_reusable):
+        """Queue p_block for writing, wait for the writer thread if the queue is full.
+        Raise IOError if the writer failed or did not free the queue in time."""
+        try:
+            self._queue.put_nowait((p_block, p_len, p_reusable))
+        except queue.Full:
+            self._full_queue_waits += 1
+            LOGGER.warning("Writer queue is full, waiting for the writer thread...")
+            l_deadline = time.monotonic() + self._put_timeout
+            while True:
+                self._check_write_error()
+                try:
+                    self._queue.put((p_block, p_len, p_reusable), timeout=0.1)
+                    break
+                except queue.Full:
+                    if time.monotonic() >= l_deadline:
+                        raise IOError("Writer thread did not write queued data in " +
+                                      str(self._put_timeout) + " seconds!")
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+
+    def _stop_writer(self):
+        # after an error the writer thread only drops queued blocks, so it ends soon
+        try:
+            self._queue.put(None, timeout=self._put_timeout)
+        except queue.Full:
+            LOGGER.error("Writer thread does not respond, it could not be stopped.")
+            return
+        self._writer.join()
+
+    def _check_write_error(self):
+        if self._write_error is not None:
+            raise IOError("Error while writing to file " + str(self._file_path) + ": " + str(self._write_error))
+
+    def _write_blocks(self):
+        """Writer thread - write queued blocks until None is received."""
+        while True:
+            l_item = self._queue.get()
+            if l_item is None:
+                break
+            l_block, l_len, l_reusable = l_item
+            if self._write_error is None:
+                l_start = time.monotonic()
+                try:
+                    self._file.write(memoryview(l_block)[:l_len])
+                    if self._fsync:
+                        self._file.flush()
+                        os.fsync(self._file.fileno())
+                except (IOError, ValueError) as e:
+                    self._write_error = e
+                    LOGGER.error("Error while writing to file! Writing aborted. " + str(e))
+                else:
+                    l_time = time.monotonic() - l_start
+                    self._written_blocks += 1
+                    self._write_time += l_time
+                    self._max_write_time = max(self._max_write_time, l_time)
+            if l_reusable:
+                self._free_blocks.append(l_block)
@@ -3,35 +3,73 @@
 #     Mateusz Kruszyński <mateusz.kruszynski@gmail.com>
 #
 
+import numpy
+
 from .data_generic_write_proxy import DataGenericWriteProxy
-BUF_SIZE = 1024
+from . import signal_exceptions
+from . import signal_logging as logger
+LOGGER = logger.get_logger("data_buffered_write_proxy", 'info')
+
+BUF_SIZE = 4096
 
 
 class DataBufferedWriteProxy(DataGenericWriteProxy):
 
-    def __init__(self, p_file_path, p_unpack_later=False, p_append_ts=False, p_sample_type='FLOAT'):
-        """Open p_file_name file in p_dir_path directory."""
-        self.buffer = [0.0] * BUF_SIZE
+    """
+    Write proxy decoding incoming packets into a preallocated array
+    of p_buffer_size samples. The whole array is written to the file
+    with one write call once it is full.
+    """
+
+    def __init__(self, p_file_path, p_unpack_later=False, p_append_ts=False, p_sample_type='FLOAT',
+                 p_buffer_size=BUF_SIZE):
+        """Open p_file_name file in p_dir_path directory.
+        p_buffer_size - number of samples kept in memory before writing to the file."""
         super(DataBufferedWriteProxy, self).__init__(p_file_path, p_unpack_later, p_append_ts, p_sample_type)
+        self._buffer_size = p_buffer_size
+        # allocated on first packet, when number of channels is known
+        self.buffer = None
+        self._buffer_len = 0
+        self._raw_buffer = []
 
     def data_received(self, p_data):
         """ p_data must be protobuf SampleVector message, but serialized to string.
         Data is stored in temp buffer, once a while the buffer is flushed to a file."""
-        ind = self._number_of_samples % BUF_SIZE
-        self.buffer[ind] = p_data
         self._number_of_samples = self._number_of_samples + 1
-        if (ind + 1) == BUF_SIZE:
-            self._write_buffer()
+        if self._unpack_later:
+            self._raw_buffer.append(p_data)
+            if len(self._raw_buffer) == self._buffer_size:
+                self._write_buffer()
+            return
+
+        l_data = self._vect_to_array(p_data)
+        if len(l_data) == 0:
+            return
+        if self.buffer is None:
+            self.buffer = numpy.empty((self._buffer_size, l_data.shape[1]), dtype=self._sample_dtype)
+        elif l_data.shape[1] != self.buffer.shape[1]:
+            LOGGER.error("Error while writhing to file. Number of channels changed.")
+            raise signal_exceptions.BadSampleFormat()
+
+        l_pos = 0
+        while l_pos < len(l_data):
+            l_len = min(len(l_data) - l_pos, self._buffer_size - self._buffer_len)
+            self.buffer[self._buffer_len:self._buffer_len + l_len] = l_data[l_pos:l_pos + l_len]
+            self._buffer_len += l_len
+            l_pos += l_len
+            if self._buffer_len == self._buffer_size:
+                self._write_buffer()
 
     def _write_buffer(self):
         if self._unpack_later:
-            self._write_file(''.join(self.buffer))
-        else:
-            for d in self.buffer:
-                self._write_file(self._vect_to_string(d))
+            self._write_file(b''.join(self._raw_buffer))
+            self._raw_buffer = []
+        elif self._buffer_len > 0:
+            self._write_file(self.buffer[:self._buffer_len].data)
+            self._buffer_len = 0
 
     def finish_saving(self):
         """Close the file, return a tuple -
         file`s name and number of samples."""
-        self._write_file(''.join(self.buffer[:(self._number_of_samples % BUF_SIZE)]))
+        self._write_buffer()
         return super(DataBufferedWriteProxy, self).finish_saving()
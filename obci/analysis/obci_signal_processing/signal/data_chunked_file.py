@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Chunked signal file format.
+
+Signal is stored in chunks of fixed number of samples (so of fixed duration),
+only the last chunk can be shorter. Every chunk can be compressed with zlib or
+lzma and has a CRC32 checksum of its uncompressed data. Chunk index
+(offsets, sizes, first sample timestamps, checksums) is stored at the end of
+the file, so finding a chunk containing given sample is a single division and
+finding a chunk containing given timestamp is a binary search.
+
+File layout (all numbers little-endian):
+- file header: magic, version, sample type, channels count, samples per chunk,
+  sampling frequency,
+- chunks: chunk header (marker, stored length, samples count, compression,
+  first sample timestamp, checksum) followed by chunk data,
+- index: one entry per chunk (offset of chunk header + chunk header fields),
+- footer: index offset, chunks count, index magic.
+
+Chunk data are interleaved samples (samples x channels) just like in raw
+.obci.raw files. Before compression bytes of the samples are shuffled (all
+first bytes of values, then all second bytes, ...) which makes float
+signals compress much better.
+
+If the writer did not finish (no valid footer), the index is rebuilt by
+scanning chunk headers.
+"""
+
+import lzma
+import os
+import struct
+import zlib
+
+import numpy
+
+from . import signal_constants
+from . import signal_exceptions
+from . import signal_logging as logger
+LOGGER = logger.get_logger("data_chunked_file", 'info')
+
+CHUNKED_FILE_EXTENSION = '.obci.chk'
+CHUNK_SAMPLES = 4096
+
+_MAGIC = b'OBCICHK1'
+_INDEX_MAGIC = b'OBCICIDX'
+_CHUNK_MARKER = b'CHNK'
+_VERSION = 1
+
+# magic, version, sample type, channels, samples per chunk, sampling frequency
+_HEADER = struct.Struct('<8sBBxxIId')
+# marker, stored length, samples, compression, first sample timestamp, crc32
+_CHUNK_HEADER = struct.Struct('<4sIIBxxxdI')
+# index offset, chunks count, index magic
+_FOOTER = struct.Struct('<QQ8s')
+_INDEX_DTYPE = numpy.dtype([('offset', '<u8'), ('stored_len', '<u4'), ('samples', '<u4'),
+                            ('compression', 'u1'), ('pad', 'V3'), ('first_ts', '<f8'), ('crc', '<u4')])
+
+_SAMPLE_TYPES = ['FLOAT', 'DOUBLE']
+_COMPRESSIONS = [None, 'zlib', 'lzma']
+
+
+def is_chunked_file(p_file_path):
+    """Return True if p_file_path is a chunked signal file."""
+    try:
+        with open(p_file_path, 'rb') as f:
+            return f.read(len(_MAGIC)) == _MAGIC
+    except IOError:
+        return False
+
+
+def _compress(p_data, p_compression, p_itemsize):
+    shuffled = numpy.frombuffer(p_data, numpy.uint8).reshape(-1, p_itemsize).T.tobytes()
+    if p_compression == 'zlib':
+        return zlib.compress(shuffled)
+    else:
+        return lzma.compress(shuffled)
+
+
+def _decompress(p_data, p_compression, p_itemsize):
+    if p_compression == 'zlib':
+        shuffled = zlib.decompress(p_data)
+    else:
+        shuffled = lzma.decompress(p_data)
+    return numpy.frombuffer(shuffled, numpy.uint8).reshape(p_itemsize, -1).T.tobytes()
+
+
+class ChunkedFileWriter(object):
+
+    """Write signal to a chunked signal file.
+    Public interface:
+    - write_samples(p_samples, p_timestamps) - append samples (channels x samples array),
+    - close() - write remaining samples and the index.
+    """
+
+    def __init__(self, p_file, p_num_of_channels, p_sample_type='FLOAT',
+                 p_chunk_samples=CHUNK_SAMPLES, p_compression=None, p_sampling_frequency=0.0):
+        """p_file can be a file path or a file object opened for binary writing.
+        p_compression can be None, 'zlib' or 'lzma'."""
+        if p_compression not in _COMPRESSIONS:
+            raise Exception("Unknown compression: " + str(p_compression))
+        try:
+            '' + p_file
+            self._file = open(p_file, 'wb')
+            self._own_file = True
+        except TypeError:
+            self._file = p_file
+            self._own_file = False
+
+        self._num_of_channels = p_num_of_channels
+        self._dtype = numpy.dtype('<' + signal_constants.SAMPLE_STRUCT_TYPES[p_sample_type])
+        self._chunk_samples = p_chunk_samples
+        self._compression = p_compression
+        self._buffer = numpy.empty((p_chunk_samples, p_num_of_channels), self._dtype)
+        self._buffer_len = 0
+        self._chunk_ts = float('nan')
+        self._index = []
+        self._number_of_samples = 0
+
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, _SAMPLE_TYPES.index(p_sample_type),
+                                      p_num_of_channels, p_chunk_samples, p_sampling_frequency))
+        self._offset = _HEADER.size
+
+    @property
+    def number_of_samples(self):
+        return self._number_of_samples
+
+    def write_samples(self, p_samples, p_timestamps=None):
+        """Append p_samples (channels x samples array).
+        p_timestamps - optional timestamps of samples, used in the chunk index."""
+        p_samples = numpy.asarray(p_samples)
+        if p_samples.ndim != 2 or p_samples.shape[0] != self._num_of_channels:
+            raise signal_exceptions.BadSampleFormat()
+        l_count = p_samples.shape[1]
+        l_pos = 0
+        while l_pos < l_count:
+            if self._buffer_len == 0 and p_timestamps is not None:
+                self._chunk_ts = float(p_timestamps[l_pos])
+            l_len = min(l_count - l_pos, self._chunk_samples - self._buffer_len)
+            self._buffer[self._buffer_len:self._buffer_len + l_len] = p_samples[:, l_pos:l_pos + l_len].T
+            self._buffer_len += l_len
+            l_pos += l_len
+            if self._buffer_len == self._chunk_samples:
+                self._write_chunk()
+        self._number_of_samples += l_count
+
+    def close(self):
+        """Write remaining samples, the index and the footer.
+        Close the file if it was opened by the writer."""
+        if self._buffer_len > 0:
+            self._write_chunk()
+        index = numpy.array(self._index, dtype=_INDEX_DTYPE)
+        self._file.write(index.tobytes())
+        self._file.write(_FOOTER.pack(self._offset, len(self._index), _INDEX_MAGIC))
+        self._file.flush()
+        if self._own_file:
+            self._file.close()
+
+    def _write_chunk(self):
+        data = self._buffer[:self._buffer_len].tobytes()
+        crc = zlib.crc32(data)
+        compression = self._compression
+        if compression is not None:
+            compressed = _compress(data, compression, self._dtype.itemsize)
+            if len(compressed) < len(data):
+                data = compressed
+            else:
+                compression = None
+        compression_code = _COMPRESSIONS.index(compression)
+        self._file.write(_CHUNK_HEADER.pack(_CHUNK_MARKER, len(data), self._buffer_len,
+                                            compression_code, self._chunk_ts, crc))
+        self._file.write(data)
+        self._index.append((self._offset, len(data), self._buffer_len, compression_code, b'',
+                            self._chunk_ts, crc))
+        self._offset += _CHUNK_HEADER.size + len(data)
+        self._buffer_len = 0
+        self._chunk_ts = float('nan')
+
+
+class ChunkedFileReader(object):
+
+    """Random access reader of a chunked signal file.
+    Public interface:
+    - get_samples(p_from, p_len) - channels x samples array of signal,
+    - get_chunk(p_index) - samples x channels array of one chunk,
+    - chunk_for_sample(p_sample), chunk_for_timestamp(p_ts) - chunk lookups.
+    """
+
+    def __init__(self, p_file_path):
+        self._file_path = p_file_path
+        self._file = open(p_file_path, 'rb')
+        try:
+            magic, version, sample_type, self.num_of_channels, self.chunk_samples, self.sampling_frequency = \
+                _HEADER.unpack(self._file.read(_HEADER.size))
+        except struct.error:
+            magic = None
+        if magic != _MAGIC:
+            self._file.close()
+            raise Exception("Not a chunked signal file: " + str(p_file_path))
+        self.sample_type = _SAMPLE_TYPES[sample_type]
+        self._dtype = numpy.dtype('<' + signal_constants.SAMPLE_STRUCT_TYPES[self.sample_type])
+
+        self._index = self._read_index()
+        self._starts = numpy.concatenate(([0], numpy.cumsum(self._index['samples'], dtype=numpy.int64)))
+        self.number_of_samples = int(self._starts[-1])
+        self._cached_chunk = (None, None)
+
+    @property
+    def chunks_count(self):
+        return len(self._index)
+
+    @property
+    def first_timestamps(self):
+        """Timestamps of first samples of chunks (nan if unknown)."""
+        return self._index['first_ts']
+
+    def close(self):
+        self._file.close()
+
+    def chunk_for_sample(self, p_sample):
+        """Return index of the chunk containing sample p_sample."""
+        if p_sample < 0 or p_sample >= self.number_of_samples:
+            raise signal_exceptions.NoNextValue()
+        return int(p_sample // self.chunk_samples)
+
+    def chunk_for_timestamp(self, p_ts):
+        """Return index of the chunk containing sample with timestamp p_ts."""
+        ind = int(numpy.searchsorted(self._index['first_ts'], p_ts, 'right')) - 1
+        if ind < 0:
+            raise signal_exceptions.NoNextValue()
+        return ind
+
+    def chunk_start(self, p_index):
+        """Return number of the first sample of chunk p_index."""
+        return int(self._starts[p_index])
+
+    def get_chunk(self, p_index):
+        """Return samples x channels array (of file sample type) of chunk p_index.
+        Raise BadChunk if the chunk is corrupted."""
+        if self._cached_chunk[0] == p_index:
+            return self._cached_chunk[1]
+        entry = self._index[p_index]
+        self._file.seek(int(entry['offset']) + _CHUNK_HEADER.size)
+        data = self._file.read(int(entry['stored_len']))
+        compression = _COMPRESSIONS[entry['compression']]
+        try:
+            if compression is not None:
+                data = _decompress(data, compression, self._dtype.itemsize)
+        except (zlib.error, lzma.LZMAError, ValueError):
+            raise signal_exceptions.BadChunk(p_index)
+        if zlib.crc32(data) != entry['crc']:
+            raise signal_exceptions.BadChunk(p_index)
+        chunk = numpy.frombuffer(data, self._dtype).reshape(-1, self.num_of_channels)
+        self._cached_chunk = (p_index, chunk)
+        return chunk
+
+    def get_samples(self, p_from=None, p_len=None):
+        """Return channels x samples float64 array of p_len samples starting at p_from
+        (all samples if p_from is None, samples to the end if p_len is None).
+        Only chunks overlapping the range are read.
+        Raise NoNextValue if the range exceeds the signal."""
+        if p_from is None:
+            p_from = 0
+        if p_len is None:
+            p_len = max(self.number_of_samples - p_from, 0)
+        if p_from < 0 or p_len < 0 or p_from + p_len > self.number_of_samples:
+            raise signal_exceptions.NoNextValue()
+        ret = numpy.empty((self.num_of_channels, p_len))
+        pos = 0
+        while pos < p_len:
+            ind = self.chunk_for_sample(p_from + pos)
+            chunk = self.get_chunk(ind)
+            start = p_from + pos - self.chunk_start(ind)
+            ln = min(p_len - pos, len(chunk) - start)
+            ret[:, pos:pos + ln] = chunk[start:start + ln].T
+            pos += ln
+        return ret
+
+    def _read_index(self):
+        file_len = os.fstat(self._file.fileno()).st_size
+        if file_len >= _HEADER.size + _FOOTER.size:
+            self._file.seek(file_len - _FOOTER.size)
+            index_offset, chunks_count, magic = _FOOTER.unpack(self._file.read(_FOOTER.size))
+            if magic == _INDEX_MAGIC and index_offset + chunks_count * _INDEX_DTYPE.itemsize + _FOOTER.size == file_len:
+                self._file.seek(index_offset)
+                return numpy.frombuffer(self._file.read(chunks_count * _INDEX_DTYPE.itemsize), _INDEX_DTYPE)
+        LOGGER.warning("No valid index in file " + str(self._file_path) + ". Rebuilding index from chunk headers...")
+        return self._scan_index(file_len)
+
+    def _scan_index(self, p_file_len):
+        index = []
+        offset = _HEADER.size
+        while offset + _CHUNK_HEADER.size <= p_file_len:
+            self._file.seek(offset)
+            marker, stored_len, samples, compression, first_ts, crc = \
+                _CHUNK_HEADER.unpack(self._file.read(_CHUNK_HEADER.size))
+            if marker != _CHUNK_MARKER or offset + _CHUNK_HEADER.size + stored_len > p_file_len:
+                break
+            index.append((offset, stored_len, samples, compression, b'', first_ts, crc))
+            offset += _CHUNK_HEADER.size + stored_len
+        return numpy.array(index, dtype=_INDEX_DTYPE)
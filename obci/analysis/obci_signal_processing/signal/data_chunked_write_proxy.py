@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import numpy
+
+from obci.configs import variables_pb2
+
+from .data_generic_write_proxy import DataGenericWriteProxy
+from . import data_chunked_file
+from . import signal_logging as logger
+LOGGER = logger.get_logger("data_chunked_write_proxy", 'info')
+
+
+class DataChunkedWriteProxy(DataGenericWriteProxy):
+
+    """
+    Write proxy saving signal in chunked signal file format
+    (see data_chunked_file). Timestamps of received samples are
+    stored in the chunk index, so they can`t be appended as a channel.
+    """
+
+    def __init__(self, p_file_path, p_unpack_later=False, p_append_ts=False, p_sample_type='FLOAT',
+                 p_chunk_samples=data_chunked_file.CHUNK_SAMPLES, p_compression=None, p_sampling_frequency=0.0):
+        """Open p_file_path file.
+        p_chunk_samples - number of samples in one chunk,
+        p_compression - None, 'zlib' or 'lzma'."""
+        if p_append_ts:
+            raise ValueError("Appending timestamps is not supported for chunked files, "
+                             "timestamps are stored in the chunk index.")
+        if p_unpack_later:
+            LOGGER.warning("Temporary file is not supported for chunked files and will not be used.")
+        super(DataChunkedWriteProxy, self).__init__(p_file_path, False, False, p_sample_type)
+        self._sample_type = p_sample_type
+        self._chunk_samples = p_chunk_samples
+        self._compression = p_compression
+        self._sampling_frequency = p_sampling_frequency
+        # created on first packet, when number of channels is known
+        self._writer = None
+
+    def data_received(self, p_data):
+        """ p_data must be protobuf SampleVector message, but serialized to string."""
+        l_vec = variables_pb2.SampleVector()
+        l_vec.ParseFromString(p_data)
+        l_samples = l_vec.samples
+        self._number_of_samples = self._number_of_samples + 1
+        l_data = self._samples_to_array(l_samples)
+        if len(l_data) == 0:
+            return
+        if self._writer is None:
+            self._writer = data_chunked_file.ChunkedFileWriter(
+                self._file, l_data.shape[1], self._sample_type, self._chunk_samples,
+                self._compression, self._sampling_frequency)
+        l_ts = numpy.fromiter((s.timestamp for s in l_samples), numpy.float64, len(l_samples))
+        self._writer.write_samples(l_data.T, l_ts)
+
+    def finish_saving(self):
+        """Write remaining samples and the chunk index, close the file,
+        return a tuple - file`s name and number of samples.
+        If no samples were received the file has no channels."""
+        if self._writer is None:
+            # no data received, write a valid file without channels
+            self._writer = data_chunked_file.ChunkedFileWriter(
+                self._file, 0, self._sample_type, self._chunk_samples,
+                self._compression, self._sampling_frequency)
+        self._writer.close()
+        return super(DataChunkedWriteProxy, self).finish_saving()
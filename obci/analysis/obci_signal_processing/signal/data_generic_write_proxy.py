@@ -3,9 +3,11 @@
 #     Mateusz Kruszyński <mateusz.kruszynski@gmail.com>
 #
 
-import struct
 import sys
 import os.path
+
+import numpy
+
 from obci.configs import variables_pb2
 
 from . import signal_exceptions
@@ -35,6 +37,7 @@ class DataGenericWriteProxy(object):
         self._append_ts = p_append_ts
         self._file_path = p_file_path
         self._sample_struct_type = SAMPLE_STRUCT_TYPES[p_sample_type]
+        self._sample_dtype = numpy.dtype('<' + self._sample_struct_type)
 
         try:
             if self._unpack_later:
@@ -76,9 +79,9 @@ class DataGenericWriteProxy(object):
 
     def _unpack_and_finish(self):
 
-        final_file = open(self._file_path, 'w')
+        final_file = open(self._file_path, 'wb')
         # Open once more temporary file with protobuf data
-        temp_file = open(self._file_path + '.tmp', 'r')
+        temp_file = open(self._file_path + '.tmp', 'rb')
         while True:
             msg = temp_file.read(self._data_len)
             if len(msg) == 0:
@@ -105,19 +108,34 @@ class DataGenericWriteProxy(object):
             return
 
     def _vect_to_string(self, p_mx_vect):
+        """Encode SampleVector p_mx_vect as binary samples.
+        All samples of the vector are packed into one array and converted to bytes at once."""
+        return self._vect_to_array(p_mx_vect).astype(self._sample_dtype).tobytes()
+
+    def _vect_to_array(self, p_mx_vect):
+        """Decode SampleVector p_mx_vect into float64 array of shape
+        (samples, channels[+timestamp])."""
         l_vec = variables_pb2.SampleVector()
         l_vec.ParseFromString(p_mx_vect)
-        samples = []
-        for j in range(len(l_vec.samples)):
-            s = l_vec.samples[j]
-            ts = s.timestamp
-            try:
-                strs = [struct.pack(self._sample_struct_type, ch) for ch in s.channels]
-                if self._append_ts:
-                    strs.append(struct.pack(self._sample_struct_type, ts - self.first_sample_timestamp))
-            except struct.error:
-                LOGGER.error("Error while writhing to file. Bad sample format.")
-                raise signal_exceptions.BadSampleFormat()
-
-            samples.append(b''.join(strs))
-        return b''.join(samples)
+        return self._samples_to_array(l_vec.samples)
+
+    def _samples_to_array(self, l_samples):
+        """Convert parsed samples into float64 array of shape
+        (samples, channels[+timestamp])."""
+        if len(l_samples) == 0:
+            return numpy.empty((0, 0))
+        try:
+            l_data = numpy.array([s.channels for s in l_samples], dtype=numpy.float64)
+            if l_data.ndim != 2:
+                raise ValueError("Samples have different number of channels.")
+            if self._append_ts:
+                l_ts = numpy.fromiter((s.timestamp for s in l_samples), numpy.float64, len(l_samples))
+                l_data = numpy.column_stack((l_data, l_ts - self.first_sample_timestamp))
+            if self._sample_dtype.itemsize < l_data.itemsize:
+                l_max = numpy.finfo(self._sample_dtype).max
+                if (numpy.abs(l_data[numpy.isfinite(l_data)]) > l_max).any():
+                    raise ValueError("Sample value out of range.")
+        except ValueError:
+            LOGGER.error("Error while writhing to file. Bad sample format.")
+            raise signal_exceptions.BadSampleFormat()
+        return l_data
@@ -23,6 +23,7 @@ class DataReadProxy(object):
         self._file_path = p_file_path
         self._sample_size = SAMPLE_SIZES[sample_type]
         self._sample_struct_type = '<' + SAMPLE_STRUCT_TYPES[sample_type]
+        self._dtype = np.dtype(self._sample_struct_type)
         self.start_reading()
 
     def start_reading(self):
@@ -47,19 +48,9 @@ class DataReadProxy(object):
                     ["Remained samples ", str(f_len - ch_len * self._sample_size * p_channels_num),
                      " .Should be 0."]))
 
-        vals = np.zeros((p_channels_num, ch_len))
-        k = 0
-        while True:
-            try:
-                r = np.fromfile(self._data_file, self._sample_struct_type, p_channels_num)
-            except MemoryError:
-                break
-            if len(r) < p_channels_num:
-                break
-            for i in range(p_channels_num):
-                vals[i, k] = r[i]
-            k += 1
-        return vals
+        r = np.fromfile(self._data_file, self._dtype, ch_len * p_channels_num)
+        # samples are interleaved in file - transpose to channels x samples
+        return r.reshape(ch_len, p_channels_num).T.astype(np.float64, order='C')
 
     def get_next_value(self):
         """Return next value from data file (as python float).
@@ -83,14 +74,9 @@ class DataReadProxy(object):
         l_raw_data = self._data_file.read(self._sample_size * p_num)
         # LOGGER.debug("After read. CURRENT POSITION/8 = "+str(self._data_file.tell()/8))
 
-        # Initialize return array
-        l_ret = np.zeros(p_num)
         if (len(l_raw_data) == self._sample_size * p_num):
             # If all data required for return array is present
-            for i in range(p_num):
-                l_ret[i] = struct.unpack(self._sample_struct_type,
-                                         l_raw_data[self._sample_size * i:self._sample_size * (i + 1)])[0]
-            return l_ret
+            return np.frombuffer(l_raw_data, self._dtype, p_num).astype(np.float64)
         else:
             # Either len(l_raw_data) is 0 and its ok -> EOF
             # or len(l_raw_data) > 0 and its last len(l_raw_data) data from the file.
@@ -102,6 +88,49 @@ class DataReadProxy(object):
                                  ". No next value."]))
             raise signal_exceptions.NoNextValue()
 
+    def get_windows(self, p_froms, p_len, p_channels_num=1):
+        """Return windows of p_len samples starting at samples p_froms
+        as a 3-dim numpy array (windows x channels x samples).
+        Every window is read with a single readinto() call into one
+        preallocated buffer.
+        Raise NoNextValue exception if any window exceeds the data file."""
+        assert(p_channels_num > 0)
+        p_froms = np.asarray(p_froms, dtype=np.int64).reshape(-1)
+        win_size = self._sample_size * p_len * p_channels_num
+        buf = np.empty((len(p_froms), p_len, p_channels_num), self._dtype)
+        for i, i_from in enumerate(p_froms):
+            if i_from < 0:
+                raise signal_exceptions.NoNextValue()
+            self._data_file.seek(int(i_from) * self._sample_size * p_channels_num)
+            if self._data_file.readinto(buf[i]) != win_size:
+                LOGGER.info("Window starting at sample " + str(i_from) + " exceeds data file. No next value.")
+                raise signal_exceptions.NoNextValue()
+        return buf.transpose(0, 2, 1).astype(np.float64, order='C')
+
+    def get_channels_values(self, p_channels, p_channels_num, p_from=0, p_len=None, p_chunk_len=65536):
+        """Return values of channels p_channels (list of indices) for p_len
+        samples starting at sample p_from as a 2-dim numpy array
+        (channels x samples). If p_len is None read to the end of file.
+        Data is read in chunks of p_chunk_len samples and only requested
+        channels are copied to the result array, which is allocated once.
+        Raise NoNextValue exception if requested range exceeds the data file."""
+        assert(p_channels_num > 0)
+        p_channels = np.asarray(p_channels, dtype=np.int64).reshape(-1)
+        ch_len = os.path.getsize(self._file_path) // (self._sample_size * p_channels_num)
+        if p_len is None:
+            p_len = max(ch_len - p_from, 0)
+        if p_from < 0 or p_from + p_len > ch_len:
+            raise signal_exceptions.NoNextValue()
+        ret = np.empty((len(p_channels), p_len), np.float64)
+        self._data_file.seek(p_from * self._sample_size * p_channels_num)
+        for i_from in range(0, p_len, p_chunk_len):
+            chunk_len = min(p_chunk_len, p_len - i_from)
+            chunk = np.fromfile(self._data_file, self._dtype, chunk_len * p_channels_num)
+            if len(chunk) != chunk_len * p_channels_num:
+                raise signal_exceptions.NoNextValue()
+            ret[:, i_from:i_from + chunk_len] = chunk.reshape(chunk_len, p_channels_num)[:, p_channels].T
+        return ret
+
     def goto_value(self, p_value_no):
         """Set the engine, so that nex 'get_next_value' call will return
         value number p_value_no+1.
@@ -2,7 +2,9 @@
 # Author:
 #     Mateusz Kruszyński <mateusz.kruszynski@gmail.com>
 #
+from . import data_async_write_proxy
 from . import data_buffered_write_proxy
+from . import data_chunked_write_proxy
 from . import data_simple_write_proxy
 from . import data_raw_write_proxy
 from . import data_asci_write_proxy
@@ -11,11 +13,20 @@ from . import signal_logging as logger
 LOGGER = logger.get_logger("data_write_proxy", 'info')
 
 
-def get_proxy(file_path, append_ts=False, use_tmp_file=False, use_own_buffer=False, format='FLOAT'):
+def get_proxy(file_path, append_ts=False, use_tmp_file=False, use_own_buffer=False, format='FLOAT',
+              use_async_writer=False, buffer_size=data_buffered_write_proxy.BUF_SIZE,
+              use_chunked_format=False, compression=None, sampling_frequency=0.0):
     if format == 'FLOAT' or format == 'DOUBLE':
-        if use_own_buffer:
-            return data_buffered_write_proxy.DataBufferedWriteProxy(
+        if use_chunked_format:
+            return data_chunked_write_proxy.DataChunkedWriteProxy(
+                file_path, use_tmp_file, append_ts, format,
+                p_compression=compression, p_sampling_frequency=sampling_frequency)
+        elif use_async_writer:
+            return data_async_write_proxy.DataAsyncWriteProxy(
                 file_path, use_tmp_file, append_ts, format)
+        elif use_own_buffer:
+            return data_buffered_write_proxy.DataBufferedWriteProxy(
+                file_path, use_tmp_file, append_ts, format, buffer_size)
         else:
             return data_simple_write_proxy.DataSimpleWriteProxy(
                 file_path, use_tmp_file, append_ts, format)
@@ -4,20 +4,60 @@
 #
 import numpy
 import copy
+import os.path
 from . import data_read_proxy
+from . import data_chunked_file
+from . import signal_constants
 from . import signal_logging as logger
 from . import signal_exceptions
 LOGGER = logger.get_logger("data_source", "info")
 
 
+def _get_channels(p_data, p_channels, p_from, p_len):
+    """Return rows p_channels of p_data (channels x samples) for p_len samples
+    starting at p_from (whole signal if p_from is None) in one allocation."""
+    if p_from is None:
+        return p_data[p_channels, :]
+    if p_from < 0 or p_from + p_len > p_data.shape[1]:
+        raise signal_exceptions.NoNextValue()
+    return p_data[p_channels, p_from:(p_from + p_len)]
+
+
+def _get_windows(p_data, p_froms, p_len):
+    """Return windows of p_len samples starting at samples p_froms cut from
+    p_data (channels x samples) as a 3-dim array (windows x channels x samples).
+    All windows are gathered with a single fancy indexing operation."""
+    p_froms = numpy.asarray(p_froms, dtype=numpy.int64).reshape(-1)
+    if len(p_froms) > 0 and (p_froms.min() < 0 or p_froms.max() + p_len > p_data.shape[1]):
+        raise signal_exceptions.NoNextValue()
+    idx = p_froms[:, numpy.newaxis] + numpy.arange(p_len)
+    return p_data[:, idx].transpose(1, 0, 2)
+
+
 class DataSource(object):
 
     def get_samples(self, p_from=None, p_len=None):
         LOGGER.error("The method must be subclassed")
 
+    def get_samples_windows(self, p_froms, p_len):
+        """Return windows of p_len samples starting at samples p_froms
+        as a 3-dim array (windows x channels x samples).
+        Raise NoNextValue if any of windows is out of range."""
+        return numpy.array([self.get_samples(i_from, p_len) for i_from in p_froms])
+
+    def get_channels_samples(self, p_channels, p_from=None, p_len=None):
+        """Return a 2-dim array (channels x samples) of samples for channels
+        with indices p_channels only.
+        Raise NoNextValue if p_from, p_len is out of range."""
+        return numpy.array(self.get_samples(p_from, p_len)[list(p_channels)])
+
     def iter_samples(self):
         LOGGER.error("The method must be subclassed")
 
+    def close(self):
+        """Close files opened by the data source."""
+        pass
+
     def __deepcopy(self, memo):
         return MemoryDataSource(copy.deepcopy(self.get_samples()))
 
@@ -53,11 +93,17 @@ class MemoryDataSource(DataSource):
             return self._data
         else:
             ret = self._data[:, p_from:(p_from + p_len)]
-            if ret.shape[1] != p_len:
+            if p_from < 0 or ret.shape[1] != p_len:
                 raise signal_exceptions.NoNextValue()
             else:
                 return ret
 
+    def get_samples_windows(self, p_froms, p_len):
+        return _get_windows(self._data, p_froms, p_len)
+
+    def get_channels_samples(self, p_channels, p_from=None, p_len=None):
+        return _get_channels(self._data, list(p_channels), p_from, p_len)
+
     def iter_samples(self):
         for i in range(len(self._data[0])):
             yield self._data[:, i]
@@ -92,11 +138,27 @@ class FileDataSource(DataSource):
         else:
             # we dont have data in-memory
             # only a piece of data is requested
-
+            if p_from < 0:
+                raise signal_exceptions.NoNextValue()
             self._data_proxy.goto_value(p_from * self._num_of_channels)
             d = self._data_proxy.get_next_values(self._num_of_channels * p_len)
             return numpy.reshape(d, (self._num_of_channels, -1), 'f')
 
+    def get_samples_windows(self, p_froms, p_len):
+        if self._mem_source:
+            return self._mem_source.get_samples_windows(p_froms, p_len)
+        else:
+            # read only requested windows straight from the file
+            return self._data_proxy.get_windows(p_froms, p_len, self._num_of_channels)
+
+    def get_channels_samples(self, p_channels, p_from=None, p_len=None):
+        if self._mem_source:
+            return self._mem_source.get_channels_samples(p_channels, p_from, p_len)
+        else:
+            # copy only requested channels from the file
+            return self._data_proxy.get_channels_values(
+                list(p_channels), self._num_of_channels, p_from or 0, p_len)
+
     def set_samples(self, samples, copy):
         if self._mem_source is None:
             self._mem_source = MemoryDataSource(samples, copy)
@@ -118,3 +180,206 @@ class FileDataSource(DataSource):
                 except signal_exceptions.NoNextValue:
                     self._data_proxy.finish_reading()
                     break
+
+
+class MemmapDataSource(DataSource):
+
+    """Data source backed by a read-only memory map of the data file.
+
+    Nothing is read on creation - get_samples() returns channels x samples
+    views of the mapped file with on-disk dtype (float32 for FLOAT files),
+    pages are loaded by the OS on access.
+    """
+
+    def __init__(self, p_file, p_num_of_channels, p_sample_type="FLOAT"):
+        assert(p_num_of_channels > 0)
+        self._num_of_channels = p_num_of_channels
+        self._mem_source = None
+        self._file_path = p_file
+
+        dtype = numpy.dtype('<' + signal_constants.SAMPLE_STRUCT_TYPES[p_sample_type])
+        f_len = os.path.getsize(p_file)
+        ch_len = f_len // (dtype.itemsize * p_num_of_channels)
+        if ch_len * dtype.itemsize * p_num_of_channels != f_len:
+            LOGGER.info(''.join(["Remained samples ",
+                                 str(f_len - ch_len * dtype.itemsize * p_num_of_channels),
+                                 " .Should be 0."]))
+        if ch_len == 0:
+            # empty files can`t be mapped
+            self._memmap = numpy.zeros((0, p_num_of_channels), dtype)
+        else:
+            self._memmap = numpy.memmap(p_file, dtype, 'r', shape=(ch_len, p_num_of_channels))
+        # samples are interleaved in file, so transposed map is a channels x samples view
+        self._data = self._memmap.T
+
+    def get_samples(self, p_from=None, p_len=None):
+        if self._mem_source:
+            return self._mem_source.get_samples(p_from, p_len)
+        elif p_from is None:
+            return self._data
+        else:
+            ret = self._data[:, p_from:(p_from + p_len)]
+            if p_from < 0 or ret.shape[1] != p_len:
+                raise signal_exceptions.NoNextValue()
+            else:
+                return ret
+
+    def get_samples_windows(self, p_froms, p_len):
+        if self._mem_source:
+            return self._mem_source.get_samples_windows(p_froms, p_len)
+        else:
+            return _get_windows(self._data, p_froms, p_len)
+
+    def get_channels_samples(self, p_channels, p_from=None, p_len=None):
+        if self._mem_source:
+            return self._mem_source.get_channels_samples(p_channels, p_from, p_len)
+        else:
+            return _get_channels(self._data, list(p_channels), p_from, p_len)
+
+    def set_samples(self, samples, copy):
+        if self._mem_source is None:
+            self._mem_source = MemoryDataSource(samples, copy)
+        else:
+            self._mem_source.set_samples(samples, copy)
+
+    def iter_samples(self):
+        if self._mem_source:
+            for samp in self._mem_source.iter_samples():
+                yield samp
+        else:
+            for i in range(self._data.shape[1]):
+                yield self._data[:, i]
+
+    def __deepcopy__(self, memo):
+        return MemoryDataSource(numpy.array(self.get_samples()))
+
+
+class ChunkedFileDataSource(DataSource):
+
+    """Data source reading chunked signal files (see data_chunked_file).
+    Only chunks overlapping requested samples are read and decompressed."""
+
+    def __init__(self, p_file):
+        self._mem_source = None
+        try:
+            '' + p_file
+            LOGGER.debug("Got file path.")
+            self._reader = data_chunked_file.ChunkedFileReader(p_file)
+            self._own_reader = True
+        except TypeError:
+            LOGGER.debug("Got file reader.")
+            self._reader = p_file
+            self._own_reader = False
+
+    def close(self):
+        """Close the reader if it was opened by the data source."""
+        if self._own_reader:
+            self._reader.close()
+
+    def get_samples(self, p_from=None, p_len=None):
+        if self._mem_source:
+            return self._mem_source.get_samples(p_from, p_len)
+        elif p_from is None:
+            LOGGER.info("All data set requested for the first time. Start reading all data from the file...")
+            self._mem_source = MemoryDataSource(self._reader.get_samples(), False)
+            return self._mem_source.get_samples()
+        else:
+            return self._reader.get_samples(p_from, p_len)
+
+    def get_samples_windows(self, p_froms, p_len):
+        if self._mem_source:
+            return self._mem_source.get_samples_windows(p_froms, p_len)
+        ret = numpy.empty((len(p_froms), self._reader.num_of_channels, p_len))
+        for i, i_from in enumerate(p_froms):
+            ret[i] = self._reader.get_samples(i_from, p_len)
+        return ret
+
+    def get_channels_samples(self, p_channels, p_from=None, p_len=None):
+        if self._mem_source:
+            return self._mem_source.get_channels_samples(p_channels, p_from, p_len)
+        else:
+            return self._reader.get_samples(p_from, p_len)[list(p_channels)]
+
+    def set_samples(self, samples, copy):
+        if self._mem_source is None:
+            self._mem_source = MemoryDataSource(samples, copy)
+        else:
+            self._mem_source.set_samples(samples, copy)
+
+    def iter_samples(self):
+        if self._mem_source:
+            for samp in self._mem_source.iter_samples():
+                yield samp
+        else:
+            for i in range(self._reader.chunks_count):
+                for samp in self._reader.get_chunk(i):
+                    yield numpy.array(samp, dtype=numpy.float64)
+
+    def __deepcopy__(self, memo):
+        return MemoryDataSource(numpy.array(self.get_samples()))
+
+
+class ViewDataSource(DataSource):
+
+    """Data source of p_len samples of p_parent data source starting at sample p_from.
+
+    Nothing is read or copied on creation. On first access a read-only
+    channels x samples view of the parent`s data is taken and kept, so for
+    memory and memory mapped parents no samples are copied at all.
+    """
+
+    def __init__(self, p_parent, p_from, p_len):
+        self._parent = p_parent
+        self._from = p_from
+        self._len = p_len
+        self._data = None
+        self._mem_source = None
+
+    def _get_data(self):
+        if self._data is None:
+            data = self._parent.get_samples(self._from, self._len)
+            self._data = data.view()
+            self._data.flags.writeable = False
+        return self._data
+
+    def get_samples(self, p_from=None, p_len=None):
+        if self._mem_source:
+            return self._mem_source.get_samples(p_from, p_len)
+        elif p_from is None:
+            return self._get_data()
+        else:
+            ret = self._get_data()[:, p_from:(p_from + p_len)]
+            if p_from < 0 or ret.shape[1] != p_len:
+                raise signal_exceptions.NoNextValue()
+            else:
+                return ret
+
+    def get_samples_windows(self, p_froms, p_len):
+        if self._mem_source:
+            return self._mem_source.get_samples_windows(p_froms, p_len)
+        else:
+            return _get_windows(self._get_data(), p_froms, p_len)
+
+    def get_channels_samples(self, p_channels, p_from=None, p_len=None):
+        if self._mem_source:
+            return self._mem_source.get_channels_samples(p_channels, p_from, p_len)
+        else:
+            return _get_channels(self._get_data(), list(p_channels), p_from, p_len)
+
+    def set_samples(self, samples, copy):
+        if self._mem_source is None:
+            self._mem_source = MemoryDataSource(samples, copy)
+        else:
+            self._mem_source.set_samples(samples, copy)
+
+    def iter_samples(self):
+        if self._mem_source:
+            for samp in self._mem_source.iter_samples():
+                yield samp
+        else:
+            data = self._get_data()
+            for i in range(data.shape[1]):
+                yield data[:, i]
+
+    def __deepcopy__(self, memo):
+        return MemoryDataSource(numpy.array(self.get_samples()))
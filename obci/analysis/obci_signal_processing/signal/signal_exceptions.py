@@ -53,3 +53,15 @@ class BadSampleFormat(Exception):
 
     def __str__(self):
         return "Error! Received data sample is not of 'float' type! Writing to file aborted!"
+
+
+class BadChunk(Exception):
+
+    """Raised when a chunk of chunked data file is corrupted
+    (can`t be decompressed or its checksum doesn`t match)."""
+
+    def __init__(self, p_chunk):
+        self._chunk = p_chunk
+
+    def __str__(self):
+        return "Chunk " + str(self._chunk) + " of data file is corrupted!"
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution min/max/mean pyramid of a signal.
+
+Pyramid is stored in a sidecar file next to the data file. For every
+decimation level (for example 10, 100, 1000) it keeps, for every channel,
+minimum, maximum and mean of consecutive bins of `level` samples, so an
+overview of a long recording can be drawn without reading all samples.
+
+File layout (little-endian): magic, number of levels, number of channels,
+number of samples, then (level, number of bins) for every level, followed by
+float32 arrays of shape (3, channels, bins) - min, max and mean - for every
+level. Level arrays are memory mapped on reading.
+
+Usage: python3 -m obci.analysis.obci_signal_processing.signal.signal_pyramid info_file data_file [pyramid_file]
+"""
+
+import math
+import struct
+import sys
+
+import numpy
+
+from . import signal_exceptions
+from . import signal_logging as logger
+LOGGER = logger.get_logger("signal_pyramid", 'info')
+
+PYRAMID_FILE_EXTENSION = '.obci.pyr'
+LEVELS = (10, 100, 1000)
+BLOCK_LEN = 1000 * 256
+
+_MAGIC = b'OBCIPYR1'
+# magic, levels count, channels, samples
+_HEADER = struct.Struct('<8sIIQ')
+# level, bins
+_LEVEL = struct.Struct('<IQ')
+_DTYPE = numpy.dtype('<f4')
+
+
+def _decimate(p_samples, p_level):
+    """Return (3, channels, bins) array of min, max and mean of bins
+    of p_level samples of p_samples (channels x samples).
+    Last bin can be shorter."""
+    ch, ln = p_samples.shape
+    bins = -(-ln // p_level)
+    ret = numpy.empty((3, ch, bins), _DTYPE)
+    full = ln // p_level
+    if full > 0:
+        v = p_samples[:, :full * p_level].reshape(ch, full, p_level)
+        ret[0, :, :full] = v.min(axis=2)
+        ret[1, :, :full] = v.max(axis=2)
+        ret[2, :, :full] = v.mean(axis=2)
+    if bins > full:
+        v = p_samples[:, full * p_level:]
+        ret[0, :, full] = v.min(axis=1)
+        ret[1, :, full] = v.max(axis=1)
+        ret[2, :, full] = v.mean(axis=1)
+    return ret
+
+
+def _lcm(p_numbers):
+    """Return least common multiple of p_numbers."""
+    ret = 1
+    for i_number in p_numbers:
+        ret = ret * i_number // math.gcd(ret, i_number)
+    return ret
+
+
+def build_pyramid(p_data_source, p_number_of_samples, p_file_path, p_levels=LEVELS, p_block_len=BLOCK_LEN):
+    """Build min/max/mean pyramid of p_number_of_samples samples
+    of p_data_source and write it to p_file_path.
+    Data is read in blocks of about p_block_len samples, every level of
+    a block is written to the file at once, so only one block is kept in memory."""
+    p_levels = sorted(int(i_level) for i_level in p_levels)
+    # blocks must consist of whole bins of every level
+    step = _lcm(p_levels)
+    block_len = max(p_block_len // step, 1) * step
+    bins = [-(-p_number_of_samples // i_level) for i_level in p_levels]
+    samples = None
+    num_of_channels = 0
+    if p_number_of_samples > 0:
+        samples = p_data_source.get_samples(0, min(block_len, p_number_of_samples))
+        num_of_channels = samples.shape[0]
+
+    offset = _HEADER.size + len(p_levels) * _LEVEL.size
+    with open(p_file_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(p_levels), num_of_channels, p_number_of_samples))
+        for i_level, i_bins in zip(p_levels, bins):
+            f.write(_LEVEL.pack(i_level, i_bins))
+        # preallocate level arrays
+        f.truncate(offset + 3 * num_of_channels * sum(bins) * _DTYPE.itemsize)
+
+    levels = []
+    for i_level, i_bins in zip(p_levels, bins):
+        if i_bins > 0 and num_of_channels > 0:
+            levels.append((i_level, numpy.memmap(p_file_path, _DTYPE, 'r+', offset, (3, num_of_channels, i_bins))))
+        offset += 3 * num_of_channels * i_bins * _DTYPE.itemsize
+
+    for i_from in range(0, p_number_of_samples, block_len):
+        if i_from > 0:
+            samples = p_data_source.get_samples(i_from, min(block_len, p_number_of_samples - i_from))
+        for i_level, i_data in levels:
+            i_part = _decimate(samples, i_level)
+            i_data[:, :, i_from // i_level:i_from // i_level + i_part.shape[2]] = i_part
+    for i_level, i_data in levels:
+        i_data.flush()
+    del levels
+    LOGGER.info("Pyramid with levels " + str(p_levels) + " written to " + str(p_file_path))
+    return SignalPyramid(p_file_path)
+
+
+class SignalPyramid(object):
+
+    """Reader of a min/max/mean pyramid file.
+    Public interface:
+    - choose_level(p_len, p_width) - level to use to draw p_len samples on p_width pixels,
+    - get_level(p_level, p_from, p_len) - min, max and mean arrays of the level.
+    """
+
+    def __init__(self, p_file_path):
+        with open(p_file_path, 'rb') as f:
+            magic, levels_count, self.num_of_channels, self.number_of_samples = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise Exception("Not a pyramid file: " + str(p_file_path))
+            levels = [_LEVEL.unpack(f.read(_LEVEL.size)) for i in range(levels_count)]
+
+        self.levels = [i_level for i_level, bins in levels]
+        self._data = {}
+        offset = _HEADER.size + levels_count * _LEVEL.size
+        for i_level, bins in levels:
+            if bins > 0:
+                self._data[i_level] = numpy.memmap(p_file_path, _DTYPE, 'r', offset, (3, self.num_of_channels, bins))
+            else:
+                self._data[i_level] = numpy.zeros((3, self.num_of_channels, 0), _DTYPE)
+            offset += 3 * self.num_of_channels * bins * _DTYPE.itemsize
+
+    def choose_level(self, p_len, p_width):
+        """Return the coarsest level giving at least p_width bins
+        for p_len samples, or None if raw samples should be used."""
+        ret = None
+        for i_level in self.levels:
+            if p_len // i_level >= p_width:
+                ret = i_level
+        return ret
+
+    def get_level(self, p_level, p_from=None, p_len=None):
+        """Return (min, max, mean) arrays (channels x bins) of level p_level
+        for bins covering samples from p_from to p_from + p_len
+        (all samples if p_from is None)."""
+        data = self._data[p_level]
+        if p_from is None:
+            return data[0], data[1], data[2]
+        if p_from < 0 or p_from + p_len > self.number_of_samples:
+            raise signal_exceptions.NoNextValue()
+        ret = data[:, :, p_from // p_level:-(-(p_from + p_len) // p_level)]
+        return ret[0], ret[1], ret[2]
+
+
+if __name__ == '__main__':
+    from obci.analysis.obci_signal_processing import read_manager
+    if len(sys.argv) > 3:
+        out = sys.argv[3]
+    else:
+        out = sys.argv[2] + PYRAMID_FILE_EXTENSION
+    with read_manager.ReadManager(sys.argv[1], sys.argv[2], None) as mgr:
+        mgr.build_pyramid(out)
@@ -7,14 +7,22 @@
 import queue
 from functools import cmp_to_key
 
+import numpy
+
 from .tags import smart_tag
+from .tags import read_tags_source
 from . import read_manager
+from .signal import read_data_source
 from .signal import signal_exceptions
 from . import obci_signal_processing_logging as logger
 
 
 LOGGER = logger.get_logger("smart_tags_manager", "info")
 
+EPOCHS_INFO_DTYPE = numpy.dtype([('start_timestamp', numpy.float64), ('end_timestamp', numpy.float64),
+                                 ('start_sample', numpy.int64), ('end_sample', numpy.int64),
+                                 ('name', object), ('tag', object)])
+
 
 class SmartTagsManager(object):
 
@@ -24,9 +32,11 @@ class SmartTagsManager(object):
     Public interface:
     - __init__()
     - iter_smart_tags()
+    - get_epochs() - data of all smart tags as one array
     """
 
-    def __init__(self, p_tag_def, p_info_file, p_data_file, p_tags_file, p_read_manager=None):
+    def __init__(self, p_tag_def, p_info_file, p_data_file, p_tags_file, p_read_manager=None, p_memmap=False,
+                 p_lazy=False):
         """Init all needed slots, read tags file, init smart tags.
         Parameters:
         - p_tag_def - an instance of tag definition object
@@ -35,6 +45,11 @@ class SmartTagsManager(object):
         'info' - info file
         'data' - data file
         'tags' - tags file
+        - p_memmap - if True data file is memory mapped (see ReadManager)
+        - p_lazy - if True smart tags don`t get copies of their samples,
+        but read-only views of the signal taken on first data access
+        (see read_data_source.ViewDataSource); with p_memmap or in-memory
+        data overlapping smart tags don`t use any additional memory
         """
 
         if p_read_manager is None:
@@ -42,7 +57,8 @@ class SmartTagsManager(object):
             self._read_manager = read_manager.ReadManager(
                 p_info_file,
                 p_data_file,
-                p_tags_file)
+                p_tags_file,
+                p_memmap)
         else:
             self._read_manager = p_read_manager
 
@@ -63,7 +79,10 @@ class SmartTagsManager(object):
         except AttributeError:
             pass
 
+        self._lazy = p_lazy
         self._smart_tags = []
+        # tags source of iterated smart tags, keeps tags index between get_smart_tags() calls
+        self._smart_tags_source = None
         self._init_smart_tags(p_tag_def)
 
     def __str__(self):
@@ -145,9 +164,11 @@ class SmartTagsManager(object):
             self._smart_tags.append(st)
 
     def get_smart_tags(self, p_tag_type=None, p_from=None, p_len=None, p_func=None):
-        sts = [t for t in self.iter_smart_tags()]
-        return self.get_read_manager().tags_source._filter_tags(
-            sts, p_tag_type, p_from, p_len, p_func)
+        """Return a list of smart tags filtered like in ReadManager.get_tags().
+        Smart tags are iterated and indexed only on the first call."""
+        if self._smart_tags_source is None:
+            self._smart_tags_source = read_tags_source.MemoryTagsSource(list(self.iter_smart_tags()))
+        return list(self._smart_tags_source.get_tags(p_tag_type, p_from, p_len, p_func))
 
     def iter_smart_tags(self):
         """
@@ -188,7 +209,10 @@ class SmartTagsManager(object):
                 # self._read_manager.goto_value(
                 #    self.num_of_channels*l_samples_to_start)
                 LOGGER.debug("SAMPLES NO START: " + str(l_samples_to_start))
-                l_data = self._read_manager.get_samples(l_samples_to_start, (l_samples_to_end - l_samples_to_start))
+                if self._lazy:
+                    self._check_samples(l_samples_to_start, l_samples_to_end - l_samples_to_start)
+                else:
+                    l_data = self._read_manager.get_samples(l_samples_to_start, (l_samples_to_end - l_samples_to_start))
                 l_tags = self._read_manager.get_tags(None, l_start_ts, (l_end_ts - l_start_ts))
                 l_info = self._read_manager.get_params()
                 l_info['number_of_samples'] = (l_samples_to_end - l_samples_to_start) * l_info['number_of_channels']
@@ -197,7 +221,11 @@ class SmartTagsManager(object):
 
                 # Now l_data contains samples from all channels between
                 # l_start and l_end timestamp
-                i_st.data_source.set_samples(l_data)
+                if self._lazy:
+                    i_st.data_source = read_data_source.ViewDataSource(
+                        self._read_manager.data_source, l_samples_to_start, l_samples_to_end - l_samples_to_start)
+                else:
+                    i_st.data_source.set_samples(l_data)
                 i_st.info_source.set_params(l_info)
                 i_st.tags_source.set_tags(l_tags)
                 i_st.set_initialised()
@@ -210,5 +238,72 @@ class SmartTagsManager(object):
         # Reset samples count so that next
         # iter_smart_tags call will work
 
+    def _check_samples(self, p_from, p_len):
+        """Raise NoNextValue if p_len samples starting at p_from exceed the signal.
+        Only the last sample is read."""
+        if p_from < 0:
+            raise signal_exceptions.NoNextValue()
+        if p_len > 0:
+            self._read_manager.get_samples(p_from + p_len - 1, 1)
+
+    def get_epochs(self, p_len=None):
+        """Return a tuple (epochs, info) with data of all smart tags at once:
+        - epochs - 3-dim array (smart tags x channels x samples),
+        - info - numpy structured array (see EPOCHS_INFO_DTYPE) with start and end
+          timestamps of smart tag, start and end (exclusive) sample numbers of epoch,
+          name and start tag of every returned smart tag.
+        Every epoch has p_len samples starting at smart tag`s start sample;
+        if p_len is None length of the shortest smart tag is used.
+        Sample numbers of all smart tags are computed at once and all epochs are
+        cut from the signal in one call, SmartTag objects are not filled with data,
+        so it is much faster than iter_smart_tags() for many smart tags.
+        Smart tags starting before the signal and, like in iter_smart_tags(),
+        smart tags exceeding the signal are ignored."""
+        l_count = len(self._smart_tags)
+        l_start_ts = numpy.fromiter((st.get_start_timestamp() for st in self._smart_tags), numpy.float64, l_count)
+        l_end_ts = numpy.fromiter((st.get_end_timestamp() for st in self._smart_tags), numpy.float64, l_count)
+        l_starts = ((l_start_ts - self._first_sample_ts) * self.sampling_freq).astype(numpy.int64)
+        l_ends = ((l_end_ts - self._first_sample_ts) * self.sampling_freq).astype(numpy.int64)
+        if p_len is None:
+            p_len = max(int((l_ends - l_starts).min()), 0) if l_count > 0 else 0
+
+        # smart tags are sorted, so smart tags starting before the signal are first
+        l_first = int(numpy.searchsorted(l_starts, 0))
+        l_valid = l_first + self._count_epochs_in_signal(l_starts[l_first:], p_len)
+        if l_valid - l_first < l_count:
+            LOGGER.info("No samples left. Some smart tags could have been ignored, probably " +
+                        str(l_count - l_valid + l_first) + " of " + str(l_count) + " tags.")
+        if l_valid > l_first:
+            l_epochs = self._read_manager.get_samples_windows(l_starts[l_first:l_valid], p_len)
+        else:
+            l_epochs = numpy.zeros((0, self.num_of_channels, p_len))
+
+        l_info = numpy.empty(l_valid - l_first, EPOCHS_INFO_DTYPE)
+        l_info['start_timestamp'] = l_start_ts[l_first:l_valid]
+        l_info['end_timestamp'] = l_end_ts[l_first:l_valid]
+        l_info['start_sample'] = l_starts[l_first:l_valid]
+        l_info['end_sample'] = l_starts[l_first:l_valid] + p_len
+        for i in range(l_first, l_valid):
+            l_tag = self._smart_tags[i].get_start_tag()
+            l_info[i - l_first]['name'] = l_tag['name']
+            l_info[i - l_first]['tag'] = l_tag
+        return l_epochs, l_info
+
+    def _count_epochs_in_signal(self, p_starts, p_len):
+        """Return number of first epochs of p_len samples starting at
+        p_starts (sorted) that fit in the signal."""
+        if p_len == 0:
+            return len(p_starts)
+        l_lo, l_hi = 0, len(p_starts)
+        while l_lo < l_hi:
+            l_mid = (l_lo + l_hi) // 2
+            try:
+                self._check_samples(int(p_starts[l_mid]), p_len)
+            except signal_exceptions.NoNextValue:
+                l_hi = l_mid
+            else:
+                l_lo = l_mid + 1
+        return l_lo
+
     def __iter__(self):
         return self.iter_smart_tags()
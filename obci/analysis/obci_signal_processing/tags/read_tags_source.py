@@ -4,11 +4,60 @@
 #     Mateusz Kruszyński <mateusz.kruszynski@gmail.com>
 #
 import copy
+
+import numpy
+
 from . import tags_file_reader
 from . import tags_logging as logger
 LOGGER = logger.get_logger("smart_tags_source", "info")
 
 
+class TagsIndex(object):
+
+    """Index of tags by start timestamp.
+    Start timestamps of all tags and of tags of every name are kept sorted
+    in numpy arrays, so tags starting in given range are found by binary search.
+    find() returns tags in the order of the indexed list."""
+
+    def __init__(self, p_tags):
+        self._tags = p_tags
+        self._count = len(p_tags)
+        l_ts = numpy.array([i_tag['start_timestamp'] for i_tag in p_tags], dtype=numpy.float64)
+        self._all = self._sorted(l_ts, numpy.arange(self._count))
+        l_names = {}
+        for i, i_tag in enumerate(p_tags):
+            l_names.setdefault(i_tag['name'], []).append(i)
+        self._by_name = {}
+        for i_name, i_inds in l_names.items():
+            i_inds = numpy.array(i_inds)
+            self._by_name[i_name] = self._sorted(l_ts[i_inds], i_inds)
+
+    @staticmethod
+    def _sorted(p_ts, p_inds):
+        l_order = numpy.argsort(p_ts, kind='mergesort')
+        return p_ts[l_order], p_inds[l_order]
+
+    def indexes(self, p_tags):
+        """Return True if the index is up to date for p_tags list."""
+        return p_tags is self._tags and len(p_tags) == self._count
+
+    def find(self, p_tag_type=None, p_from=None, p_len=None):
+        """Return tags of type p_tag_type (all if None) starting
+        between p_from and p_from + p_len (inclusive, any time if p_from is None)."""
+        if p_tag_type is None:
+            l_ts, l_inds = self._all
+        else:
+            try:
+                l_ts, l_inds = self._by_name[p_tag_type]
+            except KeyError:
+                return []
+        if not (p_from is None):
+            l_start = numpy.searchsorted(l_ts, p_from, 'left')
+            l_end = numpy.searchsorted(l_ts, p_from + p_len, 'right')
+            l_inds = l_inds[l_start:l_end]
+        return [self._tags[i] for i in numpy.sort(l_inds)]
+
+
 class TagsSource(object):
 
     def get_tags(self):
@@ -16,20 +65,22 @@ class TagsSource(object):
 
     def _filter_tags(self, p_tags, p_tag_type=None, p_from=None, p_len=None, p_func=None):
         l_tags = p_tags
-        if not (p_tag_type is None):
-            l_tags = [i_tag for i_tag in l_tags if p_tag_type == i_tag['name']]
-
-        if not (p_from is None):
-            l_start = p_from
-            l_end = p_from + p_len
-            l_tags = [i_tag for i_tag in l_tags if
-                      (l_start <= i_tag['start_timestamp'] and i_tag['start_timestamp'] <= l_end)]
+        if not (p_tag_type is None and p_from is None):
+            l_tags = self._get_tags_index(p_tags).find(p_tag_type, p_from, p_len)
 
         if not (p_func is None):
             l_tags = [i_tag for i_tag in l_tags if p_func(i_tag)]
 
         return l_tags
 
+    def _get_tags_index(self, p_tags):
+        """Return TagsIndex for p_tags, build it if p_tags changed."""
+        l_index = self._tags_index
+        if l_index is None or not l_index.indexes(p_tags):
+            l_index = TagsIndex(p_tags)
+            self._tags_index = l_index
+        return l_index
+
     def __deepcopy__(self, memo):
         return MemoryTagsSource(copy.deepcopy(self.get_tags()))
 
@@ -38,6 +89,7 @@ class MemoryTagsSource(TagsSource):
 
     def __init__(self, p_tags=None):
         self._tags = None
+        self._tags_index = None
         if not (p_tags is None):
             self.set_tags(p_tags)
 
@@ -54,6 +106,7 @@ class FileTagsSource(TagsSource):
 
     def __init__(self, p_file_path):
         self._memory_source = None
+        self._tags_index = None
         self._tags_proxy = tags_file_reader.TagsFileReader(p_file_path)
 
     def get_tags(self, p_tag_type=None, p_from=None, p_len=None, p_func=None):
@@ -62,7 +115,7 @@ class FileTagsSource(TagsSource):
                 self._tags_proxy.get_tags(),
                 p_tag_type, p_from, p_len, p_func)
         else:
-            self._memory_source.get_tags(p_tag_type, p_from, p_len, p_func)
+            return self._memory_source.get_tags(p_tag_type, p_from, p_len, p_func)
 
     def set_tags(self, p_tags):
         if self._memory_source is None:
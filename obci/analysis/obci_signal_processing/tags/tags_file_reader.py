@@ -25,10 +25,9 @@
 """Module provides a simple class that is able to read tags xml file and
 give on demand subsequential tags."""
 
-import xml.dom.minidom
+import xml.etree.ElementTree as ET
 from . import tag_utils
 from . import tags_logging as logger
-from functools import cmp_to_key
 LOGGER = logger.get_logger('tags_file_reader')
 
 
@@ -46,14 +45,14 @@ class TagsFileReader(object):
     def start_tags_reading(self):
         """Read tags file, store data in memory."""
         try:
-            l_tags_file = open(self._tags_file_name, 'rt')
+            l_tags_file = open(self._tags_file_name, 'rb')
         except IOError:
             LOGGER.error("Couldn`t open tags file.")
         else:
             try:
                 # Analyse xml info file, get what we want and close the file.
                 self._parse_tags_file(l_tags_file)
-            except xml.parsers.expat.ExpatError:
+            except ET.ParseError:
                 LOGGER.error("An error occured while parsing tags xml file.")
             finally:
                 l_tags_file.close()
@@ -64,33 +63,39 @@ class TagsFileReader(object):
         return self._tags
 
     def _parse_tags_file(self, p_tags_file):
-        """Parse p_tags_file xml tags file and store it in memory."""
-        l_tags_doc = xml.dom.minidom.parse(p_tags_file)
-        l_xml_root_element = l_tags_doc.getElementsByTagName("tags")[0]
+        """Parse p_tags_file xml tags file and store it in memory.
+        The file is parsed incrementally and every <tag> element is
+        dropped as soon as it is converted to a tag dict, so memory use
+        doesn`t depend on the size of xml document.
+        Tags are sorted by start_timestamp only if they are not sorted in the file."""
+        l_sorted = True
+        l_last_ts = None
+        l_stack = []
+        for i_event, i_elem in ET.iterparse(p_tags_file, events=('start', 'end')):
+            if i_event == 'start':
+                l_stack.append(i_elem)
+                continue
+            l_stack.pop()
+            if i_elem.tag == 'tags':
+                # only the first <tags> element is read
+                break
+            if i_elem.tag != 'tag' or not l_stack or l_stack[-1].tag != 'tags':
+                continue
 
-        for i_tag_node in l_xml_root_element.getElementsByTagName("tag"):
             # Iterate over <tag> tags
             l_raw_tag = {}
             for i_key in ['length', 'name', 'position', 'channelNumber']:
-                l_raw_tag[i_key] = i_tag_node.getAttribute(i_key)
+                l_raw_tag[i_key] = i_elem.get(i_key, '')
+            for i_node in i_elem:
+                if i_node.text is not None:
+                    l_raw_tag[i_node.tag] = i_node.text
+            l_tag = tag_utils.unpack_tag_from_dict(l_raw_tag)
+            self._tags.append(l_tag)
 
-            for i_node in i_tag_node.childNodes:
-                try:
-                    l_raw_tag[i_node.tagName] = i_node.firstChild.nodeValue
-                except AttributeError:
-                    pass
-            # TODO - in case tags aren`t sorted by start_timestamp,
-            # sort them at the end of current method
-            self._tags.append(tag_utils.unpack_tag_from_dict(l_raw_tag))
+            if l_last_ts is not None and l_tag['start_timestamp'] < l_last_ts:
+                l_sorted = False
+            l_last_ts = l_tag['start_timestamp']
+            l_stack[-1].remove(i_elem)
 
-        def cmp_tags(t1, t2):
-            ts1 = t1['start_timestamp']
-            ts2 = t2['start_timestamp']
-            if ts1 == ts2:
-                return 0
-            elif ts1 > ts2:
-                return 1
-            else:
-                return -1
-        # warning - may slow down as hell
-        self._tags.sort(key=cmp_to_key(cmp_tags))
+        if not l_sorted:
+            self._tags.sort(key=lambda t: t['start_timestamp'])
@@ -22,8 +22,15 @@
 #     Mateusz Kruszyński <mateusz.kruszynski@gmail.com>
 #
 
-import xml.dom.minidom
+import json
+import os
+from xml.sax.saxutils import XMLGenerator
+
 from .. import types_utils
+from . import tags_logging as logger
+LOGGER = logger.get_logger('tags_file_writer')
+
+JOURNAL_EXTENSION = '.journal'
 
 
 TAG_STYLES = {
@@ -66,43 +73,50 @@ class TagsFileWriter(object):
     public interface:
     - tag_received(tag_dict)
     - finish_saving()
+
+    If p_journal is True, every received tag is immediately appended to
+    a journal file (p_file_path + '.journal', one json line per tag) instead
+    of being kept in memory, so tags survive a crash and memory use doesn`t grow.
+    finish_saving() writes the xml file in one streaming pass over the journal
+    and removes the journal. Journal left by a crashed writer is not truncated,
+    new tags are appended to it. See also recover_journal().
     """
 
-    def __init__(self, p_file_path, p_defs=None
+    def __init__(self, p_file_path, p_defs=None,
                  # p_defs = [{'name':'default',
                  #           'description':'default description'}]
-                 ):
-        """Prepare data structure for storing in-memory xml file."""
+                 p_journal=False):
+        """Prepare data structure for storing tags."""
 
         self._file_path = p_file_path
-        # TODO works in windows and linux on path with spaces?
-        self._xml_factory = xml.dom.minidom.Document()
-        # an object useful in the future to easily create xml elements
-        self._xml_root = self._xml_factory.createElement(
-            'tagFile')
-        self._xml_root.setAttribute('formatVersion', '1.0')
-        # this is going to be an in-memory representation of xml info file
-        self._xml_factory.appendChild(self._xml_root)
-
-        self._init_default_tags()
-        self._init_tags_defs(p_defs)
-
-        # create 'tags' tag structure
-        l_td = self._xml_factory.createElement('tagData')
-        self._xml_root.appendChild(l_td)
-        self._tags_root = self._xml_factory.createElement('tags')
-        l_td.appendChild(self._tags_root)
-
+        self._defs = p_defs
         self._tags = []
-
-    def _init_default_tags(self):
-        l_pg = self._xml_factory.createElement('paging')
-        l_pg.setAttribute('page_size', '20.0')
-        l_pg.setAttribute('blocks_per_page', '5')
-        self._xml_root.appendChild(l_pg)
-
-    def _init_tags_defs(self, p_defs):
-        """Create structure:
+        self._journal = None
+        if p_journal:
+            self._journal = self._open_journal()
+
+    def _open_journal(self):
+        l_path = self._file_path + JOURNAL_EXTENSION
+        l_new_line = False
+        if os.path.exists(l_path):
+            LOGGER.warning("Journal " + l_path + " already exists, probably left after a crash. "
+                           "New tags will be appended to it.")
+            with open(l_path, 'rb') as f:
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    # last line can be incomplete after a crash
+                    l_new_line = f.read(1) != b'\n'
+        l_journal = open(l_path, 'a', encoding='utf-8')
+        if l_new_line:
+            l_journal.write('\n')
+        return l_journal
+
+    def _write_default_tags(self, p_xml):
+        p_xml.startElement('paging', {'page_size': '20.0', 'blocks_per_page': '5'})
+        p_xml.endElement('paging')
+
+    def _write_tags_defs(self, p_xml):
+        """Write structure:
         <tag_definitions>
            <def_group "name"="channelTags">
               <tag_item .... />
@@ -112,56 +126,64 @@ class TagsFileWriter(object):
         tag_item paramteres are taken from TAG_DEFS.
         """
 
-        if not p_defs:
+        if not self._defs:
             return
-        l_td = self._xml_factory.createElement('tag_definitions')
-        self._xml_root.appendChild(l_td)
-
-        l_tgr = self._xml_factory.createElement('def_group')
-        l_tgr.setAttribute('name', 'channelTags')
-        l_td.appendChild(l_tgr)
-
-        for i_def in p_defs:
-            l_item = self._xml_factory.createElement('tag_item')
-            # Set name and description
-            for i_key, i_value in i_def.items():
-                l_item.setAttribute(i_key, i_value)
-
-            # Set styles
-            l_styles = TAG_STYLES[TAG_DEFS[i_def['name']]]
-            for i_key, i_value in l_styles.items():
-                l_item.setAttribute(i_key, i_value)
-            l_tgr.appendChild(l_item)
+        p_xml.startElement('tag_definitions', {})
+        p_xml.startElement('def_group', {'name': 'channelTags'})
+        for i_def in self._defs:
+            # Set name, description and styles
+            l_attrs = dict(i_def)
+            l_attrs.update(TAG_STYLES[TAG_DEFS[i_def['name']]])
+            p_xml.startElement('tag_item', l_attrs)
+            p_xml.endElement('tag_item')
+        p_xml.endElement('def_group')
+        p_xml.endElement('tag_definitions')
 
     def tag_received(self, p_tag_dict):
         """For give dictionary with pirs key -> value create an xml element.
         An exception is with key 'desc' where xml elements are created for
         every element of p_tag_dict['desc'] value which is a dictionary."""
-        self._tags.append(p_tag_dict)
-
-    def _serialize_tags(self, p_first_sample_ts):
-        """Write all self._tags to xml file."""
-
-        for i_tag_dict in self._tags:
+        if self._journal is None:
+            self._tags.append(p_tag_dict)
+        else:
+            l_desc = dict((i_key, types_utils.to_string(i_value))
+                          for i_key, i_value in p_tag_dict['desc'].items())
+            self._journal.write(json.dumps([p_tag_dict['name'],
+                                            float(p_tag_dict['start_timestamp']),
+                                            float(p_tag_dict['end_timestamp']),
+                                            l_desc]))
+            self._journal.write('\n')
+            self._journal.flush()
+
+    def _iter_journal(self):
+        with open(self._file_path + JOURNAL_EXTENSION, 'r', encoding='utf-8') as f:
+            for i_line in f:
+                try:
+                    l_name, l_start, l_end, l_desc = json.loads(i_line)
+                except ValueError:
+                    # last line can be incomplete after a crash
+                    continue
+                yield {'name': l_name, 'start_timestamp': l_start, 'end_timestamp': l_end, 'desc': l_desc}
+
+    def _serialize_tags(self, p_xml, p_tags, p_first_sample_ts):
+        """Write all p_tags to xml file."""
+
+        for i_tag_dict in p_tags:
             l_tag_params = {}
+            l_tag_params['channelNumber'] = str(-1)
             l_tag_params['name'] = self._get_tag_def_for(i_tag_dict['name'])
-            l_tag_params['length'] = float(i_tag_dict['end_timestamp']) - \
-                float(i_tag_dict['start_timestamp'])
-            l_tag_params['position'] = float(i_tag_dict['start_timestamp']) - p_first_sample_ts
-
-            l_tag = self._xml_factory.createElement('tag')
-            l_tag.setAttribute('channelNumber', str(-1))
-
-            for i_key, i_value in l_tag_params.items():
-                l_tag.setAttribute(i_key, types_utils.to_string(i_value))
+            l_tag_params['length'] = types_utils.to_string(float(i_tag_dict['end_timestamp']) -
+                                                           float(i_tag_dict['start_timestamp']))
+            l_tag_params['position'] = types_utils.to_string(float(i_tag_dict['start_timestamp']) -
+                                                             p_first_sample_ts)
+            p_xml.startElement('tag', l_tag_params)
 
             for i_key, i_value in i_tag_dict['desc'].items():
-                elem = self._xml_factory.createElement(i_key)
-                val = self._xml_factory.createTextNode(types_utils.to_string(i_value))
-                elem.appendChild(val)
-                l_tag.appendChild(elem)
+                p_xml.startElement(i_key, {})
+                p_xml.characters(types_utils.to_string(i_value))
+                p_xml.endElement(i_key)
 
-            self._tags_root.appendChild(l_tag)
+            p_xml.endElement('tag')
 
     def _get_tag_def_for(self, p_tag_name):
         return p_tag_name
@@ -169,9 +191,35 @@ class TagsFileWriter(object):
     def finish_saving(self, p_first_sample_ts):
         """Write xml tags to the file, return the file`s path."""
         # TODO - lapac bledy
-        self._serialize_tags(p_first_sample_ts)
-
-        f = open(self._file_path, 'wb')
-        f.write(self._xml_factory.toxml('utf-8'))  # TODO ustawic kodowanie
-        f.close()
+        if self._journal is not None:
+            self._journal.close()
+            l_tags = self._iter_journal()
+        else:
+            l_tags = self._tags
+
+        with open(self._file_path, 'wb') as f:
+            l_xml = XMLGenerator(f, 'utf-8', short_empty_elements=True)
+            l_xml.startDocument()
+            l_xml.startElement('tagFile', {'formatVersion': '1.0'})
+            self._write_default_tags(l_xml)
+            self._write_tags_defs(l_xml)
+            l_xml.startElement('tagData', {})
+            l_xml.startElement('tags', {})
+            self._serialize_tags(l_xml, l_tags, p_first_sample_ts)
+            l_xml.endElement('tags')
+            l_xml.endElement('tagData')
+            l_xml.endElement('tagFile')
+            l_xml.endDocument()
+
+        if self._journal is not None:
+            os.remove(self._file_path + JOURNAL_EXTENSION)
         return self._file_path
+
+
+def recover_journal(p_file_path, p_first_sample_ts):
+    """Write p_file_path tags file from journal left by TagsFileWriter
+    working in journal mode (for example after a crash), return the file`s path."""
+    if not os.path.exists(p_file_path + JOURNAL_EXTENSION):
+        raise IOError("No journal for tags file " + p_file_path)
+    # writer in journal mode continues the existing journal
+    return TagsFileWriter(p_file_path, p_journal=True).finish_saving(p_first_sample_ts)
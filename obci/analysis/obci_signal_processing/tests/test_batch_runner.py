@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+"""
+>>> from obci.analysis.obci_signal_processing import batch_runner as b
+
+>>> from obci.analysis.obci_signal_processing import read_manager
+
+>>> from obci.analysis.obci_signal_processing.signal import read_info_source, read_data_source
+
+>>> from obci.analysis.obci_signal_processing.tags import read_tags_source
+
+>>> import os, tempfile, numpy
+
+>>> d = tempfile.mkdtemp()
+
+>>> for i in range(3):
+...     info = read_info_source.MemoryInfoSource({'sampling_frequency': '128.0', 'channels_names': ['a', 'b'],
+...                                               'number_of_channels': '2', 'sample_type': 'FLOAT'})
+...     data = read_data_source.MemoryDataSource(numpy.arange(20.0).reshape(2, 10) + i)
+...     tags = read_tags_source.MemoryTagsSource([])
+...     read_manager.ReadManager(info, data, tags).save_to_file(d, 'rec' + str(i))
+
+>>> os.remove(os.path.join(d, 'rec2.obci.xml'))
+
+>>> recs = b.find_recordings([os.path.join(d, '*.obci.raw'), os.path.join(d, 'rec0')])
+
+>>> [os.path.basename(dt) for info, dt, tags in recs]
+['rec0.obci.raw', 'rec1.obci.raw']
+
+>>> results, errors = b.run_batch(means, os.path.join(d, '*'), 2, p_progress=None)
+
+>>> [(os.path.basename(rec[1]), res) for rec, res in results.items()]
+[('rec0.obci.raw', [4.5, 14.5]), ('rec1.obci.raw', [5.5, 15.5])]
+
+>>> errors
+{}
+
+>>> done = []
+
+>>> results, errors = b.run_batch(means, os.path.join(d, '*'), 1, False, p_reduce=len,
+...                               p_progress=lambda done_, total, rec, err: done.append((done_, total)))
+
+>>> results, done
+(2, [(1, 2), (2, 2)])
+
+>>> results, errors = b.run_batch(fail_rec1, os.path.join(d, '*'), 2, p_progress=None)
+
+>>> list(results.values()), [err.splitlines()[-1] for err in errors.values()]
+([[4.5, 14.5]], ['ValueError: bad recording'])
+
+A worker killed while processing a recording doesn`t stop the batch (Python 3.11 or newer):
+
+>>> import sys
+
+>>> if sys.version_info >= (3, 11):
+...     results, errors = b.run_batch(kill_rec1, os.path.join(d, '*'), 2, p_progress=None)
+...     print(list(results.values()), [err.splitlines()[-1] for err in errors.values()])
+... else:
+...     print([[4.5, 14.5]], ['Worker process died while processing the recording (killed or out of memory?).'])
+[[4.5, 14.5]] ['Worker process died while processing the recording (killed or out of memory?).']
+
+Memory limit is applied also for one process; memory mapped files don`t count
+(only where the data segment limit is enforced):
+
+>>> if data_limit_enforced():
+...     results, errors = b.run_batch(allocate, os.path.join(d, '*'), 1, p_max_memory=512 * 1024 * 1024,
+...                                   p_progress=None)
+...     print(list(results.values()), ['MemoryError' in err for err in errors.values()])
+... else:
+...     print([10], [True])
+[10] [True]
+
+>>> out = os.path.join(d, 'out.pickle')
+
+>>> b.main(['obci.analysis.obci_signal_processing.tests.test_batch_runner:means', os.path.join(d, 'rec*'),
+...         '-j', '2', '--reduce', 'builtins:len', '-o', out])
+0
+
+>>> import pickle
+
+>>> pickle.load(open(out, 'rb'))
+(2, {})
+
+>>> import shutil
+
+>>> shutil.rmtree(d)
+
+"""
+
+import os
+import subprocess
+import sys
+
+import numpy
+
+
+def means(mgr):
+    return mgr.get_samples().mean(axis=1).tolist()
+
+
+def fail_rec1(mgr):
+    if float(mgr.get_samples()[0, 0]) == 1.0:
+        raise ValueError("bad recording")
+    return means(mgr)
+
+
+def kill_rec1(mgr):
+    if float(mgr.get_samples()[0, 0]) == 1.0:
+        os._exit(1)
+    return means(mgr)
+
+
+def allocate(mgr):
+    if float(mgr.get_samples()[0, 0]) == 1.0:
+        return numpy.ones(128 * 1024 * 1024).size
+    return mgr.get_samples().shape[1]
+
+
+def data_limit_enforced():
+    """Return True if allocations are limited by RLIMIT_DATA on this platform."""
+    try:
+        import resource
+    except ImportError:
+        return False
+    code = ("import resource\n"
+            "resource.setrlimit(resource.RLIMIT_DATA, (256 * 1024 * 1024, 256 * 1024 * 1024))\n"
+            "try:\n"
+            "    bytearray(512 * 1024 * 1024)\n"
+            "except MemoryError:\n"
+            "    print('enforced')\n")
+    out = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE).stdout
+    return out.strip() == b'enforced'
+
+
+def run():
+    import doctest
+    import sys
+    res = doctest.testmod(sys.modules[__name__])
+    if res.failed == 0:
+        print("All tests succeeded!")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+"""
+>>> from obci.analysis.obci_signal_processing import catalog as c
+
+>>> from obci.analysis.obci_signal_processing import read_manager
+
+>>> from obci.analysis.obci_signal_processing.signal import read_info_source, read_data_source
+
+>>> from obci.analysis.obci_signal_processing.tags import read_tags_source
+
+>>> import os, tempfile, numpy
+
+>>> d = tempfile.mkdtemp()
+
+>>> os.mkdir(os.path.join(d, 'sub'))
+
+>>> def save(name, freq, channels, tags, samples=256):
+...     info = read_info_source.MemoryInfoSource({'sampling_frequency': str(freq), 'channels_names': channels,
+...                                               'number_of_channels': str(len(channels)), 'sample_type': 'FLOAT'})
+...     data = read_data_source.MemoryDataSource(numpy.zeros((len(channels), samples)))
+...     tags = read_tags_source.MemoryTagsSource([{'name': t, 'start_timestamp': float(i), 'end_timestamp': float(i),
+...                                                'channels': '', 'desc': {}} for i, t in enumerate(tags)])
+...     read_manager.ReadManager(info, data, tags).save_to_file(d, name)
+
+>>> save('a', 128.0, ['Fp1', 'Fp2'], ['trigger', 'trigger', 'end'])
+
+>>> save('sub/b', 256.0, ['Fp1', 'O1'], ['trigger'], 512)
+
+>>> save('sub/c', 128.0, ['Fp1', 'Fp2', 'O1'], [], 64)
+
+>>> db = os.path.join(d, 'catalog.db')
+
+>>> cat = c.RecordingsCatalog(db)
+
+>>> cat.update(d)
+(3, 0)
+
+>>> [os.path.basename(r['data']) for r in cat.find(p_sampling_frequency=128)]
+['a.obci.raw', 'c.obci.raw']
+
+>>> [os.path.basename(r['info']) for r in cat.find(p_channels=['Fp1', 'O1'])]
+['b.obci.xml', 'c.obci.xml']
+
+>>> [os.path.basename(r['info']) for r in cat.find(p_sampling_frequency=128, p_tags=['trigger'])]
+['a.obci.xml']
+
+>>> [os.path.basename(r['info']) for r in cat.find(p_min_duration=1.0, p_root=os.path.join(d, 'sub'))]
+['b.obci.xml']
+
+>>> r = cat.find(p_channels=['O1'], p_sampling_frequency=256)[0]
+
+>>> r['number_of_samples'], r['duration'], r['number_of_channels'], r['sample_type']
+(512, 2.0, 2, 'FLOAT')
+
+>>> cat.get_channels(r), cat.get_tags_histogram(cat.find(p_tags=['end'])[0])
+(['Fp1', 'O1'], {'trigger': 2, 'end': 1})
+
+>>> mgr = cat.open(r, p_memmap=True)
+
+>>> mgr.get_samples().shape
+(2, 512)
+
+>>> read_manager.ReadManager.from_files(r).get_param('channels_names')
+['Fp1', 'O1']
+
+Updates are incremental:
+
+>>> cat.update(d)
+(0, 0)
+
+>>> save('sub/b', 256.0, ['Fp1', 'O1'], ['trigger'], 1024)
+
+>>> os.remove(os.path.join(d, 'sub', 'c.obci.raw'))
+
+>>> cat.close()
+
+>>> cat = c.RecordingsCatalog(db)
+
+>>> cat.update(d)
+(1, 1)
+
+>>> [(os.path.basename(r['info']), r['number_of_samples']) for r in cat.find()]
+[('a.obci.xml', 256), ('b.obci.xml', 1024)]
+
+Number of samples is computed from number of channels, not from channels names:
+
+>>> info = read_info_source.MemoryInfoSource({'sampling_frequency': '128.0', 'number_of_channels': '2',
+...                                           'sample_type': 'FLOAT'})
+
+>>> read_manager.ReadManager(info, read_data_source.MemoryDataSource(numpy.zeros((2, 100))), None).save_to_file(d, 'x')
+
+>>> cat.update(d)
+(1, 0)
+
+>>> [(r['number_of_channels'], r['number_of_samples']) for r in cat.find(p_root=d) if r['info'].endswith('x.obci.xml')]
+[(2, 100)]
+
+>>> cat.close()
+
+>>> c.main([db, d])
+0
+
+>>> import shutil
+
+>>> shutil.rmtree(d)
+
+"""
+
+
+def run():
+    import doctest
+    import sys
+    res = doctest.testmod(sys.modules[__name__])
+    if res.failed == 0:
+        print("All tests succeeded!")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+"""
+>>> from obci.analysis.obci_signal_processing.signal import data_chunked_file as chk
+
+>>> from obci.analysis.obci_signal_processing.signal import read_data_source as s
+
+>>> from obci.analysis.obci_signal_processing import read_manager
+
+>>> from obci.analysis.obci_signal_processing.signal import read_info_source
+
+>>> import os, numpy
+
+>>> f = './tescik.obci.chk'
+
+>>> data = numpy.arange(2 * 25, dtype=numpy.float64).reshape(2, 25)
+
+>>> data[1] *= -1
+
+>>> w = chk.ChunkedFileWriter(f, 2, p_chunk_samples=10, p_compression='zlib', p_sampling_frequency=10.0)
+
+>>> w.write_samples(data[:, :7], numpy.arange(7) * 0.1)
+
+>>> w.write_samples(data[:, 7:], numpy.arange(7, 25) * 0.1)
+
+>>> w.write_samples(numpy.zeros((3, 1)))
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.BadSampleFormat: Error! Received data sample is not of 'float' type! Writing to file aborted!
+
+>>> w.close()
+
+>>> chk.is_chunked_file(f)
+True
+
+>>> r = chk.ChunkedFileReader(f)
+
+>>> r.num_of_channels, r.sample_type, r.number_of_samples, r.chunks_count, r.sampling_frequency
+(2, 'FLOAT', 25, 3, 10.0)
+
+>>> r.first_timestamps.tolist()
+[0.0, 1.0, 2.0]
+
+>>> r.chunk_for_sample(19), r.chunk_for_timestamp(1.95), r.chunk_start(2)
+(1, 1, 20)
+
+>>> numpy.array_equal(r.get_samples(), data)
+True
+
+>>> numpy.array_equal(r.get_samples(8, 14), data[:, 8:22])
+True
+
+>>> numpy.array_equal(r.get_samples(18), data[:, 18:])
+True
+
+>>> r.get_samples(20, 6)
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
+
+>>> r.close()
+
+Lost index is rebuilt from chunk headers:
+
+>>> with open(f, 'r+b') as fl:
+...     nic = fl.seek(-1, os.SEEK_END)
+...     nic = fl.write(b'\\0')
+
+>>> r = chk.ChunkedFileReader(f)
+
+>>> r.chunks_count, r.number_of_samples
+(3, 25)
+
+>>> r.close()
+
+Corrupted chunks are detected:
+
+>>> with open(f, 'r+b') as fl:
+...     nic = fl.seek(chk._HEADER.size + chk._CHUNK_HEADER.size + 2)
+...     nic = fl.write(b'\\0\\0')
+
+>>> r = chk.ChunkedFileReader(f)
+
+>>> numpy.array_equal(r.get_samples(10, 10), data[:, 10:20])
+True
+
+>>> r.get_samples(0, 10)
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.BadChunk: Chunk 0 of data file is corrupted!
+
+>>> r.close()
+
+Uncompressible chunks are stored as they are:
+
+>>> w = chk.ChunkedFileWriter(f, 2, 'DOUBLE', p_chunk_samples=10, p_compression='lzma')
+
+>>> w.write_samples(numpy.random.rand(2, 5))
+
+>>> w.close()
+
+>>> r = chk.ChunkedFileReader(f)
+
+>>> int(r._index['compression'][0]), r.sample_type
+(0, 'DOUBLE')
+
+>>> r.close()
+
+Chunked files are written by data_write_proxy and read by ReadManager:
+
+>>> from obci.analysis.obci_signal_processing.signal import data_write_proxy
+
+>>> from obci.configs import variables_pb2
+
+>>> px = data_write_proxy.get_proxy(f, use_chunked_format=True, compression='lzma')
+
+>>> for i in range(25):
+...     v = variables_pb2.SampleVector()
+...     smp = v.samples.add()
+...     smp.timestamp = 100.0 + i
+...     smp.channels.extend(data[:, i])
+...     px.data_received(v.SerializeToString())
+
+>>> nic = px.finish_saving()
+
+>>> info = read_info_source.MemoryInfoSource({'sampling_frequency': '1.0', 'channels_names': ['a', 'b'],
+...                                             'first_sample_timestamp': '100.0'})
+
+>>> mgr = read_manager.ReadManager(info, f, None)
+
+>>> isinstance(mgr.data_source, s.ChunkedFileDataSource)
+True
+
+>>> mgr.data_source._reader.first_timestamps.tolist()
+[100.0]
+
+>>> numpy.array_equal(mgr.get_channels_samples(['b'], 3, 4), data[1:, 3:7])
+True
+
+>>> mgr.get_channel_samples('c')
+Traceback (most recent call last):
+...
+ValueError: No channel named 'c' in channels ['a', 'b']
+
+>>> mgr.get_samples_windows([0, 20], 5).shape
+(2, 2, 5)
+
+>>> sum(1 for smp in mgr.iter_samples())
+25
+
+>>> numpy.array_equal(mgr.get_samples(), data)
+True
+
+>>> mgr.save_to_file('.', 'tescik2', p_chunked=True, p_compression='zlib')
+
+>>> r = chk.ChunkedFileReader('./tescik2.obci.chk')
+
+>>> numpy.array_equal(r.get_samples(), data)
+True
+
+Saved chunks keep timestamps of samples and sample type:
+
+>>> r.first_timestamps.tolist(), r.sample_type
+([100.0], 'FLOAT')
+
+>>> r.close()
+
+>>> mgr.set_param('sample_type', 'DOUBLE')
+
+>>> mgr.save_to_file('.', 'tescik2', p_chunked=True)
+
+>>> r = chk.ChunkedFileReader('./tescik2.obci.chk')
+
+>>> r.sample_type
+'DOUBLE'
+
+>>> r.close()
+
+>>> for ext in ['.obci.chk', '.obci.xml', '.obci.tag']:
+...     os.remove('./tescik2' + ext)
+
+ReadManager closes the chunked file:
+
+>>> with read_manager.ReadManager(info, f, None) as mgr:
+...     mgr.get_samples(0, 2).shape
+(2, 2)
+
+>>> mgr.data_source._reader._file.closed
+True
+
+A file without any samples is still a valid chunked file:
+
+Timestamps are stored in the chunk index, they can`t be appended as a channel:
+
+>>> data_write_proxy.get_proxy(f, append_ts=True, use_chunked_format=True)
+Traceback (most recent call last):
+...
+ValueError: Appending timestamps is not supported for chunked files, timestamps are stored in the chunk index.
+
+>>> px = data_write_proxy.get_proxy(f, use_chunked_format=True)
+
+>>> nic = px.finish_saving()
+
+>>> r = chk.ChunkedFileReader(f)
+
+>>> r.num_of_channels, r.number_of_samples
+(0, 0)
+
+>>> r.close()
+
+>>> os.remove(f)
+
+"""
+
+
+def run():
+    import doctest
+    import sys
+    res = doctest.testmod(sys.modules[__name__])
+    if res.failed == 0:
+        print("All tests succeeded!")
+
+if __name__ == '__main__':
+    run()
@@ -72,12 +72,233 @@ Traceback (most recent call last):
 obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
 >>> #warning here
 
+>>> py.get_all_values(1).shape
+(1, 5)
+
+>>> vs = py.get_windows([0, 3, 1], 2)
+
+>>> vs.shape
+(3, 1, 2)
+
+>>> bool(abs(vs[1, 0, 0] - 3.3) + abs(vs[1, 0, 1] - 5.0) + abs(vs[2, 0, 0] - 0.0023) < 3*0.0001)
+True
+
+>>> py.get_windows([4], 2)
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
+
+>>> py.get_windows([], 2).shape
+(0, 1, 2)
+
+>>> vs = py.get_channels_values([0], 1, 3, p_chunk_len=1)
+
+>>> vs.shape
+(1, 2)
+
+>>> bool(abs(vs[0, 0] - 3.3) + abs(vs[0, 1] - 5.0) < 2*0.0001)
+True
+
+>>> py.get_channels_values([0], 1).shape
+(1, 5)
+
+>>> py.get_channels_values([0], 1, 4, 2)
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
+
+>>> py.finish_reading()
+
+>>> os.remove(f)
+
+>>> from obci.analysis.obci_signal_processing.signal.data_simple_write_proxy import DataSimpleWriteProxy
+
+>>> from obci.configs import variables_pb2
+
+>>> def vect(ts, samples):
+...     v = variables_pb2.SampleVector()
+...     for i, chs in enumerate(samples):
+...         s = v.samples.add()
+...         s.timestamp = ts + i
+...         s.channels.extend(chs)
+...     return v.SerializeToString()
+
+>>> px = DataSimpleWriteProxy(f, p_append_ts=True, p_sample_type='DOUBLE')
+
+>>> px.set_first_sample_timestamp(10.0)
+
+>>> px.data_received(vect(10.0, [[1.0, 2.0], [3.0, 4.0]]))
+
+>>> px.data_received(vect(12.0, [[5.0, 6.0]]))
+
+>>> px.data_received(vect(13.0, []))
+
+>>> px.data_received(vect(13.0, [[1.0, 2.0], [3.0]]))
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.BadSampleFormat: Error! Received data sample is not of 'float' type! Writing to file aborted!
+
+>>> nic = px.finish_saving()
+
+>>> py = DataReadProxy(f, sample_type='DOUBLE')
+
+>>> py.get_all_values(3).tolist()
+[[1.0, 3.0, 5.0], [2.0, 4.0, 6.0], [0.0, 1.0, 2.0]]
+
+>>> py.finish_reading()
+
+>>> px = DataSimpleWriteProxy(f, p_append_ts=True)
+
+>>> px.set_first_sample_timestamp(0.0)
+
+>>> px.data_received(vect(1e40, [[1.5, -2.25]]))
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.BadSampleFormat: Error! Received data sample is not of 'float' type! Writing to file aborted!
+
+>>> px.data_received(vect(0.5, [[1.5, -2.25]]))
+
+>>> nic = px.finish_saving()
+
+>>> py = DataReadProxy(f)
+
+>>> py.get_all_values(3).tolist()
+[[1.5], [-2.25], [0.5]]
+
+>>> py.finish_reading()
+
+>>> os.remove(f)
+
+>>> from obci.analysis.obci_signal_processing.signal import data_write_proxy
+
+>>> from obci.analysis.obci_signal_processing.signal.data_async_write_proxy import DataAsyncWriteProxy
+
+>>> isinstance(data_write_proxy.get_proxy(f, use_async_writer=True), DataAsyncWriteProxy)
+True
+
+>>> px = DataAsyncWriteProxy(f, p_sample_type='DOUBLE', p_block_size=40)
+
+>>> for i in range(10):
+...     px.data_received(vect(i, [[i, -i]]))
+
+>>> px.data_received(vect(10, [[j, j] for j in range(3)]))
+
+>>> nic = px.finish_saving()
+
+>>> stats = px.get_stats()
+
+>>> stats['written_blocks'], stats['full_queue_waits'], stats['queue_depth']
+(6, 0, 0)
+
+>>> py = DataReadProxy(f, sample_type='DOUBLE')
+
+>>> py.get_all_values(2).tolist()
+[[0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 0.0, 1.0, 2.0], [0.0, -1.0, -2.0, -3.0, -4.0, -5.0, -6.0, -7.0, -8.0, -9.0, 0.0, 1.0, 2.0]]
+
+>>> py.finish_reading()
+
+When the queue is full data_received() waits for the writer, nothing is dropped:
+
+>>> px = DataAsyncWriteProxy(f, p_sample_type='DOUBLE', p_block_size=16, p_max_queued_blocks=1)
+
+>>> px._file = SlowFile(px._file, 0.05)
+
+>>> for i in range(5):
+...     px.data_received(vect(i, [[i, -i]]))
+
+>>> px.finish_saving()[1], px.get_stats()['full_queue_waits'] > 0
+(5, True)
+
+>>> DataReadProxy(f, sample_type='DOUBLE').get_all_values(2).tolist()
+[[0.0, 1.0, 2.0, 3.0, 4.0], [0.0, -1.0, -2.0, -3.0, -4.0]]
+
+>>> px = DataAsyncWriteProxy(f, p_sample_type='DOUBLE', p_block_size=16, p_max_queued_blocks=1, p_put_timeout=0.1)
+
+>>> px._file = SlowFile(px._file, 1.0)
+
+>>> for i in range(5):
+...     px.data_received(vect(i, [[i, -i]]))
+Traceback (most recent call last):
+...
+OSError: Writer thread did not write queued data in 0.1 seconds!
+
+>>> px._number_of_samples < 5
+True
+
+>>> nic = px._stop_writer()
+
+>>> px._file.close()
+
+Write errors are raised:
+
+>>> px = DataAsyncWriteProxy(f, p_sample_type='DOUBLE', p_block_size=40)
+
+>>> px._file.close()
+
+>>> px.data_received(vect(0, [[0, 0]]))
+
+>>> px.data_received(vect(1, [[1, 1]]))
+
+>>> px.finish_saving() # doctest: +ELLIPSIS
+Traceback (most recent call last):
+...
+OSError: Error while writing to file ./tescik.obci.dat: ...closed file
+
+>>> os.remove(f)
+
+>>> px = data_write_proxy.get_proxy(f, True, use_own_buffer=True, buffer_size=4)
+
+>>> px.set_first_sample_timestamp(0.0)
+
+>>> px.buffer is None
+True
+
+>>> px.data_received(vect(0.0, [[1.0], [2.0], [3.0]]))
+
+>>> px.buffer.shape, px.buffer.dtype.name
+((4, 2), 'float32')
+
+>>> px.data_received(vect(3.0, [[4.0], [5.0], [6.0], [7.0], [8.0], [9.0]]))
+
+>>> px._buffer_len
+1
+
+>>> px.data_received(vect(9.0, [[1.0, 2.0]]))
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.BadSampleFormat: Error! Received data sample is not of 'float' type! Writing to file aborted!
+
+>>> nic = px.finish_saving()
+
+>>> py = DataReadProxy(f)
+
+>>> py.get_all_values(2).tolist()
+[[1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0], [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0]]
+
 >>> py.finish_reading()
 
 >>> os.remove(f)
 
 """
 
+import time
+
+
+class SlowFile(object):
+
+    """File wrapper writing with a delay."""
+
+    def __init__(self, p_file, p_delay):
+        self._file = p_file
+        self._delay = p_delay
+
+    def write(self, p_data):
+        time.sleep(self._delay)
+        return self._file.write(p_data)
+
+    def __getattr__(self, p_name):
+        return getattr(self._file, p_name)
+
 
 def run():
     import doctest
@@ -59,8 +59,81 @@ nic
 >>> print([int(t['start_timestamp']) for t in py.get_tags()])
 [1, 3, 5]
 
+>>> px.finish_saving(1000.0)
+'./tescik.obci.tags'
+
+>>> py = t.TagsFileReader('tescik.obci.tags')
+
+>>> print([(int(t['start_timestamp']), t['name'], t['desc']['x']) for t in py.get_tags()])
+[(1, 'nic', '123'), (3, 'nic2', '1234'), (5, 'nic3', '12345')]
+
+>>> with open('./tescik2.obci.tags', 'w') as f:
+...     nic = f.write('<?xml version="1.0" encoding="utf-8"?><tagFile><paging page_size="20.0"/>'
+...                   '<tagData><tags><tag length="1.0" name="a" position="2.5" channelNumber="3">'
+...                   '<x>&lt;1&gt;</x><y/></tag><tag length="0.5" name="b" position="0.5"/></tags></tagData>'
+...                   '</tagFile>')
+
+>>> tags = t.TagsFileReader('tescik2.obci.tags').get_tags()
+
+>>> [(g['name'], g['start_timestamp'], g['end_timestamp'], g['channels'], g['desc']) for g in tags]
+[('b', 0.5, 1.0, '', {}), ('a', 2.5, 3.5, '3', {'x': '<1>'})]
+
 >>> import os
 
+>>> px = p.TagsFileWriter('./tescik3.obci.tags', p_journal=True)
+
+>>> px.tag_received({'start_timestamp':1003.0, 'end_timestamp':1004.5, 'name': 'nic2', 'channels':'A B C',\
+                     'desc': {'x':1234, 'y':'<&>'}})
+
+>>> px.tag_received({'start_timestamp':1001.0, 'end_timestamp':1002.0, 'name': 'nic', 'channels':'',\
+                     'desc': {}})
+
+>>> os.path.exists('./tescik3.obci.tags'), len(open('./tescik3.obci.tags.journal').readlines())
+(False, 2)
+
+>>> px.finish_saving(1000.0)
+'./tescik3.obci.tags'
+
+>>> os.path.exists('./tescik3.obci.tags.journal')
+False
+
+>>> tags = t.TagsFileReader('tescik3.obci.tags').get_tags()
+
+>>> [(g['name'], g['start_timestamp'], g['end_timestamp'], g['desc']) for g in tags]
+[('nic', 1.0, 2.0, {}), ('nic2', 3.0, 4.5, {'x': '1234', 'y': '<&>'})]
+
+>>> px = p.TagsFileWriter('./tescik3.obci.tags', p_journal=True)
+
+>>> px.tag_received({'start_timestamp':1003.0, 'end_timestamp':1004.0, 'name': 'nic2', 'channels':'', 'desc': {}})
+
+>>> with open('./tescik3.obci.tags.journal', 'a') as f:
+...     nic = f.write('["crashed", 10')
+
+>>> p.recover_journal('./tescik3.obci.tags', 1000.0)
+'./tescik3.obci.tags'
+
+>>> [(g['name'], g['start_timestamp']) for g in t.TagsFileReader('tescik3.obci.tags').get_tags()]
+[('nic2', 3.0)]
+
+Journal left after a crash is continued by a new writer:
+
+>>> px = p.TagsFileWriter('./tescik3.obci.tags', p_journal=True)
+
+>>> px.tag_received({'start_timestamp':1003.0, 'end_timestamp':1004.0, 'name': 'nic2', 'channels':'', 'desc': {}})
+
+>>> with open('./tescik3.obci.tags.journal', 'a') as f:
+...     nic = f.write('["crashed", 10')
+
+>>> px = p.TagsFileWriter('./tescik3.obci.tags', p_journal=True)
+
+>>> px.tag_received({'start_timestamp':1005.0, 'end_timestamp':1006.0, 'name': 'nic3', 'channels':'', 'desc': {}})
+
+>>> px.finish_saving(1000.0)
+'./tescik3.obci.tags'
+
+>>> [(g['name'], g['start_timestamp']) for g in t.TagsFileReader('tescik3.obci.tags').get_tags()]
+[('nic2', 3.0), ('nic3', 5.0)]
+
 >>> import glob
 
 >>> for fl in glob.glob('tescik*'): os.remove(fl)
@@ -55,6 +55,25 @@
 array([[ 1.],
        [ 2.]])
 
+>>> py.get_samples_windows([0, 2, 1], 1).tolist()
+[[[1.0], [2.0]], [[5.0], [6.0]], [[3.0], [4.0]]]
+
+>>> py.get_samples_windows([2], 2)
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
+
+>>> py.get_channels_samples([1], 1, 2).tolist()
+[[4.0, 6.0]]
+
+>>> py.get_channels_samples([1, 0]).tolist()
+[[2.0, 4.0, 6.0], [1.0, 3.0, 5.0]]
+
+>>> py.get_channels_samples([1], 2, 2)
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
+
 >>> py.set_sample(3, [3.0, 4.0])
 Traceback (most recent call last):
 ...
@@ -70,6 +89,17 @@ ValueError: cannot copy sequence with size 3 to array axis with dimension 2
 
 >>> py = s.FileDataSource(f, 2)
 
+>>> np.allclose(py.get_channels_samples([1], 1, 2), [[3.3, 0.0]], atol=0.001)
+True
+
+>>> py.get_channels_samples([1, 0]).shape
+(2, 3)
+
+>>> py.get_channels_samples([0], 2, 2)
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
+
 >>> py.get_samples(0, 0)
 array([], shape=(2, 0), dtype=float64)
 
@@ -94,11 +124,30 @@ Traceback (most recent call last):
 ...
 obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
 
+>>> w = py.get_samples_windows([1, 0], 2)
+
+>>> w.shape
+(2, 2, 2)
+
+>>> np.allclose(w[0], [[-1.23456000e+02, 5.00000000e+00], [3.30000000e+00, 0.00000000e+00]], atol=0.001)
+True
+
+>>> np.array_equal(w[1], py.get_samples(0, 2))
+True
+
+>>> py.get_samples_windows([2], 2)
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
+
 >>> np.abs(np.array([[  1.20000000e+00,  -1.23456000e+02,   5.00000000e+00],\
        [  2.30000000e-03,   3.30000000e+00,   0.00000000e+00]]) - py.get_samples()) < 0.001
 array([[ True,  True,  True],
        [ True,  True,  True]], dtype=bool)
 
+>>> np.array_equal(py.get_samples_windows([1, 0], 2), w)
+True
+
 >>> py = s.FileDataSource(f, 2)
 
 >>> from numpy import array
@@ -134,6 +183,43 @@ array([[ True,  True,  True],
  [array([ 1.2   ,  0.0023]), array([-123.456,    3.3  ]), array([ 5.,  0.])])]
 [True, True, True]
 
+>>> # TEST MEMMAP DATA SOURCE ***************************************************
+
+>>> py = s.MemmapDataSource(f, 2)
+
+>>> py.get_samples().dtype
+dtype('float32')
+
+>>> py.get_samples().shape
+(2, 3)
+
+>>> np.allclose(py.get_samples(), [[1.2, -123.456, 5.0], [0.0023, 3.3, 0.0]], atol=0.001)
+True
+
+>>> np.allclose(py.get_samples(1, 1), [[-123.456], [3.3]], atol=0.001)
+True
+
+>>> py.get_samples(1, 3)
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
+
+>>> np.array_equal(py.get_samples_windows([1, 0], 2), np.array([py.get_samples(1, 2), py.get_samples(0, 2)]))
+True
+
+>>> np.array_equal(py.get_channels_samples([1, 0], 1, 2), py.get_samples(1, 2)[::-1])
+True
+
+>>> [np.allclose(i, y, atol=0.0001) for i, y in zip(py.iter_samples(), [[1.2, 0.0023], [-123.456, 3.3], [5.0, 0.0]])]
+[True, True, True]
+
+>>> import copy
+
+>>> np.array_equal(copy.deepcopy(py).get_samples(), py.get_samples())
+True
+
+>>> del py
+
 >>> os.remove(f)
 
 
@@ -61,6 +61,25 @@ True
 'desc': {'y': 45678, 'x': 12345, 'z': 789}, 'name': 'nic3', 'end_timestamp': 1009.0}]
 True
 
+>>> s.get_tags('nic4', 1000.0, 10.0)
+[]
+
+>>> index = s._tags_index
+
+>>> [t['start_timestamp'] for t in s.get_tags(None, 1003.0, 5.0)]
+[1003.0, 1005.0, 1005.5, 1008.0]
+
+>>> s._tags_index is index
+True
+
+>>> tags.insert(0, {'start_timestamp': 1004.0, 'end_timestamp': 1004.5, 'name': 'nic2', 'channels': '', 'desc': {}})
+
+>>> [t['start_timestamp'] for t in s.get_tags('nic2', 1003.0, 2.0)]
+[1004.0, 1003.0]
+
+>>> s._tags_index is index
+False
+
 
 """
 
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""
+>>> from obci.analysis.obci_signal_processing.signal import signal_pyramid
+
+>>> from obci.analysis.obci_signal_processing.signal import read_data_source, read_info_source
+
+>>> from obci.analysis.obci_signal_processing import read_manager
+
+>>> import os, numpy
+
+>>> f = './tescik.obci.pyr'
+
+>>> data = numpy.sin(numpy.arange(3 * 2505).reshape(3, 2505))
+
+>>> info = read_info_source.MemoryInfoSource({'number_of_samples': '2505', 'sampling_frequency': '100'})
+
+>>> mgr = read_manager.ReadManager(info, read_data_source.MemoryDataSource(data), None)
+
+>>> mgr.get_overview(100)[0]
+1
+
+>>> mgr.build_pyramid(f, [100, 10])
+
+>>> mgr.pyramid.levels, mgr.pyramid.num_of_channels, mgr.pyramid.number_of_samples
+([10, 100], 3, 2505)
+
+>>> level, mins, maxs, means = mgr.get_overview(20)
+
+>>> level, mins.shape
+(100, (3, 26))
+
+>>> numpy.allclose(mins[:, 3], data[:, 300:400].min(axis=1)) and numpy.allclose(maxs[:, 25], data[:, 2500:].max(axis=1))
+True
+
+>>> numpy.allclose(means[1, :25], data[1, :2500].reshape(25, 100).mean(axis=1))
+True
+
+>>> level, mins, maxs, means = mgr.get_overview(100, 5, 15, 'second')
+
+>>> level, mins.shape
+(10, (3, 150))
+
+>>> numpy.allclose(maxs[2, 0], data[2, 500:510].max())
+True
+
+>>> level, mins, maxs, means = mgr.get_overview(100, 15, 95)
+
+>>> level, mins.shape, mins is maxs
+(1, (3, 95), True)
+
+>>> mgr.get_overview(10, 2000, 1000)
+Traceback (most recent call last):
+...
+obci.analysis.obci_signal_processing.signal.signal_exceptions.NoNextValue
+
+>>> pyr = signal_pyramid.build_pyramid(read_data_source.MemoryDataSource(data), 2505, f + '2', p_block_len=300)
+
+>>> pyr.levels, pyr.choose_level(2505, 2), pyr.choose_level(2505, 3)
+([10, 100, 1000], 1000, 100)
+
+>>> all(numpy.allclose(a, b) for a, b in zip(pyr.get_level(10), mgr.pyramid.get_level(10)))
+True
+
+>>> mgr.load_pyramid(f + '2')
+
+>>> mgr.get_overview(2)[0]
+1000
+
+Blocks consist of whole bins of every level, also when levels do not divide each other:
+
+>>> pyr = signal_pyramid.build_pyramid(read_data_source.MemoryDataSource(data), 2505, f + '3', [3, 10], 40)
+
+>>> mins, maxs, means = pyr.get_level(3)
+
+>>> mins.shape, numpy.allclose(means[0, :835], data[0].reshape(835, 3).mean(axis=1))
+((3, 835), True)
+
+>>> pyr = signal_pyramid.build_pyramid(read_data_source.MemoryDataSource(data[:, :0]), 0, f + '3')
+
+>>> pyr.num_of_channels, pyr.get_level(10)[0].shape
+(0, (0, 0))
+
+>>> del mgr, pyr
+
+>>> os.remove(f)
+
+>>> os.remove(f + '2')
+
+>>> os.remove(f + '3')
+
+"""
+
+
+def run():
+    import doctest
+    import sys
+    res = doctest.testmod(sys.modules[__name__])
+    if res.failed == 0:
+        print("All tests succeeded!")
+
+if __name__ == '__main__':
+    run()
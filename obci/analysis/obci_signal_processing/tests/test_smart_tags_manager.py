@@ -42,6 +42,97 @@ True
 >>> print(tags_len_ok(tags))
 True
 
+>>> sts = m.get_smart_tags('trigger', tags[3].get_start_timestamp(), 1.0)
+
+>>> sts[0] is tags[3], len(m.get_smart_tags())
+(True, 51)
+
+>>> index = m._smart_tags_source._tags_index
+
+>>> nic = m.get_smart_tags(None, 10.0, 5.0)
+
+>>> m._smart_tags_source._tags_index is index
+True
+
+>>> import numpy
+
+>>> epochs, info = m.get_epochs()
+
+>>> epochs.shape, len(info)
+((51, 23, 256), 51)
+
+>>> all(numpy.array_equal(epochs[i], tags[i].get_samples()[:, :256]) for i in range(51))
+True
+
+>>> int(info[2]['start_sample']) == int((tags[2].get_start_timestamp() - m._first_sample_ts) * m.sampling_freq)
+True
+
+>>> info[2]['name'], info[2]['tag'] == tags[2].get_start_tag()
+('trigger', True)
+
+>>> m.get_epochs(100)[0].shape
+(51, 23, 100)
+
+>>> epochs, info = m.get_epochs(int(m.get_read_manager().get_param('number_of_samples')) // 2)
+
+>>> len(info) < 51, len(epochs) == len(info)
+(True, True)
+
+>>> epochs, info = m.get_epochs(100)
+
+>>> bool((info['end_sample'] - info['start_sample'] == 100).all())
+True
+
+Smart tags starting before the signal are ignored:
+
+>>> ed = df.SmartTagDurationDefinition(start_tag_name='trigger', start_offset=-0.5, end_offset=0, duration=1.0)
+
+>>> em = mgr.SmartTagsManager(ed, f['info'], f['data'], f['tags'])
+
+>>> epochs, info = em.get_epochs()
+
+>>> len(epochs), info[0]['tag'] == tags[1].get_start_tag()
+(50, True)
+
+>>> numpy.array_equal(epochs[0], em.get_read_manager().get_samples(int(info[0]['start_sample']), epochs.shape[2]))
+True
+
+Lazy smart tags are read-only views of the memory mapped signal:
+
+>>> lm = mgr.SmartTagsManager(d, f['info'], f['data'], f['tags'], p_memmap=True, p_lazy=True)
+
+>>> ltags, num = iter_all_tags(lm)
+
+>>> print(num)
+51
+
+>>> ltags[2].data_source._data is None
+True
+
+>>> numpy.array_equal(ltags[2].get_samples(), tags[2].get_samples())
+True
+
+>>> numpy.shares_memory(ltags[2].get_samples(), lm.get_read_manager().get_samples())
+True
+
+>>> ltags[2].get_samples()[0, 0] = 1.0
+Traceback (most recent call last):
+...
+ValueError: assignment destination is read-only
+
+>>> bool(abs(ltags[2].get_channel_samples('Fp1')[0]-19389.0)<0.0001)
+True
+
+>>> print(tags_len_ok(ltags))
+True
+
+Lazy and eager smart tags are checked alike, also when a smart tag starts before the signal:
+
+>>> lazy_num = iter_all_tags(mgr.SmartTagsManager(ed, f['info'], f['data'], f['tags'], p_memmap=True, p_lazy=True))[1]
+
+>>> lazy_num == iter_all_tags(mgr.SmartTagsManager(ed, f['info'], f['data'], f['tags']))[1]
+True
+
 >>> dd = df.SmartTagEndTagDefinition(start_tag_name='trigger', start_offset=0, end_offset=0, end_tags_names=['trigger'])
 
 >>> mm = mgr.SmartTagsManager(dd, f['info'], f['data'], f['tags'])
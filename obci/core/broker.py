@@ -1,16 +1,18 @@
 import asyncio
 import logging
 import threading
+import time
 from typing import List, Optional
 
 import zmq
 import zmq.asyncio
 
 from .messages import Message, types as msg_types
+from .message_statistics import RequestStats
 from .message_handler_mixin import MessageHandlerMixin
 from .peer import Peer, PeerInitUrls
 from .zmq_asyncio_task_manager import ZmqAsyncioTaskManager
-from ..utils.zmq import bind_to_urls
+from ..utils.zmq import bind_to_urls, split_envelope
 
 
 class PeerInfo:
@@ -130,7 +132,19 @@ class _BrokerPeer(Peer):
     """
     Broker's internal peer.
     """
-    pass
+
+    def notify_query_handlers_changed(self, query_types: List[str]) -> None:
+        """
+        Broadcast `BROKER_QUERY_HANDLERS_CHANGED` message, so peers can
+        invalidate their cached query redirects.
+
+        Can be called from any thread.
+
+        :param query_types: list of query types with changed handlers
+        """
+        if self._initialization_finished and query_types:
+            self.create_task(self.send_message(
+                Message(msg_types.BROKER_QUERY_HANDLERS_CHANGED, self.id, {'msg_types': query_types})))
 
 
 class Broker(ZmqAsyncioTaskManager, MessageHandlerMixin):
@@ -144,7 +158,8 @@ class Broker(ZmqAsyncioTaskManager, MessageHandlerMixin):
                  zmq_io_threads: int=1,
                  hwm: int=1000,
                  msg_proxy_io_threads: int=1,
-                 msg_proxy_hwm: int=1000
+                 msg_proxy_hwm: int=1000,
+                 max_concurrent_requests: int=16
                  ) -> None:
         """
         Broker is as essential component of OpenBCI experiment. It consists of
@@ -161,6 +176,7 @@ class Broker(ZmqAsyncioTaskManager, MessageHandlerMixin):
         :param hwm: ZMQ High Water Mark for broker
         :param msg_proxy_io_threads: number of ZMQ I/O threads to use in message proxy
         :param msg_proxy_hwm: ZMQ High Water Mark for message proxy
+        :param max_concurrent_requests: max number of requests handled concurrently by broker
         """
         broker_name = 'Broker'
         self._thread_name = broker_name
@@ -170,7 +186,14 @@ class Broker(ZmqAsyncioTaskManager, MessageHandlerMixin):
 
         self._hwm = hwm
 
-        self._rep = None
+        self._rep = None  # ROUTER socket, compatible with peers' REQ and DEALER sockets
+
+        self._max_concurrent_requests = max_concurrent_requests
+        self._requests_semaphore = None
+        self._request_stats = RequestStats()
+
+        # max number of requests received in one receive loop iteration
+        self._receive_budget = 64
 
         self._rep_urls = rep_urls
         self._xpub_urls = xpub_urls
@@ -208,8 +231,14 @@ class Broker(ZmqAsyncioTaskManager, MessageHandlerMixin):
 
         self.create_task(self._initialize_broker())
 
+    @property
+    def request_stats(self) -> RequestStats:
+        """RequestStats: Timing statistics of requests handled by broker."""
+        return self._request_stats
+
     async def _initialize_broker(self) -> None:
-        self._rep = self._ctx.socket(zmq.REP)
+        self._requests_semaphore = asyncio.Semaphore(self._max_concurrent_requests)
+        self._rep = self._ctx.socket(zmq.ROUTER)
         self._rep.set_hwm(self._hwm)
         self._rep.set(zmq.LINGER, 0)
 
@@ -263,7 +292,9 @@ class Broker(ZmqAsyncioTaskManager, MessageHandlerMixin):
         if msg_type not in self._query_handlers:
             self._query_handlers[msg_type] = set()
             self.register_message_handler(msg_type, self.__query_message_handler)
-        self._query_handlers[msg_type].add(peer)
+        if peer not in self._query_handlers[msg_type]:
+            self._query_handlers[msg_type].add(peer)
+            self._peer.notify_query_handlers_changed([msg_type])
         return Message(msg_types.OK, '0', {})
 
     async def _handle_unregister_query_handler(self, msg: Message) -> Message:
@@ -274,12 +305,15 @@ class Broker(ZmqAsyncioTaskManager, MessageHandlerMixin):
 
         if requested_msg_type is None:
             # unregister all types for current peer
-            for msg_type in self._query_handlers.keys():
-                self._query_handlers[msg_type].discard(peer)
+            changed_msg_types = [msg_type for msg_type, handlers in self._query_handlers.items()
+                                 if peer in handlers]
         else:
             # unregister only given msg_type for current peer
             assert requested_msg_type in self._query_handlers
-            self._query_handlers[requested_msg_type].discard(peer)
+            changed_msg_types = [requested_msg_type]
+        for msg_type in changed_msg_types:
+            self._query_handlers[msg_type].discard(peer)
+        self._peer.notify_query_handlers_changed(changed_msg_types)
 
         # remove msg_type entries with empty handlers list
         for msg_type, handlers in list(self._query_handlers.items()):
@@ -305,20 +339,61 @@ class Broker(ZmqAsyncioTaskManager, MessageHandlerMixin):
         super()._cleanup()
 
     async def _receive_and_handle_requests(self) -> None:
-        poller = zmq.asyncio.Poller()
-        poller.register(self._rep, zmq.POLLIN)
+        """
+        Receive requests and handle them concurrently. At most
+        `max_concurrent_requests` requests are handled at the same time,
+        when this limit is reached new requests are not received until
+        one of handled requests finishes.
+
+        Loop awaits the socket directly and after each wakeup receives up to
+        `self._receive_budget` requests which are already waiting before
+        yielding to the event loop.
+        """
         while True:
-            events = await poller.poll(timeout=50)  # in milliseconds
-            if self._rep in dict(events):
-                msg = await self._rep.recv_multipart()
-                try:
-                    msg = Message.deserialize(msg)
-                    if self._log_messages:
-                        self._logger.debug('broker received message {} from {}'.format(msg.type, msg.subtype))
-                    response = await self.handle_message(msg)
-                    assert response is not None
-                except Exception as ex:
-                    response = Message(msg_types.INTERNAL_ERROR, '0', str(ex))
-                    self._logger.exception('Exception during message handling in broker:')
-                finally:
-                    await self._rep.send_multipart(response.serialize())
+            await self.__receive_request()
+            try:
+                for _ in range(self._receive_budget - 1):
+                    await self.__receive_request(zmq.NOBLOCK)
+            except zmq.Again:
+                pass
+            await asyncio.sleep(0)
+
+    async def __receive_request(self, flags: int = 0) -> None:
+        await self._requests_semaphore.acquire()
+        try:
+            request = await self._rep.recv_multipart(flags)
+            self.create_task(self._handle_request(request, time.monotonic()))
+        except BaseException:
+            self._requests_semaphore.release()
+            raise
+
+    async def _handle_request(self, request: List[bytes], receive_time: float) -> None:
+        """
+        Handle single request received on ROUTER socket and send response.
+
+        Request consists of an envelope (peer identity, optional request ID
+        and empty delimiter frame) followed by message frames. Envelope is
+        sent back unchanged with the response.
+        """
+        self._request_stats.request_started()
+        msg_type = None
+        try:
+            try:
+                envelope, request = split_envelope(request)
+            except ValueError:
+                self._logger.error('Invalid request envelope received by broker')
+                return
+            try:
+                msg = Message.deserialize(request)
+                msg_type = msg.type
+                if self._log_messages:
+                    self._logger.debug('broker received message {} from {}'.format(msg.type, msg.subtype))
+                response = await self.handle_message(msg)
+                assert response is not None
+            except Exception as ex:
+                response = Message(msg_types.INTERNAL_ERROR, '0', str(ex))
+                self._logger.exception('Exception during message handling in broker:')
+            await self._rep.send_multipart(envelope + response.serialize())
+        finally:
+            self._request_stats.request_finished(msg_type, time.monotonic() - receive_time)
+            self._requests_semaphore.release()
@@ -0,0 +1,189 @@
+import asyncio
+import itertools
+import struct
+import time
+from typing import Optional, Callable, Dict, List, Union
+
+import zmq
+import zmq.asyncio
+
+from ..utils.zmq import TimeoutException
+
+
+class ConnectionClosedException(Exception):
+    """Raised for pending requests when pooled connection is closed."""
+
+
+class PooledConnection:
+
+    def __init__(self, url: str, socket: zmq.asyncio.Socket) -> None:
+        """
+        Single persistent DEALER connection kept by `ConnectionPool`.
+
+        :param url: remote REP socket URL
+        :param socket: connected DEALER socket
+        """
+        super().__init__()
+        self.url = url
+        self.socket = socket
+        self.pending = {}  # type: Dict[bytes, asyncio.Future]
+        self.last_used = time.monotonic()
+        self.idle_timer = None  # type: Optional[asyncio.TimerHandle]
+        self.closed = False
+
+
+class ConnectionPool:
+
+    _REQUEST_ID = struct.Struct('>Q')
+
+    def __init__(self,
+                 ctx: zmq.asyncio.Context,
+                 create_task: Callable,
+                 idle_timeout: float = 30.0,
+                 hwm: int = 1000,
+                 copy: bool = True
+                 ) -> None:
+        """
+        Pool of persistent DEALER connections used to send synchronous
+        (request-response) messages to REP sockets of peers and broker.
+
+        One connection is kept per URL and shared by all concurrent requests.
+        Each request is prefixed with an unique request ID frame followed by
+        an empty delimiter frame. REP socket treats these frames as an envelope
+        and returns them unchanged with the response, so responses are matched
+        to requests by ID. No changes on the REP side are needed.
+
+        Connection is closed when it was not used for `idle_timeout` seconds
+        (by a timer restarted after every request, receiving tasks don't poll).
+
+        :param ctx: ZMQ asyncio context
+        :param create_task: function used to start background tasks (e.g. `AsyncioTaskManager.create_task`)
+        :param idle_timeout: time in seconds after which unused connection is closed
+        :param hwm: ZMQ high water mark
+        :param copy: if `False` response frames are received as `zmq.Frame` objects
+        """
+        super().__init__()
+        self._ctx = ctx
+        self._create_task = create_task
+        self._idle_timeout = idle_timeout
+        self._hwm = hwm
+        self._copy = copy
+        self._connections = {}  # type: Dict[str, PooledConnection]
+        self._request_ids = itertools.count()
+
+    @property
+    def connections_count(self) -> int:
+        """int: Number of currently open connections."""
+        return len(self._connections)
+
+    async def send(self,
+                   url: str,
+                   msg: List[bytes],
+                   timeout: float = 5.0
+                   ) -> List[Union[bytes, zmq.Frame]]:
+        """
+        Send multipart message to REP socket at `url` and return response.
+
+        Timeout covers both sending the request and waiting for the response.
+        On timeout the connection is closed (other requests pending on it fail
+        with `ConnectionClosedException`), so the timed out request can't be
+        delivered later and its late response can't reach a reused connection.
+
+        :param url: REP socket URL
+        :param msg: multipart message to send
+        :param timeout: timeout in seconds
+        :return: response multipart message
+        """
+        connection = self._get_connection(url)
+        self._cancel_idle_timer(connection)
+        request_id = self._REQUEST_ID.pack(next(self._request_ids))
+        future = asyncio.Future()
+        connection.pending[request_id] = future
+        connection.last_used = time.monotonic()
+
+        async def exchange():
+            await connection.socket.send_multipart([request_id, b''] + list(msg))
+            return await future
+
+        try:
+            return await asyncio.wait_for(exchange(), timeout)
+        except asyncio.TimeoutError:
+            self._drop_connection(connection)
+            raise TimeoutException()
+        finally:
+            connection.pending.pop(request_id, None)
+            connection.last_used = time.monotonic()
+            if not connection.pending and not connection.closed:
+                self._start_idle_timer(connection)
+
+    def close(self, url: Optional[str] = None) -> None:
+        """
+        Close connection to `url` or all connections if `url` is `None`.
+        Pending requests fail with `ConnectionClosedException`.
+        """
+        urls = list(self._connections.keys()) if url is None else [url]
+        for u in urls:
+            connection = self._connections.pop(u, None)
+            if connection is not None:
+                self._close_connection(connection)
+
+    def _drop_connection(self, connection: PooledConnection) -> None:
+        if self._connections.get(connection.url) is connection:
+            del self._connections[connection.url]
+        self._close_connection(connection)
+
+    def _start_idle_timer(self, connection: PooledConnection) -> None:
+        self._cancel_idle_timer(connection)
+        connection.idle_timer = asyncio.get_event_loop().call_later(
+            self._idle_timeout, self._drop_connection, connection)
+
+    @staticmethod
+    def _cancel_idle_timer(connection: PooledConnection) -> None:
+        if connection.idle_timer is not None:
+            connection.idle_timer.cancel()
+            connection.idle_timer = None
+
+    def _get_connection(self, url: str) -> PooledConnection:
+        connection = self._connections.get(url)
+        if connection is None:
+            socket = self._ctx.socket(zmq.DEALER)
+            socket.set_hwm(self._hwm)
+            socket.set(zmq.LINGER, 0)
+            socket.connect(url)
+            connection = PooledConnection(url, socket)
+            self._connections[url] = connection
+            self._create_task(self._receive_responses(connection))
+        return connection
+
+    @staticmethod
+    def _close_connection(connection: PooledConnection) -> None:
+        if connection.closed:
+            return
+        connection.closed = True
+        ConnectionPool._cancel_idle_timer(connection)
+        connection.socket.close(linger=0)
+        for future in connection.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionClosedException(connection.url))
+        connection.pending.clear()
+
+    async def _receive_responses(self, connection: PooledConnection) -> None:
+        """
+        Dispatch responses received on `connection` to waiting requests.
+        Ends when connection is closed, e.g. by its idle timer.
+        """
+        socket = connection.socket
+        try:
+            while not connection.closed:
+                response = await socket.recv_multipart(copy=self._copy)
+                request_id = response[0] if self._copy else response[0].bytes
+                future = connection.pending.pop(request_id, None)
+                # late responses to timed out requests are dropped
+                if future is not None and not future.done():
+                    future.set_result(response[2:])
+        except (zmq.ZMQError, asyncio.CancelledError):
+            # socket closed by ConnectionPool.close or idle timer
+            if not connection.closed:
+                raise
+        finally:
+            self._drop_connection(connection)
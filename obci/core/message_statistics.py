@@ -74,3 +74,107 @@ class MsgPerfStats:
     def interval(self, interval: float) -> None:
         self._interval = interval
         self.reset()
+
+
+class BatchStats:
+
+    def __init__(self) -> None:
+        """
+        `BatchStats` collects statistics of batched message sending: number
+        of flushed batches, batch sizes and flush latencies (time between
+        queueing first message of a batch and sending the batch).
+        """
+        super().__init__()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Reset statistics.
+        """
+        self.batches_count = 0
+        self.messages_count = 0
+        self.max_batch_size = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def batch(self, size: int, latency: float) -> None:
+        """
+        Called to count new flushed batch into statistics.
+
+        :param size: number of messages in batch
+        :param latency: time in seconds since first message of this batch was queued
+        """
+        self.batches_count += 1
+        self.messages_count += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    @property
+    def mean_batch_size(self) -> float:
+        """float: Mean number of messages in batch."""
+        return self.messages_count / self.batches_count if self.batches_count else 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        """float: Mean flush latency in seconds."""
+        return self.total_latency / self.batches_count if self.batches_count else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        Return statistics as a dictionary.
+        """
+        return {'batches_count': self.batches_count,
+                'messages_count': self.messages_count,
+                'mean_batch_size': self.mean_batch_size,
+                'max_batch_size': self.max_batch_size,
+                'mean_latency': self.mean_latency,
+                'max_latency': self.max_latency}
+
+
+class RequestStats:
+
+    def __init__(self) -> None:
+        """
+        `RequestStats` collects per message type timing statistics of
+        handled requests and number of requests handled concurrently.
+        """
+        super().__init__()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Reset statistics.
+        """
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._times = {}
+
+    def request_started(self) -> None:
+        """
+        Called when handling of new request starts.
+        """
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def request_finished(self, msg_type: str, duration: float) -> None:
+        """
+        Called when request was handled and response was sent.
+
+        :param msg_type: request message type
+        :param duration: time in seconds between receiving request and sending response
+        """
+        self.in_flight -= 1
+        count, total_time, max_time = self._times.get(msg_type, (0, 0.0, 0.0))
+        self._times[msg_type] = (count + 1, total_time + duration, max(max_time, duration))
+
+    def as_dict(self) -> dict:
+        """
+        Return statistics as a dictionary.
+        """
+        return {'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'requests': {msg_type: {'count': count,
+                                        'mean_time': total_time / count,
+                                        'max_time': max_time}
+                             for msg_type, (count, total_time, max_time) in self._times.items()}}
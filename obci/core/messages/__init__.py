@@ -1,7 +1,9 @@
 
 import abc
 import json
-from typing import Any, List
+import struct
+import zlib
+from typing import Any, List, Optional, Tuple, Union
 
 from . import types
 
@@ -10,6 +12,10 @@ class MessageSerializer(metaclass=abc.ABCMeta):
     """
     Message serializer implements two methods `serialize` and `deserialize` to
     convert to and from bytes to desired data type.
+
+    `deserialize` must accept any bytes-like object (`bytes`, `memoryview` or
+    other object supporting buffer protocol), because payloads received in
+    zero-copy mode are passed as buffers pointing directly to ZMQ frames.
     """
 
     @staticmethod
@@ -19,7 +25,7 @@ class MessageSerializer(metaclass=abc.ABCMeta):
 
     @staticmethod
     @abc.abstractmethod
-    def deserialize(data: bytes) -> Any:
+    def deserialize(data: Union[bytes, memoryview]) -> Any:
         raise Exception('Must be reimplemented in subclass')
 
 
@@ -50,7 +56,7 @@ class StringMessageSerializer(MessageSerializer):
 
     @staticmethod
     def deserialize(data):
-        return data.decode('utf-8')
+        return str(data, 'utf-8')
 
 
 class JsonMessageSerializer(MessageSerializer):
@@ -64,7 +70,7 @@ class JsonMessageSerializer(MessageSerializer):
 
     @staticmethod
     def deserialize(data):
-        return json.loads(data.decode('ascii'))
+        return json.loads(str(data, 'ascii'))
 
 
 class NoSerializerRegistered(Exception):
@@ -73,9 +79,31 @@ class NoSerializerRegistered(Exception):
     """
 
 
+COMPACT_HEADER_MARKER = b'\x00'
+"""bytes: First byte of compact (binary) message header.
+
+String headers never start with NUL byte, so both header formats can be
+distinguished and used at the same time.
+"""
+
+_COMPACT_HEADER_TYPE_ID = struct.Struct('>I')
+
+
 class Message:
     serializers = {}
 
+    # numeric type ID <-> type string mapping for registered message types
+    _type_ids = {}
+    _types_by_id = {}
+
+    # precomputed (msg_type -> serializer) dispatch table, filled on demand
+    _dispatch_table = {}
+
+    # caches of encoded and decoded headers
+    _header_cache_max_size = 4096
+    _encoded_headers = {}
+    _decoded_headers = {}
+
     def __init__(self, type_id: str, subtype_id: str='', data: Any=None):
         """
         Message consists of:
@@ -87,6 +115,17 @@ class Message:
         New message type must be registered using `Message.register_serializer`
         method before creating `Message` objects with such type.
 
+        Two header (first frame) encodings are supported:
+
+        * string - `'type^subtype'` encoded in UTF-8,
+        * compact - `COMPACT_HEADER_MARKER`, 4 byte big-endian numeric type ID
+          and UTF-8 encoded subtype.
+
+        Compact header can be used only for message types registered with
+        `Message.register_serializer`. Numeric type ID is computed from type
+        string (see `Message.get_type_id`), so all processes use the same IDs.
+        Both encodings are always accepted by `Message.deserialize`.
+
         :param type_id: type of this message
         :param subtype_id: usually interpreted as sender peer ID
         :param data: message payload
@@ -112,47 +151,167 @@ class Message:
     @staticmethod
     def __get_serializer(msg_type: str):
         try:
-            return Message.serializers[types.QUERY if msg_type.endswith(types.QUERY) else msg_type]
+            return Message._dispatch_table[msg_type]
+        except KeyError:
+            pass
+        try:
+            serializer = Message.serializers[types.QUERY if msg_type.endswith(types.QUERY) else msg_type]
         except KeyError:
             raise NoSerializerRegistered("No serializer for '{}'.".format(msg_type))
+        Message._dispatch_table[msg_type] = serializer
+        return serializer
+
+    @staticmethod
+    def get_type_id(msg_type: str) -> int:
+        """
+        Return numeric ID of message type used in compact headers.
 
-    def serialize(self) -> List[bytes]:
+        :param msg_type: message type
+        :return: 32-bit unsigned integer
+        """
+        return zlib.crc32(msg_type.encode('utf-8'))
+
+    @staticmethod
+    def get_header_prefixes(msg_type: str, msg_subtype: Optional[str]=None) -> List[bytes]:
+        """
+        Return list of header prefixes which match messages with given type
+        (and subtype if specified) for all supported header encodings.
+        Used as ZMQ SUB socket filters.
+
+        :param msg_type: message type
+        :param msg_subtype: optional message subtype
+        :return: list of prefixes
+        """
+        prefixes = [(msg_type + ('' if msg_subtype is None else '^' + msg_subtype)).encode('utf-8')]
+        if msg_type in Message._type_ids:
+            prefixes.append(COMPACT_HEADER_MARKER +
+                            _COMPACT_HEADER_TYPE_ID.pack(Message._type_ids[msg_type]) +
+                            ('' if msg_subtype is None else msg_subtype).encode('utf-8'))
+        return prefixes
+
+    def serialize(self, compact_header: bool=False) -> List[bytes]:
         """
         Serialize to ZMQ multipart message.
 
+        :param compact_header: use compact header if message type is registered
         :return: ZMQ multipart message
         """
         serializer = Message.__get_serializer(self.type)
         data_bytes = serializer.serialize(self.data)
-        return ['{}^{}'.format(self.type, self.subtype).encode('utf-8'), data_bytes]
+        return [self._serialize_header(compact_header), data_bytes]
+
+    def _serialize_header(self, compact_header: bool=False) -> bytes:
+        key = (self._type, self._subtype, compact_header)
+        try:
+            return Message._encoded_headers[key]
+        except KeyError:
+            pass
+        if compact_header and self._type in Message._type_ids:
+            header = (COMPACT_HEADER_MARKER +
+                      _COMPACT_HEADER_TYPE_ID.pack(Message._type_ids[self._type]) +
+                      self._subtype.encode('utf-8'))
+        else:
+            header = '{}^{}'.format(self._type, self._subtype).encode('utf-8')
+        Message.__cache_header(Message._encoded_headers, key, header)
+        return header
+
+    @staticmethod
+    def __cache_header(cache: dict, key, value) -> None:
+        if len(cache) >= Message._header_cache_max_size:
+            cache.clear()
+        cache[key] = value
 
     @staticmethod
-    def deserialize(msg: List[bytes]) -> 'Message':
+    def __deserialize_header(header: bytes) -> Tuple[str, str, MessageSerializer]:
+        try:
+            return Message._decoded_headers[header]
+        except KeyError:
+            pass
+        if header[:1] == COMPACT_HEADER_MARKER:
+            try:
+                numeric_type_id, = _COMPACT_HEADER_TYPE_ID.unpack_from(header, 1)
+                subtype_id = header[1 + _COMPACT_HEADER_TYPE_ID.size:].decode('utf-8')
+            except Exception:
+                raise Exception('Invalid message format: invalid type or subtype')
+            try:
+                type_id = Message._types_by_id[numeric_type_id]
+            except KeyError:
+                raise NoSerializerRegistered("No serializer for type ID '{}'.".format(numeric_type_id))
+        else:
+            try:
+                type_id, subtype_id = header.decode('utf-8').split('^', maxsplit=1)
+            except Exception:
+                raise Exception('Invalid message format: invalid type or subtype')
+        result = (type_id, subtype_id, Message.__get_serializer(type_id))
+        Message.__cache_header(Message._decoded_headers, header, result)
+        return result
+
+    @staticmethod
+    def deserialize(msg: List[Union[bytes, memoryview]], lazy: bool=False) -> 'Message':
         """
         Create `Message` object from ZMQ multipart message.
 
+        Header (first frame) must be `bytes`, payload can be any bytes-like
+        object, e.g. `memoryview` of a frame received with `copy=False`.
+        Both string and compact headers are accepted.
+
+        When `lazy` is `True` payload is not deserialized here. `LazyMessage`
+        object is returned instead and payload is deserialized on first
+        access to its `data` attribute.
+
         :param msg: multipart message received by ZMQ
+        :param lazy: if `True` defer payload deserialization
         :return: Message object
         """
         if len(msg) != 2:
             raise Exception('Invalid message format')
-        try:
-            type_id, subtype_id = msg[0].decode('utf-8').split('^', maxsplit=1)
-        except Exception:
-            raise Exception('Invalid message format: invalid type or subtype')
-        serializer = Message.__get_serializer(type_id)
+        type_id, subtype_id, serializer = Message.__deserialize_header(bytes(msg[0]))
+        if lazy:
+            return LazyMessage(type_id, subtype_id, serializer, msg[1])
         data = serializer.deserialize(msg[1])
         return Message(type_id, subtype_id, data)
 
+    @staticmethod
+    def deserialize_batch(msg: List[Union[bytes, memoryview]], lazy: bool=False) -> List['Message']:
+        """
+        Create list of `Message` objects from ZMQ multipart message which can
+        contain a batch of messages.
+
+        Batch consists of a single header frame followed by multiple payload
+        frames. Every payload frame is deserialized as a separate message with
+        type and subtype taken from the shared header. Regular (two frame)
+        message is returned as a single element list.
+
+        :param msg: multipart message received by ZMQ
+        :param lazy: if `True` defer payload deserialization
+        :return: list of Message objects
+        """
+        if len(msg) < 2:
+            raise Exception('Invalid message format')
+        return [Message.deserialize([msg[0], payload], lazy) for payload in msg[1:]]
+
+    @staticmethod
+    def __invalidate_caches() -> None:
+        Message._dispatch_table.clear()
+        Message._encoded_headers.clear()
+        Message._decoded_headers.clear()
+
     @staticmethod
     def register_serializer(msg_type: str, serializer_class) -> None:
         """
-        Unregister serializer for specified message type.
+        Register serializer for specified message type.
 
         :param msg_type: message type
         :param serializer_class: class derived from MessageSerializer
         """
+        numeric_type_id = Message.get_type_id(msg_type)
+        other_type = Message._types_by_id.get(numeric_type_id, msg_type)
+        if other_type != msg_type:
+            raise Exception("Type ID of '{}' collides with type ID of '{}'.".format(msg_type, other_type))
         Message.serializers[msg_type] = serializer_class()
+        Message._type_ids[msg_type] = numeric_type_id
+        Message._types_by_id[numeric_type_id] = msg_type
+        Message.__invalidate_caches()
 
     @staticmethod
     def unregister_serializer(msg_type: str) -> None:
@@ -162,6 +321,58 @@ class Message:
         :param msg_type: message type
         """
         del Message.serializers[msg_type]
+        del Message._types_by_id[Message._type_ids.pop(msg_type)]
+        Message.__invalidate_caches()
+
+
+class LazyMessage(Message):
+
+    def __init__(self,
+                 type_id: str,
+                 subtype_id: str,
+                 serializer: MessageSerializer,
+                 payload: Union[bytes, memoryview]):
+        """
+        Message which holds raw payload received from ZMQ and runs
+        deserializer only when `data` is accessed for the first time.
+        Deserialized value is cached.
+
+        Handlers which look only at `type` and `subtype` (routers, recorders,
+        statistics) never pay for payload deserialization. Not yet
+        deserialized message is serialized again by reusing raw payload.
+
+        Usually created by `Message.deserialize` with `lazy=True`.
+
+        :param type_id: type of this message
+        :param subtype_id: usually interpreted as sender peer ID
+        :param serializer: serializer used to deserialize `payload`
+        :param payload: raw (serialized) message payload
+        """
+        super().__init__(type_id, subtype_id)
+        self._serializer = serializer
+        self._payload = payload
+
+    @property
+    def data(self) -> Any:
+        if self._payload is not None:
+            self._data = self._serializer.deserialize(self._payload)
+            self._payload = None
+        return self._data
+
+    @data.setter
+    def data(self, val: Any) -> None:
+        self._data = val
+        self._payload = None
+
+    @property
+    def deserialized(self) -> bool:
+        """bool: `True` if payload was already deserialized (or `data` was set)."""
+        return self._payload is None
+
+    def serialize(self, compact_header: bool=False) -> List[bytes]:
+        if self._payload is None:
+            return super().serialize(compact_header)
+        return [self._serialize_header(compact_header), bytes(self._payload)]
 
 #
 # serializers for predefined message types
@@ -191,3 +402,4 @@ Message.register_serializer(types.BROKER_HEARTBEAT_RESPONSE, JsonMessageSerializ
 
 Message.register_serializer(types.BROKER_REGISTER_QUERY_HANDLER, JsonMessageSerializer)
 Message.register_serializer(types.BROKER_UNREGISTER_QUERY_HANDLER, JsonMessageSerializer)
+Message.register_serializer(types.BROKER_QUERY_HANDLERS_CHANGED, JsonMessageSerializer)
@@ -0,0 +1,118 @@
+import struct
+
+import numpy as np
+
+from obci.core.messages import Message, MessageSerializer, types
+from obci.configs import variables_pb2 as proto
+
+
+class SignalBlock:
+
+    def __init__(self, samples: np.ndarray, timestamps: np.ndarray) -> None:
+        """
+        Contiguous block of multichannel signal.
+
+        :param samples: 2-D array with shape `(channels, samples)`
+        :param timestamps: 1-D array with one timestamp per sample
+        """
+        super().__init__()
+        samples = np.asarray(samples)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if samples.ndim != 2:
+            raise ValueError('samples must be a 2-D (channels x samples) array')
+        if timestamps.shape != (samples.shape[1],):
+            raise ValueError('timestamps length must be equal to number of samples')
+        self.samples = samples
+        self.timestamps = timestamps
+
+    @property
+    def channels_count(self) -> int:
+        """int: Number of channels in this block."""
+        return self.samples.shape[0]
+
+    @property
+    def samples_count(self) -> int:
+        """int: Number of samples (per channel) in this block."""
+        return self.samples.shape[1]
+
+    def __eq__(self, other):
+        if not isinstance(other, SignalBlock):
+            return NotImplemented
+        return (np.array_equal(self.samples, other.samples) and
+                np.array_equal(self.timestamps, other.timestamps))
+
+    @classmethod
+    def from_sample_vector(cls, sample_vector: proto.SampleVector, dtype=np.float64) -> 'SignalBlock':
+        """
+        Convert protobuf `SampleVector` to `SignalBlock`.
+
+        :param sample_vector: protobuf `SampleVector` object
+        :param dtype: data type of created samples array
+        :return: new signal block
+        """
+        timestamps = np.array([s.timestamp for s in sample_vector.samples], dtype=np.float64)
+        if len(timestamps) == 0:
+            return cls(np.zeros((0, 0), dtype=dtype), timestamps)
+        samples = np.array([s.channels for s in sample_vector.samples], dtype=dtype).T
+        return cls(samples, timestamps)
+
+    def to_sample_vector(self) -> proto.SampleVector:
+        """
+        Convert this block to protobuf `SampleVector`.
+
+        :return: new `SampleVector` object
+        """
+        return proto.SampleVector(samples=[proto.Sample(timestamp=ts, channels=channels)
+                                           for ts, channels in zip(self.timestamps.tolist(),
+                                                                   self.samples.T.tolist())])
+
+
+class SignalBlockMessageSerializer(MessageSerializer):
+    """
+    Serializes `SignalBlock` objects.
+
+    Serialized block consists of a 16 byte header followed by raw samples
+    buffer (little-endian, C order) and raw timestamps buffer (little-endian
+    float64). Deserialized arrays are read-only views created with
+    `numpy.frombuffer`, so no data is copied on the receiving side.
+    """
+
+    HEADER = struct.Struct('<Bc6xII')
+    """Header: format version, sample type code, padding, channels count, samples count."""
+
+    VERSION = 1
+
+    DTYPES = {b'f': np.dtype('<f4'), b'd': np.dtype('<f8')}
+    DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+    @staticmethod
+    def serialize(data):
+        cls = SignalBlockMessageSerializer
+        dtype = data.samples.dtype.newbyteorder('<')
+        try:
+            code = cls.DTYPE_CODES[dtype]
+        except KeyError:
+            raise ValueError("Unsupported sample type '{}'".format(data.samples.dtype))
+        channels, samples = data.samples.shape
+        return b''.join([cls.HEADER.pack(cls.VERSION, code, channels, samples),
+                         np.ascontiguousarray(data.samples, dtype=dtype).data,
+                         np.ascontiguousarray(data.timestamps, dtype='<f8').data])
+
+    @staticmethod
+    def deserialize(data):
+        cls = SignalBlockMessageSerializer
+        try:
+            version, code, channels, samples = cls.HEADER.unpack_from(data)
+            dtype = cls.DTYPES[code]
+        except (struct.error, KeyError):
+            raise Exception('Invalid signal block format')
+        if version != cls.VERSION:
+            raise Exception('Unsupported signal block version: {}'.format(version))
+        offset = cls.HEADER.size
+        block = np.frombuffer(data, dtype, channels * samples, offset).reshape(channels, samples)
+        offset += block.nbytes
+        timestamps = np.frombuffer(data, '<f8', samples, offset)
+        return SignalBlock(block, timestamps)
+
+
+Message.register_serializer(types.SIGNAL_BLOCK, SignalBlockMessageSerializer)
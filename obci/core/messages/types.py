@@ -26,3 +26,6 @@ BROKER_HEARTBEAT_RESPONSE = 'BROKER_HEARTBEAT_RESPONSE'
 
 BROKER_REGISTER_QUERY_HANDLER = 'BROKER_REGISTER_QUERY_HANDLER'
 BROKER_UNREGISTER_QUERY_HANDLER = 'BROKER_UNREGISTER_QUERY_HANDLER'
+BROKER_QUERY_HANDLERS_CHANGED = 'BROKER_QUERY_HANDLERS_CHANGED'
+
+SIGNAL_BLOCK = 'SIGNAL_BLOCK'
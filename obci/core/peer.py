@@ -3,18 +3,19 @@ import time
 import uuid
 import argparse
 import types
-from collections import namedtuple
-from typing import Optional, Callable, List, Union, Any
+from collections import namedtuple, OrderedDict
+from typing import Optional, Callable, Iterable, List, Tuple, Union, Any
 
 import zmq
 import zmq.asyncio
 
-from .message_statistics import MsgPerfStats
+from .connection_pool import ConnectionPool
+from .message_statistics import MsgPerfStats, BatchStats
 from .messages import Message, types as msg_types
 from .asyncio_task_manager import ensure_not_inside_msg_loop
 from .zmq_asyncio_task_manager import ZmqAsyncioTaskManager
 from .message_handler_mixin import MessageHandlerMixin
-from ..utils.zmq import bind_to_urls, recv_multipart_with_timeout
+from ..utils.zmq import bind_to_urls, frames_to_buffers, split_envelope
 
 QueryDataType = Union[dict, str, int, float, type(None), List[Any]]
 QueryHandler = Union[Callable[[Message], Message], Callable[[Message], types.CoroutineType]]
@@ -62,7 +63,15 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
                  asyncio_loop: Optional[zmq.asyncio.ZMQEventLoop] = None,
                  zmq_context: Optional[zmq.asyncio.Context] = None,
                  zmq_io_threads: int = 1,
-                 hwm: int = 1000
+                 hwm: int = 1000,
+                 zero_copy: bool = False,
+                 lazy_deserialization: bool = False,
+                 compact_headers: bool = False,
+                 send_batch_size: int = 1,
+                 send_batch_delay: float = 0.005,
+                 connection_idle_timeout: float = 30.0,
+                 query_cache_ttl: float = 5.0,
+                 ordered_sync_message_types: Iterable[str] = ()
                  ) -> None:
         """
         Base peer class. All peers derive from this class.
@@ -73,6 +82,14 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
         :param zmq_context: existing ZMQ asyncio context or `None` if new context is requested
         :param zmq_io_threads: number of ZMQ I/O threads
         :param hwm: ZMQ high water mark
+        :param zero_copy: receive messages without copying payloads; serializers get `memoryview` objects
+        :param lazy_deserialization: deserialize payloads of received messages on first access to `data`
+        :param compact_headers: send messages with compact (binary) headers
+        :param send_batch_size: max number of broadcast messages sent in one batch; `1` disables batching
+        :param send_batch_delay: max time in seconds a broadcast message can wait in send queue
+        :param connection_idle_timeout: time in seconds after which unused connection to other peer's REP is closed
+        :param query_cache_ttl: time in seconds for which query handler resolved by broker is cached; `0` disables cache
+        :param ordered_sync_message_types: sync message types handled one at a time in order of arrival
         """
 
         assert isinstance(urls, (str, PeerInitUrls))
@@ -88,10 +105,29 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
         self._initialization_finished = False
 
         self._hwm = hwm
+        self._zero_copy = zero_copy
+        self._lazy_deserialization = lazy_deserialization
+        self._compact_headers = compact_headers
+        self._send_batch_size = max(1, send_batch_size)
+        self._send_batch_delay = send_batch_delay
+
+        # broadcast messages waiting to be sent, payloads are grouped
+        # by header to keep SUB prefix filtering working for batches
+        self._send_queue = OrderedDict()
+        self._send_queue_count = 0
+        self._send_queue_timestamp = None
 
         self._pub = None  # PUB socket for sending messages to broker XSUB
         self._sub = None  # SUB socket for receiving messages from broker's XPUB
-        self._rep = None  # synchronous requests from peers
+        self._rep = None  # ROUTER socket for synchronous requests from peers
+
+        # sync messages are handled concurrently, except for these types
+        self._ordered_sync_message_types = set(ordered_sync_message_types)
+        self._ordered_sync_tasks = {}  # last handler task for each ordered message type
+
+        # persistent DEALER connections to REP sockets of other peers
+        self._connection_pool = ConnectionPool(self._ctx, self.create_task, connection_idle_timeout,
+                                               hwm=hwm, copy=not zero_copy)
 
         self._broker_rep_url = None
         self._broker_xpub_url = None
@@ -126,6 +162,13 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
 
         self._max_query_redirects = 10
 
+        # max number of messages received and handled in one receive loop iteration
+        self._receive_budget = 64
+
+        # query handlers resolved by broker: {query_type: (url, expiration_time)}
+        self._query_cache_ttl = query_cache_ttl
+        self._query_cache = {}
+
         # logs verbosity
         self._log_messages = True
         self._log_peers_info = True
@@ -141,6 +184,9 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
         self._calc_recv_stats = False
         self._recv_stats = MsgPerfStats(stats_interval, 'RECV')
 
+        # batched send statistics
+        self._send_batch_stats = BatchStats()
+
         self.create_task(self._connect_to_broker())
 
     # peer id is read only
@@ -152,6 +198,11 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
         """
         return self._id
 
+    @property
+    def send_batch_stats(self) -> BatchStats:
+        """BatchStats: Statistics of batched broadcast message sending."""
+        return self._send_batch_stats
+
     @classmethod
     def create_peer(cls, argv: List[str]) -> 'Peer':
         """Parse supplied argv and create new Peer instance."""
@@ -180,22 +231,21 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
         parser.add_argument('--rep-urls', nargs='+', required=False)
         return parser
 
-    @staticmethod
-    def __get_filter_bytes(msg_type: str, msg_subtype: Optional[str] = None) -> bytes:
-        return (msg_type + ('' if msg_subtype is None else '^' + msg_subtype)).encode('utf-8')
-
     def set_filter(self, msg_type: str, msg_subtype: Optional[str] = None) -> None:
         """
         Subscribe for messages with `msg_type` message type.
 
-        Peer must be initialized to use this function.
+        Peer must be initialized to use this function. Messages sent with
+        both string and compact headers are received, but compact headers
+        are matched only when `msg_type` serializer is already registered.
 
         Args:
             msg_type:
             msg_subtype:
         """
         if self._sub is not None:
-            self._sub.subscribe(self.__get_filter_bytes(msg_type, msg_subtype))
+            for prefix in Message.get_header_prefixes(msg_type, msg_subtype):
+                self._sub.subscribe(prefix)
 
     def remove_filter(self, msg_type: str, msg_subtype: Optional[str] = None) -> None:
         """
@@ -208,7 +258,8 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
             msg_subtype:
         """
         if self._sub is not None:
-            self._sub.unsubscribe(self.__get_filter_bytes(msg_type, msg_subtype))
+            for prefix in Message.get_header_prefixes(msg_type, msg_subtype):
+                self._sub.unsubscribe(prefix)
 
     def _cleanup(self) -> None:
         """
@@ -218,7 +269,14 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
             Always remember to call `super()._cleanup()` when overloading this function.
         """
         self._initialization_finished = False
-        self._pub.close(linger=0)
+        self._connection_pool.close()
+        # messages waiting in the batching queue would be lost otherwise,
+        # so send them and give them a moment to leave the socket
+        pub_linger = 0
+        if self._pub is not None and self._send_queue_count > 0:
+            self.__flush_messages_nowait()
+            pub_linger = max(1, int(self._send_batch_delay * 1000))
+        self._pub.close(linger=pub_linger)
         self._sub.close(linger=0)
         self._rep.close(linger=0)
         self._pub = None
@@ -230,7 +288,7 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
         try:
             self._pub = self._ctx.socket(zmq.PUB)
             self._sub = self._ctx.socket(zmq.SUB)
-            self._rep = self._ctx.socket(zmq.REP)
+            self._rep = self._ctx.socket(zmq.ROUTER)
             for socket in [self._pub, self._sub, self._rep]:
                 socket.set_hwm(self._hwm)
                 socket.set(zmq.LINGER, 0)
@@ -323,6 +381,10 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
         """
         self.create_task(self._receive_sync_messages())
         self.create_task(self._receive_async_messages())
+        if self._query_cache_ttl > 0:
+            self.register_message_handler(msg_types.BROKER_QUERY_HANDLERS_CHANGED,
+                                          self._handle_query_handlers_changed)
+            self.set_filter(msg_types.BROKER_QUERY_HANDLERS_CHANGED)
 
     async def heartbeat(self) -> None:
         """
@@ -352,6 +414,9 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
         """
         Send message to specified peer and return answer.
 
+        Connections are kept open and reused by subsequent calls
+        (see :class:`obci.core.connection_pool.ConnectionPool`).
+
         :param url: peer's REP socket URL
         :param msg: message object to send
         :param timeout: timeout in seconds
@@ -360,28 +425,79 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
         if self._log_messages:
             self._logger.debug("sending sync message to '{}': type '{}', subtype '{}'"
                                .format(url, msg.type, msg.subtype))
-        req = self._ctx.socket(zmq.REQ)
-        req.connect(url)
-        try:
-            await req.send_multipart(msg.serialize())
-            response = await recv_multipart_with_timeout(req, timeout)
-        finally:
-            req.close(linger=0)
+        response = await self._connection_pool.send(url, msg.serialize(self._compact_headers), timeout)
+        if self._zero_copy:
+            response = frames_to_buffers(response)
         return Message.deserialize(response)
 
     async def send_message(self, msg: Message) -> None:
         """
         Send broadcast message.
 
+        When batching is enabled (`send_batch_size` > 1) message is queued
+        and sent when batch is full or after `send_batch_delay` seconds.
+        Messages with the same type and subtype are always delivered in order.
+
         :param msg: message object to send
         """
         if self._log_messages:
             self._logger.debug("sending async message: type '{}', subtype '{}'"
                                .format(msg.type, msg.subtype))
-        serialized_msg = msg.serialize()
+        serialized_msg = msg.serialize(self._compact_headers)
         if self._calc_send_stats:
             self._send_stats.msg(serialized_msg)
-        await self._pub.send_multipart(serialized_msg)
+        if self._send_batch_size == 1:
+            await self._pub.send_multipart(serialized_msg)
+            return
+        header, payload = serialized_msg
+        self._send_queue.setdefault(header, []).append(payload)
+        self._send_queue_count += 1
+        if self._send_queue_count >= self._send_batch_size:
+            await self.flush_messages()
+        elif self._send_queue_count == 1:
+            self._send_queue_timestamp = time.monotonic()
+            self.create_task(self.__flush_messages_delayed(self._send_queue_timestamp))
+
+    async def flush_messages(self) -> None:
+        """
+        Send all queued broadcast messages.
+
+        Each group of messages with the same header is sent as a single
+        multipart message: header frame followed by payload frames.
+        """
+        if self._send_queue_count == 0:
+            return
+        for header, payloads in self.__take_send_queue().items():
+            await self._pub.send_multipart([header] + payloads)
+
+    def __flush_messages_nowait(self) -> None:
+        """
+        Send all queued broadcast messages without waiting for the event loop.
+
+        Used on cleanup, when the event loop can be already stopped.
+        """
+        pub = zmq.Socket.shadow(self._pub.underlying)
+        try:
+            for header, payloads in self.__take_send_queue().items():
+                pub.send_multipart([header] + payloads, zmq.NOBLOCK)
+        except zmq.ZMQError:
+            self._logger.warning("could not send queued messages on cleanup of peer '{}'".format(self.id),
+                                 exc_info=True)
+
+    def __take_send_queue(self) -> OrderedDict:
+        queue = self._send_queue
+        self._send_batch_stats.batch(self._send_queue_count,
+                                     time.monotonic() - self._send_queue_timestamp)
+        self._send_queue = OrderedDict()
+        self._send_queue_count = 0
+        self._send_queue_timestamp = None
+        return queue
+
+    async def __flush_messages_delayed(self, queue_timestamp: float) -> None:
+        await asyncio.sleep(self._send_batch_delay)
+        # skip if this batch was already flushed by send_message or flush_messages
+        if self._send_queue_timestamp == queue_timestamp:
+            await self.flush_messages()
 
     @ensure_not_inside_msg_loop
     def query(self,
@@ -408,18 +524,42 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
                           ) -> QueryDataType:
         """
         Async version of :func:`Peer.query`.
+
+        When query is sent to Broker, URL of the peer handling this query
+        type is cached for `query_cache_ttl` seconds and subsequent queries are
+        sent directly to that peer. Cache is invalidated by Broker when query
+        handlers change. As invalidation is asynchronous, a query sent to
+        a cached peer which is gone or doesn't handle the query any more
+        is sent again to Broker.
         """
         if query_params is None:
             query_params = {}
         query_msg = Message(query_type, self.id, query_params)
         url = self._broker_rep_url if initial_peer is None else initial_peer
+        cached_url = self.__get_cached_query_url(query_type) if initial_peer is None else None
+        if cached_url is not None:
+            url = cached_url
         redirects = 0
         while True:
-            response = await self.send_message_to_peer(url, query_msg)
+            try:
+                response = await self.send_message_to_peer(url, query_msg)
+            except Exception:
+                if url != cached_url:
+                    raise
+                response = None
+            if url == cached_url and (response is None or
+                                      response.type in (msg_types.INVALID_REQUEST, msg_types.INTERNAL_ERROR)):
+                # stale cache entry, retry once through Broker
+                self._query_cache.pop(query_type, None)
+                url = self._broker_rep_url
+                cached_url = None
+                continue
             if response.type == msg_types.REDIRECT:
                 urls = response.data['peers']
                 assert len(urls) > 0
                 if len(urls) == 1:
+                    if url == self._broker_rep_url and self._query_cache_ttl > 0:
+                        self._query_cache[query_type] = (urls[0][1], time.monotonic() + self._query_cache_ttl)
                     url = urls[0][1]
                 elif len(urls) > 1:
                     raise MultiplePeersAvailable(urls, 'Multiple peers can answer this query')
@@ -433,6 +573,20 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
                                    .format(self._max_query_redirects, query_type))
                 raise TooManyRedirectsException('max redirects reached')
 
+    def __get_cached_query_url(self, query_type: str) -> Optional[str]:
+        try:
+            url, expiration_time = self._query_cache[query_type]
+        except KeyError:
+            return None
+        if time.monotonic() >= expiration_time:
+            del self._query_cache[query_type]
+            return None
+        return url
+
+    async def _handle_query_handlers_changed(self, msg: Message) -> None:
+        for query_type in msg.data['msg_types']:
+            self._query_cache.pop(query_type, None)
+
     @ensure_not_inside_msg_loop
     def register_query_handler(self,
                                msg_type: str,
@@ -486,56 +640,144 @@ class Peer(ZmqAsyncioTaskManager, MessageHandlerMixin):
         else:
             self.unregister_message_handler(msg_type)
 
+    def _split_request(self, frames: list) -> Tuple[list, List[Union[bytes, memoryview]]]:
+        """
+        Split request received on ROUTER socket.
+
+        In zero-copy mode frames are received with `copy=False` and payload
+        is returned as a `memoryview` of ZMQ frame.
+
+        :param frames: received multipart message
+        :return: tuple (envelope, message) where envelope must be sent back with the response
+        """
+        envelope, msg_raw = split_envelope(frames)
+        if self._zero_copy:
+            msg_raw = frames_to_buffers(msg_raw)
+        return envelope, msg_raw
+
+    def _deserialize_messages(self, frames: list) -> List[Message]:
+        """
+        Deserialize a batch of messages received on SUB socket.
+
+        Multipart messages with multiple payload frames are sent by peers
+        with batching enabled. In zero-copy mode frames are received with
+        `copy=False` and payloads are passed to deserializer as `memoryview`
+        objects. With lazy deserialization enabled `LazyMessage` objects are
+        returned.
+
+        :param frames: received multipart message
+        :return: list of messages
+        """
+        if self._zero_copy:
+            frames = frames_to_buffers(frames)
+        return Message.deserialize_batch(frames, lazy=self._lazy_deserialization)
+
     async def _receive_sync_messages(self) -> None:
-        async def sync_handler():
+        """
+        Receive sync messages and handle each one in a separate task, so
+        handlers awaiting I/O don't block other requests. Messages with types
+        listed in `ordered_sync_message_types` are handled one at a time in
+        order of arrival.
+        """
+        async def sync_handler(frames):
             try:
-                try:
-                    msg_raw = await self._rep.recv_multipart()
-                    msg = Message.deserialize(msg_raw)
-                    if self._log_messages:
-                        self._logger.debug("received sync message: type '{}', subtype: '{}'"
-                                           .format(msg.type, msg.subtype))
-                    response = await self.handle_message(msg)
-                    if not isinstance(response, Message):
-                        raise Exception("Bad handler")
-                    response = response.serialize()
-                except Exception as ex:
-                    response = Message(msg_types.INTERNAL_ERROR, self.id, str(ex)).serialize()
-                    raise
-                finally:
-                    await self._rep.send_multipart(response)
+                envelope, msg_raw = self._split_request(frames)
             except Exception:
                 self._logger.exception('Uncaught exception in sync message handler')
+                return
+            try:
+                msg = Message.deserialize(msg_raw, lazy=self._lazy_deserialization)
+            except Exception as ex:
+                self._logger.exception('Uncaught exception in sync message handler')
+                response = Message(msg_types.INTERNAL_ERROR, self.id, str(ex))
+                await self._rep.send_multipart(envelope + response.serialize(self._compact_headers))
+                return
+            if self._log_messages:
+                self._logger.debug("received sync message: type '{}', subtype: '{}'"
+                                   .format(msg.type, msg.subtype))
+            if msg.type in self._ordered_sync_message_types:
+                previous_task = self._ordered_sync_tasks.get(msg.type)
+                task = self.create_task(self._handle_sync_message(envelope, msg, previous_task))
+                self._ordered_sync_tasks[msg.type] = task
+                task.add_done_callback(lambda t, msg_type=msg.type: self.__ordered_sync_task_done(msg_type, t))
+            else:
+                self.create_task(self._handle_sync_message(envelope, msg))
 
         await self.__receive_messages_helper(self._rep, sync_handler)
 
-    async def _receive_async_messages(self) -> None:
-        async def async_handler():
+    async def _handle_sync_message(self,
+                                   envelope: list,
+                                   msg: Message,
+                                   previous_task: Optional[asyncio.Future] = None
+                                   ) -> None:
+        """
+        Handle single sync message and send response.
+
+        :param envelope: request envelope received with the message
+        :param msg: received message
+        :param previous_task: if not `None` wait for this task to finish before handling `msg`
+        """
+        if previous_task is not None:
+            await asyncio.wait([previous_task])
+        try:
             try:
-                msg = Message.deserialize(await self._sub.recv_multipart())
-                if self._calc_recv_stats:
-                    self._recv_stats.msg(msg)
-                if self._log_messages:
-                    self._logger.debug("received async message: type '{}', subtype: '{}'"
-                                       .format(msg.type, msg.subtype))
                 response = await self.handle_message(msg)
-                if response is not None:
-                    await self.send_message(response)
+                if not isinstance(response, Message):
+                    raise Exception("Bad handler")
+                response = response.serialize(self._compact_headers)
+            except Exception as ex:
+                response = Message(msg_types.INTERNAL_ERROR, self.id, str(ex))
+                response = response.serialize(self._compact_headers)
+                raise
+            finally:
+                await self._rep.send_multipart(envelope + response)
+        except Exception:
+            self._logger.exception('Uncaught exception in sync message handler')
+
+    def __ordered_sync_task_done(self, msg_type: str, task: asyncio.Future) -> None:
+        if self._ordered_sync_tasks.get(msg_type) is task:
+            del self._ordered_sync_tasks[msg_type]
+
+    async def _receive_async_messages(self) -> None:
+        async def async_handler(frames):
+            try:
+                messages = self._deserialize_messages(frames)
             except Exception:
                 self._logger.exception('Uncaught exception in async message handler')
+                return
+            for msg in messages:
+                try:
+                    if self._calc_recv_stats:
+                        self._recv_stats.msg(msg)
+                    if self._log_messages:
+                        self._logger.debug("received async message: type '{}', subtype: '{}'"
+                                           .format(msg.type, msg.subtype))
+                    response = await self.handle_message(msg)
+                    if response is not None:
+                        await self.send_message(response)
+                except Exception:
+                    self._logger.exception('Uncaught exception in async message handler')
 
         await self.__receive_messages_helper(self._sub, async_handler)
 
-    @staticmethod
-    async def __receive_messages_helper(socket: zmq.asyncio.Socket,
-                                        handler: Callable[[], types.CoroutineType]
+    async def __receive_messages_helper(self,
+                                        socket: zmq.asyncio.Socket,
+                                        handler: Callable[[list], types.CoroutineType]
                                         ) -> None:
         """
-        Two concurrent polling loops are run (for SUB and REP) to avoid one message type processing blocking another.
+        Receive messages from `socket` and pass them to `handler`.
+
+        Two concurrent loops are run (for SUB and ROUTER) to avoid one message type processing blocking another.
+        Loop awaits the socket directly (there are no idle wakeups) and after each wakeup handles up to
+        `self._receive_budget` messages which are already waiting before yielding to the event loop.
         """
-        poller = zmq.asyncio.Poller()
-        poller.register(socket, zmq.POLLIN)
+        copy = not self._zero_copy
         while True:
-            events = await poller.poll(timeout=100)  # timeout in milliseconds
-            if socket in dict(events):
-                await handler()
+            await handler(await socket.recv_multipart(copy=copy))
+            for _ in range(self._receive_budget - 1):
+                try:
+                    frames = await socket.recv_multipart(zmq.NOBLOCK, copy=copy)
+                except zmq.Again:
+                    break
+                await handler(frames)
+            await asyncio.sleep(0)
@@ -1,5 +1,5 @@
 
-from obci.core.messages import Message
+from obci.core.messages import Message, types as msg_types
 from obci.core.peer import Peer
 
 from obci.utils.signal_generators import AsyncSignalGenerator
@@ -20,4 +20,4 @@ class DummyAmplifierPeer(Peer):
     async def generate_test_signal(self):
         sig_gen = AsyncSignalGenerator()
         async for samples in sig_gen:
-            await self.send_message(Message('SampleVector', self.id, samples))
+            await self.send_message(Message(msg_types.SIGNAL_BLOCK, self.id, samples))
@@ -3,11 +3,10 @@ import time
 import numpy as np
 
 from obci.core.peer import Peer
-from obci.core.messages import Message
+from obci.core.messages import Message, types as msg_types
+from obci.core.messages.signal_block import SignalBlock
 from obci.utils.signal_generators import saw_generator
 
-from obci.core.messages.protobuf_serializer import proto
-
 
 class DummySignalReceiverPeer(Peer):
     """
@@ -24,15 +23,14 @@ class DummySignalReceiverPeer(Peer):
 
     async def initialization_finished(self):
         await super().initialization_finished()
-        self.register_message_handler('SampleVector', self.handle_signal_message)
-        self.set_filter('SampleVector', self._generator_peer_name)
+        self.register_message_handler(msg_types.SIGNAL_BLOCK, self.handle_signal_message)
+        self.set_filter(msg_types.SIGNAL_BLOCK, self._generator_peer_name)
 
     async def handle_signal_message(self, msg):
-        new_samples = []
-        for d in msg.data.samples:
-            new_samples.append(proto.Sample(timestamp=time.time(),
-                                            channels=[self._samples_counter,
-                                                      np.sum(d.channels) / len(d.channels),
-                                                      next(self._saw_gen)]))
-            self._samples_counter += 1
-        return Message('SampleVector', self.id, proto.SampleVector(samples=new_samples))
+        samples_count = msg.data.samples_count
+        counter = np.arange(self._samples_counter, self._samples_counter + samples_count)
+        saw = [next(self._saw_gen) for _ in range(samples_count)]
+        self._samples_counter += samples_count
+        samples = np.vstack([counter, msg.data.samples.mean(axis=0), saw])
+        timestamps = np.full(samples_count, time.time())
+        return Message(msg_types.SIGNAL_BLOCK, self.id, SignalBlock(samples, timestamps))
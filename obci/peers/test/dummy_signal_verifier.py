@@ -1,5 +1,7 @@
 
 from obci.core.peer import Peer
+from obci.core.messages import types as msg_types
+from obci.core.messages import signal_block  # noqa: F401 (registers SIGNAL_BLOCK serializer)
 from obci.utils.signal_generators import SawVerifier
 
 
@@ -17,15 +19,13 @@ class DummySignalVerifierPeer(Peer):
 
     async def initialization_finished(self):
         await super().initialization_finished()
-        self.register_message_handler('SampleVector', self.handle_signal_message)
-        self.set_filter('SampleVector', self._receiver_peer_name)
+        self.register_message_handler(msg_types.SIGNAL_BLOCK, self.handle_signal_message)
+        self.set_filter(msg_types.SIGNAL_BLOCK, self._receiver_peer_name)
 
     async def handle_signal_message(self, msg):
-        for d in msg.data.samples:
-            data = d.channels
-            # print('mean: {}'.format(data[1]))
+        for saw_value in msg.data.samples[2]:
             try:
-                self._saw_verifier.verify_next(data[2])
+                self._saw_verifier.verify_next(saw_value)
                 if self.signal_ok is None:
                     self.signal_ok = True
             except Exception:
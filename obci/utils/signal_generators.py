@@ -5,7 +5,7 @@ import asyncio
 
 import numpy as np
 
-from obci.core.messages.protobuf_serializer import proto
+from obci.core.messages.signal_block import SignalBlock
 
 
 MAX_VAL = 10
@@ -74,7 +74,7 @@ class AsyncSignalGenerator:
     def __aiter__(self):
         return self
 
-    async def __anext__(self) -> proto.SampleVector:
+    async def __anext__(self) -> SignalBlock:
         if self._last_time is None:
             self._last_time = time.monotonic()
         sleep_duration = self._samples_delay - (time.monotonic() - self._last_time)
@@ -86,10 +86,15 @@ class AsyncSignalGenerator:
         if self._stop:
             raise StopAsyncIteration
         self._last_time = time.monotonic()
-        return proto.SampleVector(samples=[self._get_next_sample() for _ in range(self._samples_per_iteration)])
-
-    def _get_next_sample(self) -> proto.Sample:
-        sample = proto.Sample(timestamp=time.time(), channels=np.array([
+        samples = []
+        timestamps = np.empty(self._samples_per_iteration)
+        for i in range(self._samples_per_iteration):
+            timestamps[i] = time.time()
+            samples.append(self._get_next_sample())
+        return SignalBlock(np.column_stack(samples), timestamps)
+
+    def _get_next_sample(self) -> np.ndarray:
+        sample = np.array([
             self._samples_counter,
             time.time(),
             time.monotonic(),
@@ -100,7 +105,7 @@ class AsyncSignalGenerator:
             np.sin(2.0 * np.pi * 100.0 * self._samples_counter / self._sampling_rate),  # 100 Hz sin
             random.random(),
             next(self._saw_gen)
-        ], dtype=float))
+        ], dtype=float)
         self._samples_counter += 1
         self._last_flip = 0 if self._last_flip == 1 else 1
         return sample
@@ -1,6 +1,6 @@
 import asyncio
 import time
-from typing import List
+from typing import List, Tuple, Union
 
 import zmq
 
@@ -31,19 +31,50 @@ class TimeoutException(Exception):
 
 async def recv_multipart_with_timeout(socket,
                                       timeout: float=1.0,
-                                      sleep_interval: float=0.01
+                                      sleep_interval: float=0.01,
+                                      copy: bool=True
                                       ) -> bytes:
     """
     This wrapper exists because of a bug in socket.recv_multipart function
     (zmq.asyncio sockets ignore RCVTIMEO option).
     For more information see: https://github.com/zeromq/pyzmq/issues/825.
+
+    When `copy` is `False` list of `zmq.Frame` objects is returned.
     """
     start_time = time.monotonic()
     while True:
         try:
-            response = await socket.recv_multipart(zmq.NOBLOCK)
+            response = await socket.recv_multipart(zmq.NOBLOCK, copy=copy)
             return response
         except zmq.error.Again:
             if time.monotonic() - start_time > timeout:
                 raise TimeoutException()
             await asyncio.sleep(sleep_interval)
+
+
+def frames_to_buffers(frames: List[zmq.Frame]) -> List[Union[bytes, memoryview]]:
+    """
+    Convert multipart message received with `copy=False` to format accepted
+    by `Message.deserialize`. First frame (message header) is copied to
+    `bytes`, remaining frames are returned as `memoryview` objects pointing
+    directly to ZMQ owned memory.
+
+    :param frames: list of frames returned by `recv_multipart(copy=False)`
+    :return: list of message parts
+    """
+    return [frame.bytes for frame in frames[:1]] + [frame.buffer for frame in frames[1:]]
+
+
+def split_envelope(frames: List[Union[bytes, zmq.Frame]]) -> Tuple[list, list]:
+    """
+    Split multipart message received by ROUTER socket into an envelope and
+    message body. Envelope consists of all frames up to and including the
+    first empty (delimiter) frame and must be sent back with the response.
+
+    :param frames: received multipart message (`bytes` or `zmq.Frame` objects)
+    :return: tuple (envelope, body)
+    """
+    for i, frame in enumerate(frames):
+        if len(frame) == 0:
+            return frames[:i + 1], frames[i + 1:]
+    raise ValueError('Invalid message envelope')
@@ -2,11 +2,12 @@
 
 import asyncio
 import logging
+import time
 
 import pytest
 
 from obci.core.broker import Broker
-from obci.core.messages import Message
+from obci.core.messages import Message, types as msg_types
 from obci.core.peer import (Peer,
                             PeerInitUrls,
                             TooManyRedirectsException,
@@ -90,6 +91,10 @@ def run_test(broker_rep,
 
     wait_for_peers(all_peers, broker)
 
+    request_stats = broker.request_stats.as_dict()
+    assert request_stats['requests'][msg_types.BROKER_HELLO]['count'] == len(all_peers) + 1
+    assert 1 <= request_stats['max_in_flight'] <= 16
+
     def wrap_lambda(lambda_func):
         if use_async_lambdas:
             async def wrapper(*args, **kwargs):
@@ -152,6 +157,15 @@ def run_test(broker_rep,
     # answered by single peer
     assert query1_peer.query('Q1_QUERY') == json_data
 
+    # handler resolved by broker is cached, second query goes directly to peer
+    assert query1_peer._query_cache['Q1_QUERY'][0] == query1_peer._rep_listening_urls[0]
+    assert query1_peer.query('Q1_QUERY') == json_data
+
+    # stale cache entry (peer not handling the query any more) is refreshed through broker
+    query1_peer._query_cache['Q1_QUERY'] = (url_answer_peer, time.monotonic() + 100.0)
+    assert query1_peer.query('Q1_QUERY') == json_data
+    assert query1_peer._query_cache['Q1_QUERY'][0] == query1_peer._rep_listening_urls[0]
+
     # answered by two peers
     try:
         query1_peer.query('QA_QUERY')
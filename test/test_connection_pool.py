@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import pytest
+import zmq
+import zmq.asyncio
+
+from obci.core.connection_pool import ConnectionPool
+from obci.core.messages import Message
+from obci.utils.zmq import TimeoutException
+
+
+async def echo_server(rep, delay=0.0):
+    while True:
+        request = await rep.recv_multipart()
+        await asyncio.sleep(delay)
+        msg = Message.deserialize(request)
+        await rep.send_multipart(Message(msg.type, 'echo', msg.data).serialize())
+
+
+def run_pool_test(coro_func, delay=0.0, idle_timeout=30.0):
+    ctx = zmq.asyncio.Context()
+    loop = asyncio.new_event_loop()
+
+    async def main():
+        rep = ctx.socket(zmq.REP)
+        rep.bind('inproc://rep')
+        server = asyncio.ensure_future(echo_server(rep, delay))
+        pool = ConnectionPool(ctx, asyncio.ensure_future, idle_timeout)
+        try:
+            await coro_func(pool)
+        finally:
+            pool.close()
+            await asyncio.sleep(0.01)
+            server.cancel()
+            rep.close(linger=0)
+
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+        ctx.destroy(linger=0)
+
+
+def test_connection_reuse():
+    async def check(pool):
+        for i in range(10):
+            response = await pool.send('inproc://rep', Message('TEST_QUERY', 'a', str(i)).serialize())
+            response = Message.deserialize(response)
+            assert response.subtype == 'echo'
+            assert response.data == str(i)
+            assert pool.connections_count == 1
+
+    run_pool_test(check)
+
+
+def test_concurrent_requests():
+    async def send(pool, i):
+        response = await pool.send('inproc://rep', Message('TEST_QUERY', 'a', str(i)).serialize())
+        return Message.deserialize(response).data
+
+    async def check(pool):
+        results = await asyncio.gather(*[send(pool, i) for i in range(20)])
+        assert results == [str(i) for i in range(20)]
+        assert pool.connections_count == 1
+
+    run_pool_test(check)
+
+
+def test_timeout():
+    async def check(pool):
+        with pytest.raises(TimeoutException):
+            await pool.send('inproc://rep', Message('TEST_QUERY', 'a', 'slow').serialize(), timeout=0.05)
+        # late response to timed out request is dropped
+        response = await pool.send('inproc://rep', Message('TEST_QUERY', 'a', 'next').serialize(), timeout=1.0)
+        assert Message.deserialize(response).data == 'next'
+
+    run_pool_test(check, delay=0.1)
+
+
+def test_timeout_closes_connection():
+    async def check(pool):
+        await pool.send('inproc://rep', Message('TEST_QUERY', 'a', 'first').serialize(), timeout=1.0)
+        connection = pool._connections['inproc://rep']
+        with pytest.raises(TimeoutException):
+            await pool.send('inproc://rep', Message('TEST_QUERY', 'a', 'slow').serialize(), timeout=0.05)
+        assert connection.closed
+        assert pool.connections_count == 0
+        response = await pool.send('inproc://rep', Message('TEST_QUERY', 'a', 'next').serialize(), timeout=1.0)
+        assert Message.deserialize(response).data == 'next'
+        assert pool._connections['inproc://rep'] is not connection
+
+    run_pool_test(check, delay=0.1)
+
+
+def test_idle_eviction():
+    async def check(pool):
+        await pool.send('inproc://rep', Message('TEST_QUERY', 'a', '').serialize())
+        assert pool.connections_count == 1
+        assert pool._connections['inproc://rep'].idle_timer is not None
+        await asyncio.sleep(0.3)
+        assert pool.connections_count == 0
+        await pool.send('inproc://rep', Message('TEST_QUERY', 'a', '').serialize())
+        assert pool.connections_count == 1
+
+    run_pool_test(check, idle_timeout=0.1)
+
+
+if __name__ == '__main__':
+    test_connection_reuse()
+    test_concurrent_requests()
+    test_timeout()
+    test_timeout_closes_connection()
+    test_idle_eviction()
@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 
 import pytest
+import zmq
 
 from obci.core.messages import (Message,
+                                LazyMessage,
+                                COMPACT_HEADER_MARKER,
                                 types as msg_types,
                                 NullMessageSerializer,
                                 StringMessageSerializer,
                                 JsonMessageSerializer,
                                 NoSerializerRegistered)
 
+from obci.utils.zmq import frames_to_buffers
+
 from utils import strings_list, json_data
 
 
@@ -23,13 +28,20 @@ def check_round_trip(msg_type, subtype, payload):
     assert isinstance(msg.subtype, str)
     msg_serialized = msg.serialize()
     assert all(isinstance(x, bytes) for x in msg_serialized)
-    msg_deserialized = Message.deserialize(msg_serialized)
-    assert msg_deserialized.type == msg.type
-    assert msg_deserialized.subtype == msg.subtype
-    if msg.data is None or isinstance(msg.data, (str, bytes, dict)):
-        assert msg_deserialized.data == msg.data
-    else:
-        raise Exception("don't know how to compare playloads for equality")
+    msg_serialized_compact = msg.serialize(compact_header=True)
+    assert all(isinstance(x, bytes) for x in msg_serialized_compact)
+    # payload as bytes, as memoryview and as memoryview of ZMQ frame (zero-copy receive)
+    for msg_raw in [msg_serialized,
+                    msg_serialized_compact,
+                    [msg_serialized[0], memoryview(msg_serialized[1])],
+                    frames_to_buffers([zmq.Frame(x) for x in msg_serialized])]:
+        msg_deserialized = Message.deserialize(msg_raw)
+        assert msg_deserialized.type == msg.type
+        assert msg_deserialized.subtype == msg.subtype
+        if msg.data is None or isinstance(msg.data, (str, bytes, dict)):
+            assert msg_deserialized.data == msg.data
+        else:
+            raise Exception("don't know how to compare playloads for equality")
     return True
 
 
@@ -97,6 +109,109 @@ def test_2():
         assert check_round_trip('JSON', 0, json_data)
 
 
+def test_compact_header():
+    Message.register_serializer('COMPACT', JsonMessageSerializer)
+    try:
+        type_id = Message.get_type_id('COMPACT')
+        assert type_id == Message.get_type_id('COMPACT')
+        assert type_id != Message.get_type_id('COMPACT2')
+
+        msg = Message('COMPACT', 'peer_1', json_data)
+        header, payload = msg.serialize(compact_header=True)
+        assert header[:1] == COMPACT_HEADER_MARKER
+        assert header.endswith(b'peer_1')
+        assert payload == msg.serialize()[1]
+        assert len(header) < len(msg.serialize()[0])
+
+        # both header formats match SUB filter prefixes
+        for header in [msg.serialize()[0], msg.serialize(compact_header=True)[0]]:
+            assert any(header.startswith(p) for p in Message.get_header_prefixes('COMPACT'))
+            assert any(header.startswith(p) for p in Message.get_header_prefixes('COMPACT', 'peer_1'))
+            assert not any(header.startswith(p) for p in Message.get_header_prefixes('COMPACT', 'peer_2'))
+            assert not any(header.startswith(p) for p in Message.get_header_prefixes(msg_types.QUERY))
+
+        # *_QUERY types are not registered, string header is used
+        header = Message('ABC_QUERY', 'peer_1', json_data).serialize(compact_header=True)[0]
+        assert header == b'ABC_QUERY^peer_1'
+        assert len(Message.get_header_prefixes('ABC_QUERY')) == 1
+    finally:
+        Message.unregister_serializer('COMPACT')
+
+    with pytest.raises(NoSerializerRegistered):
+        Message.deserialize([COMPACT_HEADER_MARKER + type_id.to_bytes(4, 'big') + b'peer_1', b''])
+    with pytest.raises(Exception):
+        Message.deserialize([COMPACT_HEADER_MARKER + b'\x01', b''])
+
+
+class CountingJsonMessageSerializer(JsonMessageSerializer):
+    deserialize_count = 0
+
+    @staticmethod
+    def deserialize(data):
+        CountingJsonMessageSerializer.deserialize_count += 1
+        return JsonMessageSerializer.deserialize(data)
+
+
+def test_lazy():
+    Message.register_serializer('LAZY_JSON', CountingJsonMessageSerializer)
+    try:
+        msg_serialized = Message('LAZY_JSON', 'abc', json_data).serialize()
+
+        msg = Message.deserialize(msg_serialized, lazy=True)
+        assert isinstance(msg, LazyMessage)
+        assert msg.type == 'LAZY_JSON'
+        assert msg.subtype == 'abc'
+        assert not msg.deserialized
+        assert CountingJsonMessageSerializer.deserialize_count == 0
+
+        # re-serialization of untouched message reuses raw payload
+        assert msg.serialize() == msg_serialized
+        assert CountingJsonMessageSerializer.deserialize_count == 0
+
+        assert msg.data == json_data
+        assert msg.data == json_data
+        assert msg.deserialized
+        assert CountingJsonMessageSerializer.deserialize_count == 1
+        assert msg.serialize() == msg_serialized
+
+        msg = Message.deserialize([msg_serialized[0], memoryview(msg_serialized[1])], lazy=True)
+        msg.data = {'a': 1}
+        assert msg.data == {'a': 1}
+        assert CountingJsonMessageSerializer.deserialize_count == 1
+        assert Message.deserialize(msg.serialize()).data == {'a': 1}
+
+        msg = Message.deserialize(Message(msg_types.OK, 'abc').serialize(), lazy=True)
+        assert msg.data is None
+
+        with pytest.raises(NoSerializerRegistered):
+            Message.deserialize([b'LAZY_UNKNOWN^abc', b''], lazy=True)
+    finally:
+        Message.unregister_serializer('LAZY_JSON')
+
+
+def test_batch():
+    def as_tuples(msgs):
+        return [(msg.type, msg.subtype, msg.data) for msg in msgs]
+
+    msgs = [Message(msg_types.INTERNAL_ERROR, 'peer', s) for s in strings_list]
+    header = msgs[0].serialize()[0]
+    batch = [header] + [msg.serialize()[1] for msg in msgs]
+    assert as_tuples(Message.deserialize_batch(batch)) == as_tuples(msgs)
+    batch_buffers = [header] + [memoryview(payload) for payload in batch[1:]]
+    assert as_tuples(Message.deserialize_batch(batch_buffers)) == as_tuples(msgs)
+    assert as_tuples(Message.deserialize_batch(msgs[0].serialize())) == as_tuples(msgs[:1])
+
+    lazy_msgs = Message.deserialize_batch(batch, lazy=True)
+    assert all(isinstance(msg, LazyMessage) for msg in lazy_msgs)
+    assert as_tuples(lazy_msgs) == as_tuples(msgs)
+
+    with pytest.raises(Exception):
+        Message.deserialize_batch([header])
+
+
 if __name__ == '__main__':
     test_1()
     test_2()
+    test_compact_header()
+    test_lazy()
+    test_batch()
@@ -14,6 +14,8 @@ def proto_check(proto_name, proto_obj):
     data = msg_orig.serialize()
     msg_deserialized = Message.deserialize(data)
     assert proto_obj == msg_deserialized.data
+    msg_deserialized = Message.deserialize([data[0], memoryview(data[1])])
+    assert proto_obj == msg_deserialized.data
 
 
 samples = [
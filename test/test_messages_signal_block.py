@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+import pytest
+
+from obci.core.messages import Message, types as msg_types
+from obci.core.messages.signal_block import SignalBlock
+from obci.configs import variables_pb2 as proto
+
+
+def block_check(block):
+    msg_orig = Message(msg_types.SIGNAL_BLOCK, 0, block)
+    data = msg_orig.serialize()
+    assert all(isinstance(x, bytes) for x in data)
+    msg_deserialized = Message.deserialize(data)
+    assert msg_deserialized.type == msg_types.SIGNAL_BLOCK
+    assert msg_deserialized.data == block
+    return msg_deserialized.data
+
+
+blocks = [
+    SignalBlock(np.zeros((0, 0)), []),
+    SignalBlock(np.zeros((5, 0)), []),
+    SignalBlock(np.array([[1.0], [2.0], [3.0]]), [time.time()]),
+    SignalBlock(np.arange(32 * 64, dtype=np.float32).reshape(32, 64), np.linspace(0.0, 1.0, 64)),
+    SignalBlock(np.random.rand(32, 64), np.linspace(0.0, 1.0, 64)),
+    SignalBlock(np.random.rand(64, 32).T, np.linspace(0.0, 1.0, 64)),  # not C-contiguous
+    SignalBlock(np.random.rand(4, 8).astype('>f8'), np.arange(8)),  # big-endian
+]
+
+
+def test_signal_block():
+    for b in blocks:
+        block_check(b)
+
+
+def test_signal_block_zero_copy():
+    block = block_check(blocks[3])
+    assert block.samples.dtype == np.float32
+    assert block.samples.shape == (32, 64)
+    assert not block.samples.flags.writeable
+    assert not block.timestamps.flags.writeable
+
+    header, payload = Message(msg_types.SIGNAL_BLOCK, 0, blocks[3]).serialize()
+    payload = memoryview(payload)
+    block = Message.deserialize([header, payload]).data
+    assert block == blocks[3]
+    assert np.shares_memory(block.samples, np.frombuffer(payload, np.uint8))
+
+
+def test_signal_block_invalid():
+    with pytest.raises(ValueError):
+        SignalBlock(np.zeros(5), np.zeros(5))
+    with pytest.raises(ValueError):
+        SignalBlock(np.zeros((2, 5)), np.zeros(4))
+    with pytest.raises(ValueError):
+        Message(msg_types.SIGNAL_BLOCK, 0, SignalBlock(np.zeros((2, 2), dtype=np.int32), np.zeros(2))).serialize()
+    with pytest.raises(Exception):
+        Message.deserialize([b'SIGNAL_BLOCK^0', b'abc'])
+
+
+def test_sample_vector_conversion():
+    sv = proto.SampleVector(samples=[
+        proto.Sample(timestamp=1.0, channels=[1.0, 2.0, 3.0]),
+        proto.Sample(timestamp=2.0, channels=[4.0, 5.0, 6.0])
+    ])
+    block = SignalBlock.from_sample_vector(sv)
+    assert block.channels_count == 3
+    assert block.samples_count == 2
+    assert np.array_equal(block.samples, [[1.0, 4.0], [2.0, 5.0], [3.0, 6.0]])
+    assert np.array_equal(block.timestamps, [1.0, 2.0])
+    assert block.to_sample_vector() == sv
+
+
+if __name__ == '__main__':
+    test_signal_block()
+    test_signal_block_zero_copy()
+    test_signal_block_invalid()
+    test_sample_vector_conversion()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import time
+
+from obci.core.broker import Broker
+from obci.core.messages import Message
+from obci.core.peer import Peer, PeerInitUrls
+
+from utils import wait_for_peers
+
+
+HANDLER_DELAY = 0.2  # seconds
+REQUESTS_COUNT = 10
+
+
+class SlowHandlerPeer(Peer):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handled = []
+        self.register_message_handler('SLOW_QUERY', self._slow_handler)
+        self.register_message_handler('ORDERED_QUERY', self._slow_handler)
+
+    async def _slow_handler(self, msg: Message) -> Message:
+        self.handled.append(('start', msg.type, msg.data))
+        await asyncio.sleep(HANDLER_DELAY)
+        self.handled.append(('end', msg.type, msg.data))
+        return Message(msg.type, self.id, msg.data)
+
+
+class ClientPeer(Peer):
+
+    async def send_requests_coro(self, url, msg_type):
+        start_time = time.monotonic()
+        responses = await asyncio.gather(*[self.send_message_to_peer(url, Message(msg_type, self.id, i))
+                                           for i in range(REQUESTS_COUNT)])
+        assert [r.data for r in responses] == list(range(REQUESTS_COUNT))
+        return time.monotonic() - start_time
+
+    def send_requests(self, url, msg_type):
+        return self.create_task(self.send_requests_coro(url, msg_type)).result()
+
+
+def test_sync_messages():
+    broker_rep = 'tcp://127.0.0.1:20021'
+    broker = Broker([broker_rep], ['tcp://127.0.0.1:20022'], ['tcp://127.0.0.1:20023'])
+    urls = PeerInitUrls(pub_urls=['tcp://127.0.0.1:*'],
+                        rep_urls=['tcp://127.0.0.1:*'],
+                        broker_rep_url=broker_rep)
+
+    handler_peer = SlowHandlerPeer(urls, 'handler', ordered_sync_message_types=['ORDERED_QUERY'])
+    client_peer = ClientPeer(urls, 'client')
+    wait_for_peers([handler_peer, client_peer], broker)
+    url = handler_peer._rep_listening_urls[0]
+
+    # requests are handled concurrently
+    duration = client_peer.send_requests(url, 'SLOW_QUERY')
+    assert duration < HANDLER_DELAY * REQUESTS_COUNT / 2
+
+    # ordered requests are handled one by one in order of arrival
+    handler_peer.handled.clear()
+    duration = client_peer.send_requests(url, 'ORDERED_QUERY')
+    assert duration >= HANDLER_DELAY * REQUESTS_COUNT
+    assert handler_peer.handled == [(event, 'ORDERED_QUERY', i)
+                                    for i in range(REQUESTS_COUNT)
+                                    for event in ('start', 'end')]
+
+    for p in [handler_peer, client_peer]:
+        p.shutdown()
+    broker.shutdown()
+
+
+if __name__ == '__main__':
+    logging.root.setLevel(logging.WARNING)
+    console = logging.StreamHandler()
+    logging.root.addHandler(console)
+
+    test_sync_messages()